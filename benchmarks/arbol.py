@@ -0,0 +1,121 @@
+# benchmarks/arbol.py
+#
+# Deterministic synthetic trees for the benchmarks: the same
+# configuration and seed always produce the same folders and names.
+
+import os
+import random
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+
+# Mezcla por defecto (extension: peso); ".bin" no pertenece a ninguna categoria
+MEZCLA_EXTENSIONES = {
+    ".jpg": 25, ".png": 10, ".pdf": 15, ".txt": 10, ".docx": 5, ".mp3": 8,
+    ".mp4": 4, ".zip": 5, ".py": 5, ".csv": 3, ".bin": 10,
+}
+
+# Nombres de las carpetas ocultas y excluidas que se generan
+PREFIJO_OCULTA = ".oculta"
+NOMBRE_EXCLUIDA = "excluida"
+
+
+def leer_mezcla(texto: str) -> dict:
+    """Parses 'jpg=30,pdf=20,bin=5' into {'.jpg': 30, '.pdf': 20, '.bin': 5}"""
+    mezcla = {}
+    for parte in texto.split(","):
+        extension, _, peso = parte.strip().partition("=")
+        extension = extension if extension.startswith(".") else f".{extension}"
+        mezcla[extension.lower()] = float(peso or 1)
+    return mezcla
+
+
+@dataclass
+class ConfigArbol:
+    archivos: int = 10_000            # Archivos en las carpetas normales
+    profundidad: int = 3              # Niveles de subcarpetas bajo la raiz
+    fanout: int = 6                   # Subcarpetas por carpeta
+    mezcla: dict = field(default_factory=lambda: dict(MEZCLA_EXTENSIONES))
+    ocultas: int = 0                  # Carpetas ocultas ('.oculta*'), con archivos dentro
+    excluidas: int = 0                # Carpetas 'excluida', con archivos dentro
+    colisiones: float = 0.0           # Fraccion de archivos que repiten un nombre anterior
+    tamano: int = 0                   # Bytes escritos en cada archivo
+    semilla: int = 1
+
+    def como_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class ArbolGenerado:
+    base: Path
+    carpetas: int = 0
+    archivos: int = 0                 # Archivos visibles (los que el organizador debe mover)
+    ocultos: int = 0
+    excluidos: int = 0
+    repetidos: int = 0                # Nombres repetidos (colisiones al organizar con --recursive)
+
+
+def _carpetas(base: Path, profundidad: int, fanout: int) -> list[Path]:
+    """Folder tree in breadth-first order, root included"""
+    carpetas = [base]
+    nivel = [base]
+    for n in range(profundidad):
+        siguiente = []
+        for padre in nivel:
+            for i in range(fanout):
+                siguiente.append(padre / f"d{n}_{i}")
+        carpetas.extend(siguiente)
+        nivel = siguiente
+    return carpetas
+
+
+def _escribir(ruta: Path, contenido: bytes):
+    with open(ruta, "wb") as f:
+        if contenido:
+            f.write(contenido)
+
+
+def generar_arbol(base: Path, config: ConfigArbol) -> ArbolGenerado:
+    """Creates the tree described by 'config' under 'base' (which must exist)"""
+    azar = random.Random(config.semilla)
+    extensiones = list(config.mezcla)
+    pesos = [config.mezcla[e] for e in extensiones]
+    contenido = b"x" * config.tamano
+    arbol = ArbolGenerado(base)
+
+    carpetas = _carpetas(base, config.profundidad, config.fanout)
+    for carpeta in carpetas[1:]:
+        carpeta.mkdir()
+    arbol.carpetas = len(carpetas)
+
+    nombres = []
+    for i in range(config.archivos):
+        carpeta = carpetas[i % len(carpetas)]
+        if nombres and azar.random() < config.colisiones:
+            # Mismo nombre que un archivo anterior, en otra carpeta si es posible
+            nombre = azar.choice(nombres)
+            if (carpeta / nombre).exists():
+                nombre = f"f{i:07d}{os.path.splitext(nombre)[1]}"
+            else:
+                arbol.repetidos += 1
+        else:
+            nombre = f"f{i:07d}{azar.choices(extensiones, pesos)[0]}"
+            nombres.append(nombre)
+        _escribir(carpeta / nombre, contenido)
+        arbol.archivos += 1
+
+    # Carpetas que el organizador no debe recorrer (--ignore-hidden, --exclude)
+    for tipo, cantidad in ((PREFIJO_OCULTA, config.ocultas), (NOMBRE_EXCLUIDA, config.excluidas)):
+        for i in range(cantidad):
+            padre = carpetas[azar.randrange(len(carpetas))]
+            carpeta = padre / (f"{tipo}{i}" if tipo == PREFIJO_OCULTA else tipo)
+            carpeta.mkdir(exist_ok=True)
+            for j in range(10):
+                _escribir(carpeta / f"{tipo.strip('.')}{i}_{j}.txt", contenido)
+                if tipo == PREFIJO_OCULTA:
+                    arbol.ocultos += 1
+                else:
+                    arbol.excluidos += 1
+
+    return arbol
@@ -0,0 +1,87 @@
+# benchmarks/bench_memoria.py
+#
+# Memory of a materialized file list: list of pathlib.Path against
+# ConjuntoArchivos. The paths are synthetic (nothing is written to disk),
+# so millions of entries can be measured quickly.
+#
+#   python -m benchmarks.bench_memoria --files 1000000
+
+import gc
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+import click
+
+from benchmarks.arbol import MEZCLA_EXTENSIONES
+from core.conjunto_archivos import ConjuntoArchivos
+
+
+def rutas_sinteticas(archivos: int, por_carpeta: int, raiz: str = "/datos/compartido"):
+    """Deterministic paths: 'por_carpeta' files per folder, three folder levels"""
+    extensiones = list(MEZCLA_EXTENSIONES)
+    for i in range(archivos):
+        carpeta = i // por_carpeta
+        yield f"{raiz}/a{carpeta // 400}/b{carpeta // 20 % 20}/c{carpeta % 20}/archivo_{i:08d}{extensiones[i % len(extensiones)]}"
+
+
+def medir(construir) -> tuple[object, int, float]:
+    """Builds a structure under tracemalloc: (structure, bytes, seconds)"""
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = construir()
+    segundos = time.perf_counter() - inicio
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return resultado, memoria, segundos
+
+
+def recorrer(rutas) -> float:
+    inicio = time.perf_counter()
+    for _ in rutas:
+        pass
+    return time.perf_counter() - inicio
+
+
+@click.command()
+@click.option("--files", "archivos", default=1_000_000, show_default=True, help="Paths in the list.")
+@click.option("--per-folder", "por_carpeta", default=200, show_default=True, help="Files per folder.")
+@click.option("--output", "salida", type=click.Path(dir_okay=False, path_type=Path), help="Write the results as JSON.")
+def main(archivos, por_carpeta, salida):
+    resultados = {"files": archivos, "per_folder": por_carpeta, "results": {}}
+
+    casos = (
+        ("list[Path]", lambda: [Path(r) for r in rutas_sinteticas(archivos, por_carpeta)]),
+        ("ConjuntoArchivos", lambda: ConjuntoArchivos.desde_rutas(rutas_sinteticas(archivos, por_carpeta))),
+        (
+            "ConjuntoArchivos+meta",
+            lambda: ConjuntoArchivos.desde_rutas(rutas_sinteticas(archivos, por_carpeta), metadatos=True),
+        ),
+    )
+
+    click.echo(f"{archivos} paths, {por_carpeta} per folder")
+    click.echo(f"{'structure':<24} {'MiB':>9} {'bytes/file':>11} {'build s':>9} {'iterate s':>10}")
+    for nombre, construir in casos:
+        estructura, memoria, construccion = medir(construir)
+        iteracion = recorrer(estructura)
+        del estructura
+
+        resultados["results"][nombre] = {
+            "bytes": memoria,
+            "bytes_per_file": round(memoria / archivos, 1),
+            "build_seconds": round(construccion, 3),
+            "iterate_seconds": round(iteracion, 3),
+        }
+        click.echo(
+            f"{nombre:<24} {memoria / 1_048_576:>9.1f} {memoria / archivos:>11.1f} {construccion:>9.2f} {iteracion:>10.2f}"
+        )
+
+    if salida is not None:
+        salida.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+        click.echo(f"\nResults saved to {salida}")
+
+
+if __name__ == "__main__":
+    main()
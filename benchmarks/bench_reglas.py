@@ -0,0 +1,154 @@
+# benchmarks/bench_reglas.py
+#
+# Cost per file of classifying a name with rule objects (glob, regex,
+# size, age) as the rule count grows: the compiled matcher of
+# ReglasCompiladas against checking every rule in turn. Names and stat
+# data are synthetic, so nothing touches the disk.
+#
+#   python -m benchmarks.bench_reglas --rules 10,100,250,500
+
+import os
+import re
+import json
+import time
+import random
+import fnmatch
+from pathlib import Path
+
+import click
+
+from benchmarks.arbol import MEZCLA_EXTENSIONES
+from core.rules import CATEGORIA_POR_DEFECTO, compilar_reglas, leer_tamano, normalizar_extension
+
+
+def reglas_sinteticas(cantidad: int) -> dict:
+    """
+    The rules of core/reglas.json plus 'cantidad' rule objects in the mix of
+    a large installation: mostly globs and extensions with a size or age
+    limit, some name prefixes and anchored regexes
+    """
+    ruta = Path(__file__).resolve().parent.parent / "core" / "reglas.json"
+    reglas = {}
+    for i in range(cantidad):
+        tipo = i % 10
+        if tipo < 5:
+            regla = {"glob": f"*.e{i}", "older_than_days": 30}
+        elif tipo < 7:
+            regla = {"glob": f"p{i}_*.pdf", "min_size": "1MB"}
+        elif tipo < 9:
+            regla = {"extensions": [f".x{i}", f".y{i}"], "max_size": 1000}
+        else:
+            regla = {"regex": rf"^id{i}-\d+"}
+        reglas[f"regla_{i:04d}"] = regla
+
+    # Las reglas con objetos tienen prioridad; las de extension van al final
+    reglas.update(json.loads(ruta.read_text(encoding="utf-8")))
+    return reglas
+
+
+def archivos_sinteticos(cantidad: int, reglas: int, semilla: int = 1) -> list:
+    """(name, stat) pairs: mostly ordinary names, a few matching the synthetic rules"""
+    azar = random.Random(semilla)
+    extensiones = list(MEZCLA_EXTENSIONES)
+    ahora = time.time()
+    archivos = []
+    for i in range(cantidad):
+        tipo = azar.random()
+        if tipo < 0.05 and reglas:
+            nombre = f"id{azar.randrange(reglas) // 10 * 10 + 9}-{i}.pdf"
+        elif tipo < 0.10 and reglas:
+            nombre = f"p{azar.randrange(reglas) // 10 * 10 + 5}_{i}.pdf"
+        else:
+            nombre = f"archivo_{i:08d}{azar.choice(extensiones)}"
+        tamano = azar.randrange(1 << 24)
+        mtime = int(ahora - azar.randrange(90 * 86400))
+        archivos.append((nombre, os.stat_result((0o100644, i, 0, 1, 0, 0, tamano, mtime, mtime, mtime))))
+    return archivos
+
+
+def clasificador_lineal(reglas: dict):
+    """Checks every rule object in order with fnmatch/re, as a direct implementation would"""
+    condicionales = []
+    por_extension = {}
+    for categoria, entradas in reglas.items():
+        for entrada in entradas if isinstance(entradas, list) else [entradas]:
+            if isinstance(entrada, str):
+                por_extension.setdefault(normalizar_extension(entrada), categoria)
+                continue
+            condicionales.append((
+                categoria,
+                entrada.get("glob"),
+                re.compile(entrada["regex"]) if "regex" in entrada else None,
+                {normalizar_extension(e) for e in entrada.get("extensions", [])},
+                leer_tamano(entrada["min_size"]) if "min_size" in entrada else None,
+                leer_tamano(entrada["max_size"]) if "max_size" in entrada else None,
+                entrada.get("older_than_days"),
+            ))
+
+    def clasificar(nombre: str, st):
+        extension = os.path.splitext(nombre)[1].lower()
+        ahora = time.time()
+        for categoria, glob, regex, extensiones, minimo, maximo, dias in condicionales:
+            if glob is not None and not fnmatch.fnmatch(nombre.lower(), glob):
+                continue
+            if regex is not None and regex.search(nombre) is None:
+                continue
+            if extensiones and extension not in extensiones:
+                continue
+            if minimo is not None and st.st_size < minimo:
+                continue
+            if maximo is not None and st.st_size > maximo:
+                continue
+            if dias is not None and ahora - st.st_mtime < dias * 86400:
+                continue
+            return categoria
+        return por_extension.get(extension, CATEGORIA_POR_DEFECTO)
+
+    return clasificar
+
+
+def medir(clasificar, archivos: list, repeticiones: int) -> float:
+    """Best nanoseconds per file over 'repeticiones' passes"""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter_ns()
+        for nombre, st in archivos:
+            clasificar(nombre, st)
+        mejor = min(mejor, time.perf_counter_ns() - inicio)
+    return mejor / len(archivos)
+
+
+@click.command()
+@click.option("--rules", "cantidades", default="0,10,50,100,250,500", show_default=True, help="Rule object counts.")
+@click.option("--files", "archivos", default=50_000, show_default=True, help="Names classified per pass.")
+@click.option("--repeat", "repeticiones", type=click.IntRange(min=1), default=3, show_default=True,
+              help="Passes per measure (the best is reported).")
+@click.option("--no-linear", "sin_lineal", is_flag=True, help="Skip the rule-by-rule baseline.")
+@click.option("--output", "salida", type=click.Path(dir_okay=False, path_type=Path), help="Write the results as JSON.")
+def main(cantidades, archivos, repeticiones, sin_lineal, salida):
+    cantidades = [int(c) for c in cantidades.split(",")]
+    resultados = {"files": archivos, "repeat": repeticiones, "results": {}}
+
+    click.echo(f"{archivos} names per pass")
+    click.echo(f"{'rules':>6} {'compiled ns/file':>17} {'linear ns/file':>15}")
+    for cantidad in cantidades:
+        reglas = reglas_sinteticas(cantidad)
+        muestra = archivos_sinteticos(archivos, cantidad)
+
+        compiladas = compilar_reglas(reglas)
+        compilado = medir(compiladas.clasificar, muestra, repeticiones)
+        lineal = None if sin_lineal else medir(clasificador_lineal(reglas), muestra, repeticiones)
+
+        resultados["results"][cantidad] = {
+            "compiled_ns_per_file": round(compilado, 1),
+            "linear_ns_per_file": None if lineal is None else round(lineal, 1),
+        }
+        click.echo(f"{cantidad:>6} {compilado:>17.0f} {'-' if lineal is None else f'{lineal:.0f}':>15}")
+
+    if salida is not None:
+        salida.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+        click.echo(f"\nResults saved to {salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_scan_workers.py
+#
+# Throughput of iterar_archivos against a slow filesystem stand-in:
+# every os.scandir call sleeps 'latency' ms before listing, like a
+# directory round trip on an NFS/SMB share.
+#
+#   python -m benchmarks.bench_scan_workers --files 6000 --depth 3 --fanout 6 --latency 5
+
+import os
+import time
+import tempfile
+from pathlib import Path
+
+import click
+
+from benchmarks.arbol import ConfigArbol, generar_arbol
+from core.engine import iterar_archivos
+from core.stats import Stats
+
+
+class ScandirLento:
+    """Latency-injecting wrapper around os.scandir"""
+
+    def __init__(self, latencia: float):
+        self.latencia = latencia
+        self.original = os.scandir
+
+    def __call__(self, ruta="."):
+        time.sleep(self.latencia)
+        return self.original(ruta)
+
+    def __enter__(self):
+        os.scandir = self
+        return self
+
+    def __exit__(self, *exc):
+        os.scandir = self.original
+
+
+def medir(base: Path, workers: int, ordenado: bool) -> tuple[int, float]:
+    inicio = time.perf_counter()
+    total = sum(
+        1 for _ in iterar_archivos(base, True, set(), set(), False, Stats(), scan_workers=workers, ordenado=ordenado)
+    )
+    return total, time.perf_counter() - inicio
+
+
+@click.command()
+@click.option("--files", "archivos", default=6000, show_default=True, help="Files in the synthetic tree.")
+@click.option("--depth", "profundidad", default=3, show_default=True, help="Levels of subfolders.")
+@click.option("--fanout", default=6, show_default=True, help="Subfolders per folder.")
+@click.option("--latency", "latencia_ms", default=5.0, show_default=True, help="Injected ms per directory listing.")
+@click.option("--workers", "lista_workers", default="1,2,4,8,16", show_default=True, help="Worker counts to test.")
+@click.option("--sorted", "ordenado", is_flag=True, help="Measure the deterministic (sorted) mode.")
+def main(archivos, profundidad, fanout, latencia_ms, lista_workers, ordenado):
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        arbol = generar_arbol(base, ConfigArbol(archivos, profundidad, fanout))
+
+        click.echo(f"{arbol.carpetas} folders, {arbol.archivos} files, {latencia_ms} ms per listing, sorted={ordenado}")
+        click.echo(f"{'workers':>8} {'files':>8} {'seconds':>9} {'files/s':>10} {'speedup':>8}")
+
+        base_tiempo = None
+        with ScandirLento(latencia_ms / 1000):
+            for workers in (int(w) for w in lista_workers.split(",")):
+                total, tiempo = medir(base, workers, ordenado)
+                base_tiempo = base_tiempo or tiempo
+                click.echo(
+                    f"{workers:>8} {total:>8} {tiempo:>9.3f} {total / tiempo:>10.0f} {base_tiempo / tiempo:>7.1f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
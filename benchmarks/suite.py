@@ -0,0 +1,197 @@
+# benchmarks/suite.py
+#
+# Scan, simulate and apply throughput plus peak memory over a synthetic
+# tree, written as JSON so runs on different commits can be compared.
+# Everything runs on the local filesystem (a tmpfs by default).
+#
+#   python -m benchmarks.suite --files 20000 --collisions 0.1 --output antes.json
+#   python -m benchmarks.suite --files 20000 --collisions 0.1 --compare antes.json
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from pathlib import Path
+from statistics import median
+
+import click
+
+from benchmarks.arbol import MEZCLA_EXTENSIONES, NOMBRE_EXCLUIDA, ConfigArbol, generar_arbol, leer_mezcla
+from core.engine import iterar_archivos, mover_archivos, simulacion
+from core.rules import compilar_reglas
+from core.stats import Stats
+
+
+ETAPAS = ("scan", "simulate", "apply")
+
+# Carpeta por defecto de los arboles: memoria compartida si existe (tmpfs)
+DIRECTORIO_TMPFS = "/dev/shm"
+
+
+def cargar_reglas():
+    ruta = Path(__file__).resolve().parent.parent / "core" / "reglas.json"
+    return compilar_reglas(json.loads(ruta.read_text(encoding="utf-8")))
+
+
+def version_git() -> str:
+    try:
+        salida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        )
+        return salida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar_etapa(etapa: str, base: Path, reglas, workers: int) -> tuple[int, Stats]:
+    """Runs one stage over 'base' as the CLI does, discarding the events"""
+    stats = Stats()
+    argumentos = (base, True, {NOMBRE_EXCLUIDA}, set(), True, stats)
+
+    if etapa == "scan":
+        return sum(1 for _ in iterar_archivos(*argumentos)), stats
+
+    if etapa == "simulate":
+        eventos = simulacion(base, reglas, *argumentos[1:])
+    else:
+        eventos = mover_archivos(base, reglas, *argumentos[1:], workers=workers)
+
+    # El ultimo evento es el resumen, con el total de archivos movidos
+    for evento in eventos:
+        pass
+    return evento.cantidad, stats
+
+
+def medir(etapa: str, config: ConfigArbol, raiz: Path, reglas, workers: int, repeticiones: int, memoria: bool) -> dict:
+    """
+    Times 'repeticiones' runs of one stage, each on a freshly generated tree
+    (apply changes it). Peak memory is measured in one extra run under
+    tracemalloc, so tracing never slows down the timed runs
+    """
+    tiempos = []
+    for repeticion in range(repeticiones + (1 if memoria else 0)):
+        medir_memoria = memoria and repeticion == repeticiones
+        base = Path(tempfile.mkdtemp(prefix=f"bench-{etapa}-", dir=raiz))
+        try:
+            arbol = generar_arbol(base, config)
+
+            if medir_memoria:
+                tracemalloc.start()
+            inicio = time.perf_counter()
+            archivos, stats = ejecutar_etapa(etapa, base, reglas, workers)
+            segundos = time.perf_counter() - inicio
+            if medir_memoria:
+                pico = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                tiempos.append(segundos)
+        finally:
+            shutil.rmtree(base, ignore_errors=True)
+
+    segundos = median(tiempos)
+    resultado = {
+        "files": archivos,
+        "expected": arbol.archivos,
+        "repeated_names": arbol.repetidos,
+        "seconds": round(segundos, 6),
+        "min_seconds": round(min(tiempos), 6),
+        "files_per_second": round(archivos / segundos, 1) if segundos > 0 else 0,
+        "excluded": stats.excluidos,
+        "errors": stats.errores,
+    }
+    if memoria:
+        resultado["peak_kib"] = round(pico / 1024, 1)
+    if etapa == "apply":
+        resultado["renames"] = stats.renombrados
+        resultado["copies"] = stats.copias
+    return resultado
+
+
+def comparar(anterior: dict, actual: dict):
+    click.echo(f"\n{'stage':<10} {'before files/s':>15} {'now files/s':>12} {'change':>8} {'peak KiB':>18}")
+    for etapa, datos in actual["results"].items():
+        previo = anterior.get("results", {}).get(etapa)
+        if previo is None:
+            continue
+        cambio = datos["files_per_second"] / previo["files_per_second"] - 1 if previo["files_per_second"] else 0
+        memoria = f"{previo.get('peak_kib', '-')} → {datos.get('peak_kib', '-')}"
+        click.echo(
+            f"{etapa:<10} {previo['files_per_second']:>15.0f} {datos['files_per_second']:>12.0f} "
+            f"{cambio:>+7.1%} {memoria:>18}"
+        )
+
+
+@click.command()
+@click.option("--files", "archivos", default=10_000, show_default=True, help="Files in the synthetic tree.")
+@click.option("--depth", "profundidad", default=3, show_default=True, help="Levels of subfolders.")
+@click.option("--fanout", default=6, show_default=True, help="Subfolders per folder.")
+@click.option(
+    "--ext-mix", "mezcla", default=",".join(f"{e[1:]}={p}" for e, p in MEZCLA_EXTENSIONES.items()),
+    help="Extension weights, e.g. 'jpg=30,pdf=20,bin=5'."
+)
+@click.option("--hidden", "ocultas", default=5, show_default=True, help="Hidden folders (skipped with --ignore-hidden).")
+@click.option("--excluded", "excluidas", default=5, show_default=True, help="Excluded folders.")
+@click.option("--collisions", "colisiones", type=click.FloatRange(0, 1), default=0.05, show_default=True,
+              help="Fraction of files that repeat an earlier file name.")
+@click.option("--size", "tamano", default=0, show_default=True, help="Bytes written in each file.")
+@click.option("--seed", "semilla", default=1, show_default=True, help="Seed of the tree generator.")
+@click.option("--stages", "etapas", default=",".join(ETAPAS), show_default=True, help="Stages to measure.")
+@click.option("--repeat", "repeticiones", type=click.IntRange(min=1), default=3, show_default=True,
+              help="Timed runs per stage (the median is reported).")
+@click.option("--workers", type=click.IntRange(min=1), default=1, show_default=True, help="Workers of the apply stage.")
+@click.option("--no-memory", "sin_memoria", is_flag=True, help="Skip the peak memory (tracemalloc) run.")
+@click.option("--dir", "directorio", type=click.Path(file_okay=False, path_type=Path),
+              help=f"Where the trees are generated [default: {DIRECTORIO_TMPFS} if present, else the temp folder].")
+@click.option("--output", "salida", type=click.Path(dir_okay=False, path_type=Path), help="Write the results as JSON.")
+@click.option("--compare", "anterior", type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help="Results JSON of a previous run to compare with.")
+def main(archivos, profundidad, fanout, mezcla, ocultas, excluidas, colisiones, tamano, semilla, etapas,
+         repeticiones, workers, sin_memoria, directorio, salida, anterior):
+    config = ConfigArbol(archivos, profundidad, fanout, leer_mezcla(mezcla), ocultas, excluidas, colisiones, tamano, semilla)
+    etapas = [e.strip() for e in etapas.split(",")]
+    for etapa in etapas:
+        if etapa not in ETAPAS:
+            raise click.BadParameter(f"unknown stage {etapa}", param_hint="--stages")
+
+    if directorio is None:
+        directorio = Path(DIRECTORIO_TMPFS) if os.path.isdir(DIRECTORIO_TMPFS) else Path(tempfile.gettempdir())
+    directorio.mkdir(parents=True, exist_ok=True)
+    reglas = cargar_reglas()
+
+    resultados = {
+        "commit": version_git(),
+        "python": platform.python_version(),
+        "platform": sys.platform,
+        "directory": str(directorio),
+        "config": config.como_dict(),
+        "workers": workers,
+        "repeat": repeticiones,
+        "results": {},
+    }
+
+    click.echo(f"{archivos} files, depth {profundidad}, fan-out {fanout}, {colisiones:.0%} collisions in {directorio}")
+    click.echo(f"{'stage':<10} {'files':>8} {'seconds':>9} {'files/s':>10} {'peak KiB':>10}")
+    for etapa in etapas:
+        datos = medir(etapa, config, directorio, reglas, workers, repeticiones, not sin_memoria)
+        resultados["results"][etapa] = datos
+        click.echo(
+            f"{etapa:<10} {datos['files']:>8} {datos['seconds']:>9.3f} {datos['files_per_second']:>10.0f} "
+            f"{datos.get('peak_kib', '-'):>10}"
+        )
+
+    if salida is not None:
+        salida.write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+        click.echo(f"\nResults saved to {salida}")
+
+    if anterior is not None:
+        comparar(json.loads(anterior.read_text(encoding="utf-8")), resultados)
+
+
+if __name__ == "__main__":
+    main()
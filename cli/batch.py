@@ -0,0 +1,291 @@
+# batch.py
+
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import click
+
+from cli.cli import __version__, es_raiz_proyecto
+from core.engine import mover_archivos, simulacion
+from core.eventos import SalidaLog, consumir
+from core.historial import HistorialMovimientos
+from core.rules import leer_json
+from core.stats import Stats
+from core.logging_utils import obtener_ruta_base, obtener_ruta_config, log_config
+
+
+# Opciones que cada raiz puede redefinir en el archivo de trabajos
+OPCIONES_RAIZ = ("recursive", "exclude", "only", "ignore_hidden")
+
+
+class Raiz:
+    """One root of a job file, with its options already merged with the defaults"""
+    __slots__ = ("ruta", "recursive", "exclude", "only", "ignore_hidden", "stats", "error", "segundos")
+
+    def __init__(self, ruta: Path, recursive: bool, exclude: set, only: set, ignore_hidden: bool):
+        self.ruta = ruta
+        self.recursive = recursive
+        self.exclude = exclude
+        self.only = only
+        self.ignore_hidden = ignore_hidden
+        self.stats = Stats()
+        self.error = None
+        self.segundos = 0.0
+
+
+def leer_trabajos(ruta: Path, defecto: dict) -> list[Raiz]:
+    """
+    Reads a job file:
+
+        {"defaults": {"recursive": true, "exclude": ["tmp"]},
+         "roots": ["/srv/intake/ana", {"path": "/srv/intake/bob", "only": ["pdf"]}]}
+
+    Raises ValueError on an invalid file
+    """
+    with ruta.open("r", encoding="utf-8") as f:
+        datos = json.load(f)
+
+    if not isinstance(datos, dict) or not isinstance(datos.get("roots"), list):
+        raise ValueError("the job file must be an object with a 'roots' list")
+
+    opciones = dict(defecto)
+    opciones.update(_validar_opciones(datos.get("defaults", {}), "defaults"))
+
+    raices = []
+    for i, entrada in enumerate(datos["roots"]):
+        if isinstance(entrada, str):
+            entrada = {"path": entrada}
+        if not isinstance(entrada, dict) or not isinstance(entrada.get("path"), str):
+            raise ValueError(f"root #{i + 1} needs a 'path'")
+
+        propias = dict(opciones)
+        propias.update(_validar_opciones({k: v for k, v in entrada.items() if k != "path"}, entrada["path"]))
+        raices.append(Raiz(
+            Path(entrada["path"]).expanduser(),
+            bool(propias["recursive"]),
+            {e.lower() for e in propias["exclude"]},
+            set(propias["only"]),
+            bool(propias["ignore_hidden"]),
+        ))
+    return raices
+
+
+def _validar_opciones(opciones: dict, donde: str) -> dict:
+    if not isinstance(opciones, dict):
+        raise ValueError(f"{donde}: options must be an object")
+    for clave, valor in opciones.items():
+        if clave not in OPCIONES_RAIZ:
+            raise ValueError(f"{donde}: unknown option '{clave}'")
+        if clave in ("exclude", "only") and not (isinstance(valor, list) and all(isinstance(v, str) for v in valor)):
+            raise ValueError(f"{donde}: '{clave}' must be a list of names")
+    return opciones
+
+
+def procesar_raiz(raiz: Raiz, reglas, carpetas_destino: set, apply: bool, historial, pool, workers: int, scan_workers: int):
+    """Organizes (or simulates) one root. Any error is kept in raiz.error instead of raised"""
+    inicio = time.perf_counter()
+    try:
+        ruta = raiz.ruta.resolve()
+        if not ruta.is_dir():
+            raise FileNotFoundError(f"{ruta} is not a folder")
+        if es_raiz_proyecto(ruta):
+            raise PermissionError(f"{ruta} contains project configuration files")
+
+        exclude = raiz.exclude | carpetas_destino # Avoid organizing already organized folders
+        if apply:
+            eventos = mover_archivos(
+                ruta, reglas, raiz.recursive, exclude, raiz.only, raiz.ignore_hidden, raiz.stats,
+                scan_workers=scan_workers, workers=workers, historial=historial, pool=pool
+            )
+        else:
+            eventos = simulacion(
+                ruta, reglas, raiz.recursive, exclude, raiz.only, raiz.ignore_hidden, raiz.stats, scan_workers=scan_workers
+            )
+        consumir(eventos, [SalidaLog()])
+    except Exception as e:
+        raiz.error = e
+        logging.error(f"Root {raiz.ruta} failed: {e}")
+    finally:
+        raiz.segundos = time.perf_counter() - inicio
+
+
+@click.command()
+@click.argument(
+    "job_file",
+    type=click.Path(exists=True, dir_okay=False, readable=True, path_type=Path),
+)
+@click.option(
+    "--config",
+    type=click.Path(dir_okay=False, readable=True, path_type=Path),
+    default=lambda: obtener_ruta_base() / "reglas.json",
+    help="JSON file with organization rules",
+)
+@click.option(
+    "--recursive",
+    is_flag=True,
+    help="Default for roots that do not set 'recursive'."
+)
+@click.option(
+    "--ignore-hidden",
+    is_flag=True,
+    help="Default for roots that do not set 'ignore_hidden'."
+)
+@click.option(
+    "--log-file",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True, path_type=Path),
+    default=lambda: obtener_ruta_base() / "logs",
+    help="Directory where logs will be saved.",
+)
+@click.option(
+    "--log-level",
+    type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR"], case_sensitive=False),
+    default="INFO",
+    help="Log detail level.",
+)
+@click.option(
+    "--roots-parallel",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Roots scanned and planned at the same time."
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="Size of the move pool shared by all roots (with --apply)."
+)
+@click.option(
+    "--scan-workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Directories listed in parallel within each root."
+)
+@click.option(
+    "--history-db",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Record of the applied runs used by the undo command [default: <log-file>/history.sqlite]."
+)
+@click.option(
+    "--stats-json",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Save the combined and per-root counters as JSON."
+)
+@click.option(
+    "--apply",
+    is_flag=True,
+    help="Execute changes to disk."
+)
+@click.option(
+    "--yes",
+    "-y", is_flag=True,
+    help="Skip manual confirmation."
+)
+def batch(job_file, config, recursive, ignore_hidden, log_file, log_level, roots_parallel, workers, scan_workers,
+          history_db, stats_json, apply, yes):
+    """Organizes every root listed in JOB_FILE in a single process."""
+    start_time = time.perf_counter()
+    log_config(Path(log_file), log_level)
+    logging.info(f"Starting batch organizer {__version__} with {job_file}")
+
+    total = Stats()
+    reglas = leer_json(obtener_ruta_config(config), total)
+    if reglas is None:
+        click.echo("Error reading reglas.json")
+        return
+
+    try:
+        raices = leer_trabajos(job_file, {
+            "recursive": recursive, "exclude": [], "only": [], "ignore_hidden": ignore_hidden,
+        })
+    except (OSError, ValueError) as e:
+        logging.error(f"Invalid job file {job_file}: {e}")
+        click.echo(click.style(f"Invalid job file {job_file}: {e}", fg="red"))
+        return
+
+    if not apply:
+        click.echo(click.style("\n[SIMULATION MODE] No real changes will be made.", fg="blue", bold=True))
+    elif not (yes or click.confirm(click.style(f"Confirm organizing {len(raices)} roots?", fg="red", bold=True))):
+        click.echo("Operation aborted.")
+        return
+
+    carpetas_destino = {k.lower() for k in reglas.carpetas}
+    historial = HistorialMovimientos(history_db or Path(log_file) / "history.sqlite") if apply else None
+
+    # Un solo pool de movimientos para todas las raices: el total de operaciones
+    # en vuelo no crece con la cantidad de raices procesadas a la vez
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="move") if apply else None
+
+    try:
+        with ThreadPoolExecutor(max_workers=roots_parallel, thread_name_prefix="root") as raices_pool:
+            futuros = {
+                raices_pool.submit(
+                    procesar_raiz, raiz, reglas, carpetas_destino, apply, historial, pool, workers, scan_workers
+                ): raiz
+                for raiz in raices
+            }
+            for futuro in as_completed(futuros):
+                raiz = futuros[futuro]
+                if raiz.error is not None:
+                    click.echo(click.style(f"FAILED  {raiz.ruta}: {raiz.error}", fg="red"))
+                else:
+                    click.echo(f"OK      {raiz.ruta}: {raiz.stats.procesados} files ({raiz.segundos:.2f} sec)")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if historial is not None:
+            historial.cerrar()
+
+    for raiz in raices:
+        total.acumular(raiz.stats)
+    fallidas = [raiz for raiz in raices if raiz.error is not None]
+    tiempo_total = time.perf_counter() - start_time
+
+    # --- FINAL SUMMARY ---
+    click.echo(click.style("\n" + "=" * 30, fg="bright_black"))
+    click.echo(click.style("BATCH SUMMARY", bold=True))
+    click.echo(f"Total Time:       {tiempo_total:.4f} sec")
+    click.echo(f"Roots:            {len(raices)} ({len(fallidas)} failed)")
+    click.echo(f"Files Processed:  {total.procesados}")
+    click.echo(f"Files Skipped:    {total.saltados}")
+    click.echo(f"Excluded Entries: {total.excluidos} (pruned folders + excluded files)")
+    if apply:
+        click.echo(f"Fast Renames:     {total.renombrados} ({total.bytes_renombrados / 1_048_576:.1f} MB)")
+        click.echo(f"Device Copies:    {total.copias} ({total.bytes_copiados / 1_048_576:.1f} MB)")
+    click.echo(
+        click.style(
+            f"Critical Errors:  {total.errores}",
+            fg="red" if total.errores > 0 else "white",
+        )
+    )
+    click.echo(click.style("=" * 30, fg="bright_black"))
+
+    if stats_json is not None:
+        datos = {
+            "version": __version__,
+            "applied": apply,
+            "failed_roots": len(fallidas),
+            **total.como_dict(tiempo_total),
+            "roots": [
+                {
+                    "path": str(raiz.ruta),
+                    "error": None if raiz.error is None else str(raiz.error),
+                    **raiz.stats.como_dict(raiz.segundos),
+                }
+                for raiz in raices
+            ],
+        }
+        try:
+            stats_json.write_text(json.dumps(datos, indent=2), encoding="utf-8")
+        except OSError as e:
+            logging.error(f"Could not write stats to {stats_json}: {e}")
+
+    logging.info(
+        f"Batch finished. Roots: {len(raices)}, Failed: {len(fallidas)}, Processed: {total.procesados}, "
+        f"Skipped: {total.saltados}, Excluded: {total.excluidos}, Errors: {total.errores}"
+    )
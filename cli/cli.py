@@ -1,14 +1,29 @@
 # cli.py
 
+import json
 import time
+import hashlib
+import signal
+import sys
+import pstats
+import cProfile
 import logging
+import threading
 from pathlib import Path
 
 import click
 
-from core.engine import mover_archivos, simulacion
+from core.engine import FiltroArchivos, aplicar_plan, mover_archivos, reanudar_diario, simulacion
+from core.eventos import SalidaConsola, SalidaJSONL, SalidaLog, consumir
+from core.duplicados import ENLAZAR, OMITIR, PAPELERA, Deduplicador
+from core.firmas import SNIFF_DESCONOCIDOS, SNIFF_OFF, SNIFF_TODOS, DetectorContenido
+from core.historial import HistorialMovimientos
+from core.incremental import CacheDirectorios, ruta_cache
+from core.journal import DiarioMovimientos, leer_estado
+from core.plan import PlanMovimientos
 from core.rules import leer_json
 from core.stats import Stats
+from core.vigilancia import Vigilante
 from core.logging_utils import (
     obtener_ruta_base,
     obtener_ruta_config,
@@ -37,6 +52,77 @@ def es_raiz_proyecto(ruta: Path) -> bool:
 
 
 
+class PerfilHilos:
+    """
+    cProfile of the whole run across threads: the main thread plus one
+    profiler for every thread started while it is active (walk, plan,
+    move pool...), merged with pstats into a single dump
+    """
+
+    def __init__(self):
+        self.principal = cProfile.Profile()
+        self._hilos = []
+        self._lock = threading.Lock()
+
+    def _perfilar_hilo(self, *_):
+        # Primer evento del hilo nuevo: se cambia este hook por un cProfile propio
+        sys.setprofile(None)
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Python 3.12+: el cProfile principal (sys.monitoring) ya cubre todos los hilos
+            return
+        with self._lock:
+            self._hilos.append(perfil)
+
+    def iniciar(self):
+        threading.setprofile(self._perfilar_hilo)
+        self.principal.enable()
+
+    def guardar(self, ruta: Path):
+        """Stops profiling and writes the merged dump (readable with pstats or snakeviz)"""
+        self.principal.disable()
+        threading.setprofile(None)
+        datos = pstats.Stats(self.principal)
+        with self._lock:
+            for perfil in self._hilos:
+                datos.add(perfil)
+        datos.dump_stats(ruta)
+        click.echo(click.style(f"\nProfile saved to {ruta} ({len(self._hilos) + 1} threads)", fg="yellow"))
+
+
+
+def mostrar_fases(stats: Stats):
+    """
+    Prints the cumulative time and latency percentiles of each phase
+    """
+    datos = stats.como_dict()["phases"]
+    if not datos:
+        return
+    click.echo(click.style("\nPHASE             TIME (s)      COUNT   P50 (us)   P99 (us)", bold=True))
+    for fase, d in datos.items():
+        click.echo(f"{fase:<12} {d['seconds']:>13.4f} {d['count']:>10} {d['p50_us']:>10.0f} {d['p99_us']:>10.0f}")
+
+
+
+def diario_descartable(journal: Path, yes: bool) -> bool:
+    """
+    Checks whether an existing journal can be overwritten by a new run
+    """
+    try:
+        estado = leer_estado(journal)
+    except (OSError, ValueError):
+        return True # Missing or unreadable: nothing to keep
+
+    if estado.terminado:
+        return True
+
+    click.echo(click.style(f"\n[!] The journal {journal} holds an unfinished run ({estado.pendientes} pending moves).", fg="yellow", bold=True))
+    return yes or click.confirm("Discard it and start a new run?")
+
+
+
 @click.version_option(
     __version__,
     prog_name="File Organizer"
@@ -86,6 +172,128 @@ def es_raiz_proyecto(ruta: Path) -> bool:
     default="INFO",
     help="Log detail level.",
 )
+@click.option(
+    "--log-max-mb",
+    type=click.FloatRange(min=0),
+    default=10,
+    show_default=True,
+    help="Rotate a log file when it reaches this size in MB (0 = no size limit).",
+)
+@click.option(
+    "--log-rotate-days",
+    type=click.FloatRange(min=0),
+    default=0,
+    show_default=True,
+    help="Rotate a log file after this many days (0 = no age limit).",
+)
+@click.option(
+    "--log-compress",
+    is_flag=True,
+    help="Gzip the rotated log files.",
+)
+@click.option(
+    "--scan-workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Directories listed in parallel while scanning (useful on network drives)."
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Files moved in parallel with --apply."
+)
+@click.option(
+    "--sorted",
+    "ordenado",
+    is_flag=True,
+    help="Process files in a deterministic (name sorted) order."
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Only list the folders that changed since the previous run (directory cache)."
+)
+@click.option(
+    "--sniff",
+    type=click.Choice([SNIFF_OFF, SNIFF_DESCONOCIDOS, SNIFF_TODOS], case_sensitive=False),
+    default=SNIFF_OFF,
+    show_default=True,
+    help="Classify by content: files with unknown extensions, or all files (fixes mislabeled ones)."
+)
+@click.option(
+    "--dedupe",
+    type=click.Choice(["off", OMITIR, ENLAZAR, PAPELERA], case_sensitive=False),
+    default="off",
+    show_default=True,
+    help="On a name collision with identical content: skip the file, hard-link it or send it to the trash."
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Keep running and organize new files as they appear (Linux inotify)."
+)
+@click.option(
+    "--watch-delay",
+    type=click.FloatRange(min=0.1),
+    default=2.0,
+    show_default=True,
+    help="Seconds a new file must stay unchanged before it is organized."
+)
+@click.option(
+    "--save-plan",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Save the simulated moves to a plan file (simulation mode only)."
+)
+@click.option(
+    "--apply-plan",
+    type=click.Path(exists=True, dir_okay=False, readable=True, path_type=Path),
+    help="Apply a plan saved with --save-plan without rescanning."
+)
+@click.option(
+    "--journal",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Crash-safe journal of the moves made with --apply (needed by --resume)."
+)
+@click.option(
+    "--journal-sync",
+    type=click.IntRange(min=1),
+    default=256,
+    show_default=True,
+    help="Journal records written between fsync calls (1 = safest, slowest)."
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Resume the interrupted run recorded in --journal without rescanning."
+)
+@click.option(
+    "--history-db",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Record of the applied runs used by the undo command [default: <log-file>/history.sqlite]."
+)
+@click.option(
+    "--quiet",
+    "-q", is_flag=True,
+    help="Do not print a line per file, only notices and the totals."
+)
+@click.option(
+    "--events-jsonl",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Append every file event to this file as JSON lines."
+)
+@click.option(
+    "--profile",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Print per-phase timings and save a cProfile dump of all the threads of the run to this file."
+)
+@click.option(
+    "--stats-json",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Save the counters, per-phase timings and throughput of the run as JSON."
+)
 @click.option(
     "--apply",
     is_flag=True,
@@ -97,8 +305,35 @@ def es_raiz_proyecto(ruta: Path) -> bool:
     help="Skip manual confirmation."
 )
 def cli(
-    ruta, ignore_hidden, recursive, exclude, only, config, log_file, log_level, apply, yes
+    ruta, ignore_hidden, recursive, exclude, only, config, log_file, log_level, log_max_mb, log_rotate_days, log_compress,
+    scan_workers, workers, ordenado,
+    incremental, sniff, dedupe, watch, watch_delay, save_plan, apply_plan, journal, journal_sync, resume, quiet, events_jsonl, profile, stats_json, apply, history_db, yes
 ):
+    if save_plan and (apply or apply_plan or resume):
+        raise click.UsageError("--save-plan only works in simulation mode.")
+    if resume and journal is None:
+        raise click.UsageError("--resume needs the --journal of the interrupted run.")
+    if apply_plan and (journal or resume):
+        raise click.UsageError("--journal and --resume cannot be combined with --apply-plan.")
+    if incremental and (apply_plan or resume):
+        raise click.UsageError("--incremental only applies to runs that scan the folder.")
+    if dedupe == PAPELERA:
+        try:
+            import send2trash  # noqa: F401
+        except ImportError:
+            raise click.UsageError("--dedupe trash needs the Send2Trash package.")
+    if watch and (save_plan or apply_plan or journal or resume or incremental):
+        raise click.UsageError("--watch cannot be combined with plans, journals or --incremental.")
+
+    # A saved plan or a resumed run is always applied to disk
+    apply = apply or apply_plan is not None or resume
+
+    # cProfile of the whole command (the dump is written on exit, even after an early return)
+    if profile is not None:
+        perfil = PerfilHilos()
+        perfil.iniciar()
+        click.get_current_context().call_on_close(lambda: perfil.guardar(profile))
+
     # Configuration for files/errors counter
     stats = Stats()
     
@@ -107,7 +342,10 @@ def cli(
 
     # Log configuration
     ruta_log_obj = Path(log_file)
-    log_config(ruta_log_obj, log_level)
+    log_config(
+        ruta_log_obj, log_level, tamano_maximo=int(log_max_mb * 1_048_576),
+        rotar_cada=log_rotate_days * 86_400, comprimir=log_compress
+    )
     logging.info(f"Starting file organizer {__version__}")
     
     # Resolve rules file path (PyInstaller/Local support)
@@ -123,7 +361,7 @@ def cli(
         return
     
     # Selection of specific and excluded files
-    carpetas_destino = {k.lower() for k in reglas.keys()}
+    carpetas_destino = {k.lower() for k in reglas.carpetas}
     exclude_set = {e.lower() for e in exclude}
     exclude_set.update(carpetas_destino) # Avoid organizing already organized folders
     only_set = set(only)
@@ -147,25 +385,185 @@ def cli(
         return 
     
     
+    # Every applied run is recorded so it can be undone later
+    historial = HistorialMovimientos(history_db or ruta_log_obj / "history.sqlite") if apply else None
+    
+    # Incremental mode: folder state of the previous runs, one cache per root, walk options and rules
+    cache = None
+    if incremental:
+        huella = (
+            f"recursive={recursive};exclude={sorted(exclude_set)};only={sorted(only_set)};hidden={ignore_hidden};"
+            f"rules={hashlib.sha1(ruta_config_final.read_bytes()).hexdigest()};sniff={sniff.lower()}"
+        )
+        cache = CacheDirectorios(ruta_cache(ruta_log_obj / "cache", ruta_objetivo), ruta_objetivo, huella)
+    
+    # Content sniffing: file headers, cached by (device, inode, size, mtime)
+    detector = None
+    if sniff != SNIFF_OFF:
+        detector = DetectorContenido(ruta_log_obj / "cache" / "signatures.sqlite", reglas, sniff.lower())
+    
+    # Duplicate detection on name collisions (hashes cached by inode, size and mtime)
+    deduplicador = None
+    if dedupe != "off":
+        deduplicador = Deduplicador(ruta_log_obj / "cache" / "hashes.sqlite", reglas, dedupe.lower())
+    
+    # Output of the engine events: terminal, log file and optionally JSON lines
+    salidas = [SalidaConsola(solo_resumen=quiet), SalidaLog()]
+    if events_jsonl is not None:
+        salida_jsonl = SalidaJSONL(events_jsonl)
+        click.get_current_context().call_on_close(salida_jsonl.cerrar)
+        salidas.append(salida_jsonl)
+
+    # WATCH MODE
+    if watch:
+        if apply and not (yes or click.confirm(click.style(f"Confirm organizing files in {ruta_objetivo} until stopped?", fg="red", bold=True))):
+            click.echo("Operation aborted.")
+            return
+
+        try:
+            vigilante = Vigilante(ruta_objetivo, recursive, FiltroArchivos(exclude_set, only_set, ignore_hidden), watch_delay)
+        except OSError as e:
+            logging.error(f"Could not start watch mode: {e}")
+            click.echo(click.style(f"Could not start watch mode: {e}", fg="red"))
+            return
+
+        if not apply:
+            click.echo(click.style("\n[SIMULATION MODE] No real changes will be made.", fg="blue", bold=True))
+        click.echo(click.style(f"Watching {ruta_objetivo} for new files. Press Ctrl+C to stop.", fg="yellow"))
+        logging.info(f"Watching {ruta_objetivo} (recursive: {recursive})")
+
+        # SIGTERM (service managers, kill) stops watching cleanly, like Ctrl+C
+        detener = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: detener.set())
+
+        try:
+            for lote in vigilante.lotes(stop_event=detener):
+                logging.info(f"Watch: {len(lote)} new files ready")
+                motor = mover_archivos if apply else simulacion
+                extra = {"workers": workers, "historial": historial} if apply else {}
+                consumir(motor(
+                    ruta_objetivo, reglas, recursive, exclude_set, only_set, ignore_hidden, stats,
+                    lista_archivos=lote, stop_event=detener, detector=detector, deduplicador=deduplicador, **extra
+                ), salidas)
+            click.echo("\nWatch mode stopped.")
+            logging.info("Watch mode stopped")
+        except KeyboardInterrupt:
+            click.echo("\nWatch mode stopped.")
+            logging.info("Watch mode stopped by user")
+
     # SIMULATION MODE
-    if not apply:
+    elif not apply:
         click.echo(click.style("\n[SIMULATION MODE] No real changes will be made.", fg="blue", bold=True))
-        for _ in simulacion(ruta_objetivo, reglas, recursive, exclude_set, only_set, ignore_hidden, stats, lista_archivos=None, stop_event=None):
-            pass # We do nothing with the yield, forcing script execution
-        click.echo(click.style("\nTo apply these changes, use the flag: --apply", fg="yellow"))
+        plan = PlanMovimientos(ruta_objetivo) if save_plan else None
+        consumir(simulacion(
+            ruta_objetivo, reglas, recursive, exclude_set, only_set, ignore_hidden, stats,
+            lista_archivos=None, stop_event=None, scan_workers=scan_workers, ordenado=ordenado, plan=plan, cache=cache,
+            detector=detector, deduplicador=deduplicador
+        ), salidas)
+
+        if plan is not None:
+            plan.guardar(save_plan)
+            logging.info(f"Move plan saved: {save_plan} ({len(plan)} moves)")
+            click.echo(click.style(f"\nPlan saved to {save_plan}. Apply it with: --apply-plan {save_plan}", fg="yellow"))
+        else:
+            click.echo(click.style("\nTo apply these changes, use the flag: --apply", fg="yellow"))
+
+    # SAVED PLAN MODE
+    elif apply_plan is not None:
+        try:
+            plan = PlanMovimientos.cargar(apply_plan)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not load plan {apply_plan}: {e}")
+            click.echo(click.style(f"Could not load plan {apply_plan}: {e}", fg="red"))
+            return
+
+        if plan.base != ruta_objetivo:
+            click.echo(click.style(f"The plan was made for {plan.base}, not {ruta_objetivo}.", fg="red"))
+            return
+
+        if yes or click.confirm(click.style(f"Confirm applying {len(plan)} planned moves in {ruta_objetivo}?", fg="red", bold=True)):
+            consumir(aplicar_plan(plan, reglas, stats, stop_event=None, workers=workers, historial=historial), salidas)
+        else:
+            click.echo("Operation aborted.")
+            return
     
+    # RESUME MODE
+    elif resume:
+        try:
+            estado = leer_estado(journal)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not read journal {journal}: {e}")
+            click.echo(click.style(f"Could not read journal {journal}: {e}", fg="red"))
+            return
+
+        if estado.base != ruta_objetivo:
+            click.echo(click.style(f"The journal belongs to {estado.base}, not {ruta_objetivo}.", fg="red"))
+            return
+        if estado.terminado:
+            click.echo("The journaled run already finished. Nothing to resume.")
+            return
+
+        if not (yes or click.confirm(click.style(f"Resume {estado.pendientes} pending moves in {ruta_objetivo}?", fg="red", bold=True))):
+            click.echo("Operation aborted.")
+            return
+
+        logging.info(f"Resuming journal {journal}: {estado.pendientes} pending moves")
+        diario = DiarioMovimientos.continuar(journal, estado, journal_sync)
+        try:
+            consumir(reanudar_diario(diario, reglas, stats, stop_event=None, workers=workers, historial=historial), salidas)
+
+            # Interrupted while planning: the files never planned still need a scan
+            if not estado.planificacion_completa:
+                click.echo(click.style("\nThe interrupted run had not finished planning. Scanning for the remaining files.", fg="yellow"))
+                consumir(mover_archivos(
+                    ruta_objetivo, reglas, recursive, exclude_set, only_set, ignore_hidden, stats,
+                    lista_archivos=None, stop_event=None, scan_workers=scan_workers, ordenado=ordenado,
+                    workers=workers, diario=diario, historial=historial, detector=detector, deduplicador=deduplicador
+                ), salidas)
+        finally:
+            diario.cerrar()
+
     # EXECUTION MODE
     else:
         # Extra confirmation before applying
         if yes or click.confirm(click.style(f"Confirm applying changes in {ruta_objetivo}?", fg="red", bold=True)):
-            for _ in mover_archivos(
-                ruta_objetivo, reglas, recursive, exclude_set, only_set, ignore_hidden, stats, lista_archivos=None, stop_event=None
-            ):
-                pass # Same as simulation, ignore yield
+            diario = None
+            if journal is not None:
+                if not diario_descartable(journal, yes):
+                    click.echo("Operation aborted. Use --resume to continue the previous run.")
+                    return
+                diario = DiarioMovimientos.crear(journal, ruta_objetivo, journal_sync)
+
+            try:
+                consumir(mover_archivos(
+                    ruta_objetivo, reglas, recursive, exclude_set, only_set, ignore_hidden, stats,
+                    lista_archivos=None, stop_event=None, scan_workers=scan_workers, ordenado=ordenado,
+                    workers=workers, diario=diario, historial=historial, cache=cache,
+                    detector=detector, deduplicador=deduplicador
+                ), salidas)
+            finally:
+                if diario is not None:
+                    diario.cerrar()
         else:
             click.echo("Operation aborted.")
             return
 
+    if cache is not None:
+        cache.guardar()
+        cache.cerrar()
+        logging.info(f"Incremental scan: {cache.reutilizadas} folders unchanged, {cache.listadas} listed")
+
+    if deduplicador is not None:
+        deduplicador.cerrar()
+
+    if detector is not None:
+        detector.cerrar()
+        logging.info(f"Content sniffing: {detector.leidos} headers read, {detector.en_cache} from cache")
+
+    if historial is not None:
+        historial.cerrar()
+        click.echo(click.style("\nTo revert this run, use: python main_undo.py", fg="yellow"))
+
     # Calculate total execution time
     end_time = time.perf_counter()
     tiempo_total = end_time - start_time
@@ -176,16 +574,35 @@ def cli(
     click.echo(f"Total Time:       {tiempo_total:.4f} sec")
     click.echo(f"Files Processed:  {stats.procesados}")
     click.echo(f"Files Skipped:    {stats.saltados}")
-    click.echo(f"Files Excluded:   {stats.excluidos}")
+    click.echo(f"Excluded Entries: {stats.excluidos} (pruned folders + excluded files)")
+    if apply:
+        click.echo(f"Fast Renames:     {stats.renombrados} ({stats.bytes_renombrados / 1_048_576:.1f} MB)")
+        click.echo(f"Device Copies:    {stats.copias} ({stats.bytes_copiados / 1_048_576:.1f} MB)")
+    if deduplicador is not None:
+        click.echo(f"Duplicates:       {stats.duplicados} ({stats.bytes_ahorrados / 1_048_576:.1f} MB saved)")
     click.echo(
         click.style(
             f"Critical Errors:  {stats.errores}",
             fg="red" if stats.errores > 0 else "white",
         )
     )
+    if apply and tiempo_total > 0:
+        click.echo(f"Throughput:       {stats.procesados / tiempo_total:.1f} files/s")
     click.echo(click.style("=" * 30, fg="bright_black"))
 
+    if profile is not None:
+        mostrar_fases(stats)
+
+    if stats_json is not None:
+        datos = {"version": __version__, "path": str(ruta_objetivo), "applied": apply, **stats.como_dict(tiempo_total)}
+        try:
+            stats_json.write_text(json.dumps(datos, indent=2), encoding="utf-8")
+        except OSError as e:
+            logging.error(f"Could not write stats to {stats_json}: {e}")
+
     # Summary log
     logging.info(
-        f"Session finished. Processed: {stats.procesados}, Skipped: {stats.saltados}, Excluded: {stats.excluidos}, Errors: {stats.errores}"
+        f"Session finished. Processed: {stats.procesados}, Skipped: {stats.saltados}, Excluded: {stats.excluidos}, Errors: {stats.errores}, "
+        f"Renames: {stats.renombrados} ({stats.bytes_renombrados} bytes), Device copies: {stats.copias} ({stats.bytes_copiados} bytes), "
+        f"Duplicates: {stats.duplicados} ({stats.bytes_ahorrados} bytes saved)"
     )
\ No newline at end of file
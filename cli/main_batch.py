@@ -0,0 +1,6 @@
+# main_batch.py
+
+from cli.batch import batch
+
+if __name__ == "__main__":
+    batch()
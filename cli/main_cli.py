@@ -1,6 +1,10 @@
 # main_cli.py
 
+import multiprocessing
+
 from cli.cli import cli
 
 if __name__ == "__main__":
+    # Ejecutables congelados: los procesos del deduplicador no vuelven a lanzar la CLI
+    multiprocessing.freeze_support()
     cli()
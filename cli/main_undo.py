@@ -0,0 +1,6 @@
+# main_undo.py
+
+from cli.undo import undo
+
+if __name__ == "__main__":
+    undo()
@@ -0,0 +1,121 @@
+# undo.py
+
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import click
+
+from core.engine import deshacer_ejecucion
+from core.eventos import SalidaConsola, SalidaLog, consumir
+from core.historial import HistorialMovimientos
+from core.stats import Stats
+from core.logging_utils import obtener_ruta_base, log_config
+
+
+def _fecha(marca) -> str:
+    return datetime.fromtimestamp(marca).strftime("%Y-%m-%d %H:%M:%S") if marca else "unfinished"
+
+
+@click.command()
+@click.option(
+    "--run",
+    "ejecucion",
+    type=click.IntRange(min=1),
+    help="Id of the run to undo (default: the last run not undone yet)."
+)
+@click.option(
+    "--list",
+    "listar",
+    is_flag=True,
+    help="List the recorded runs and exit."
+)
+@click.option(
+    "--history-db",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Record of the applied runs [default: <log-file>/history.sqlite]."
+)
+@click.option(
+    "--log-file",
+    type=click.Path(file_okay=False, dir_okay=True, writable=True, path_type=Path),
+    default=lambda: obtener_ruta_base() / "logs",
+    help="Directory where logs will be saved.",
+)
+@click.option(
+    "--log-level",
+    type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR"], case_sensitive=False),
+    default="INFO",
+    help="Log detail level.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Files moved back in parallel."
+)
+@click.option(
+    "--yes",
+    "-y", is_flag=True,
+    help="Skip manual confirmation."
+)
+def undo(ejecucion, listar, history_db, log_file, log_level, workers, yes):
+    """Moves the files of an applied run back to their original folders."""
+    ruta_historial = history_db or Path(log_file) / "history.sqlite"
+    if not ruta_historial.exists():
+        click.echo(f"No run history found at {ruta_historial}.")
+        return
+
+    log_config(Path(log_file), log_level)
+    historial = HistorialMovimientos(ruta_historial)
+
+    try:
+        if listar:
+            for id_, base, inicio, fin, movidos, deshecha in historial.ejecuciones():
+                estado = " (undone)" if deshecha else ""
+                click.echo(f"#{id_}  {_fecha(inicio)}  {movidos:>7} files  {base}{estado}")
+            return
+
+        fila = historial.ejecucion(ejecucion) if ejecucion else historial.ultima_ejecucion()
+        if fila is None:
+            click.echo("There is no run to undo." if ejecucion is None else f"Run #{ejecucion} not found.")
+            return
+
+        id_, base, inicio, fin, movidos, deshecha = fila
+        if deshecha:
+            click.echo(f"Run #{id_} was already undone.")
+            return
+
+        click.echo(f"Run #{id_} in {base} ({_fecha(inicio)}): {movidos} files moved.")
+        if not (yes or click.confirm(click.style(f"Move {movidos} files back to their original folders?", fg="red", bold=True))):
+            click.echo("Operation aborted.")
+            return
+
+        stats = Stats()
+        start_time = time.perf_counter()
+        logging.info(f"Undoing run {id_} ({movidos} moves) in {base}")
+
+        consumir(deshacer_ejecucion(historial, id_, stats, stop_event=None, workers=workers), [SalidaConsola(), SalidaLog()])
+    finally:
+        historial.cerrar()
+
+    tiempo_total = time.perf_counter() - start_time
+
+    # --- FINAL SUMMARY ---
+    click.echo(click.style("\n" + "=" * 30, fg="bright_black"))
+    click.echo(click.style("UNDO SUMMARY", bold=True))
+    click.echo(f"Total Time:       {tiempo_total:.4f} sec")
+    click.echo(f"Files Restored:   {stats.procesados}")
+    click.echo(f"Files Missing:    {stats.saltados}")
+    click.echo(
+        click.style(
+            f"Critical Errors:  {stats.errores}",
+            fg="red" if stats.errores > 0 else "white",
+        )
+    )
+    click.echo(click.style("=" * 30, fg="bright_black"))
+
+    logging.info(
+        f"Undo finished. Restored: {stats.procesados}, Missing: {stats.saltados}, Errors: {stats.errores}"
+    )
@@ -0,0 +1,82 @@
+# core/colisiones.py
+
+import os
+import logging
+import threading
+from pathlib import Path
+
+
+class IndiceNombres:
+    """
+    Names present in each destination folder plus the names already claimed
+    by planned moves. Every folder is listed once, the first time it is used,
+    and a next-free '_copyN' counter is kept per stem. Safe to share between
+    the planning thread and the threads releasing names of failed moves.
+    """
+
+    def __init__(self):
+        self._nombres: dict[Path, set[str]] = {}
+        self._contadores: dict[tuple[Path, str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def _cargar(self, carpeta: Path) -> set:
+        nombres = self._nombres.get(carpeta)
+        if nombres is not None:
+            return nombres
+
+        try:
+            with os.scandir(carpeta) as it:
+                nombres = {os.path.normcase(entrada.name) for entrada in it}
+        except FileNotFoundError:
+            nombres = set()
+        except OSError as e:
+            logging.warning(f"Could not list destination folder {carpeta}: {e}")
+            nombres = set()
+
+        self._nombres[carpeta] = nombres
+        return nombres
+
+    def reservar(self, carpeta: Path, nombre: str, stem: str, extension: str) -> tuple[Path, bool]:
+        """
+        Claims a free name in 'carpeta'. Returns the final path and whether
+        it had to be renamed because of a collision
+        """
+        with self._lock:
+            return self._reservar(carpeta, nombre, stem, extension)
+
+    def _reservar(self, carpeta: Path, nombre: str, stem: str, extension: str) -> tuple[Path, bool]:
+        nombres = self._cargar(carpeta)
+
+        clave = os.path.normcase(nombre)
+        if clave not in nombres:
+            nombres.add(clave)
+            return carpeta / nombre, False
+
+        clave_stem = (carpeta, os.path.normcase(stem), extension)
+        contador = self._contadores.get(clave_stem, 1)
+        while True:
+            nuevo_nombre = f"{stem}_copy{contador}{extension}"
+            contador += 1
+            if os.path.normcase(nuevo_nombre) not in nombres:
+                break
+
+        self._contadores[clave_stem] = contador
+        nombres.add(os.path.normcase(nuevo_nombre))
+        return carpeta / nuevo_nombre, True
+
+    def familia(self, carpeta: Path, pertenece) -> list:
+        """Names taken in 'carpeta' (on disk or claimed) that meet 'pertenece', normcased"""
+        with self._lock:
+            return [nombre for nombre in self._cargar(carpeta) if pertenece(nombre)]
+
+    def liberar(self, destino: Path):
+        """Releases a claimed name (e.g. the move failed)"""
+        with self._lock:
+            nombres = self._nombres.get(destino.parent)
+            if nombres is not None:
+                nombres.discard(os.path.normcase(destino.name))
+
+    def ocupar(self, destino: Path):
+        """Marks a name as taken without collision checks (already planned)"""
+        with self._lock:
+            self._cargar(destino.parent).add(os.path.normcase(destino.name))
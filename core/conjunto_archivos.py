@@ -0,0 +1,148 @@
+# core/conjunto_archivos.py
+
+import os
+from array import array
+from pathlib import Path
+
+from core.engine import RutaEscaneada, StatCompacto
+
+
+def _codificar(nombre: str) -> bytes:
+    # surrogateescape: nombres que no son UTF-8 valido vuelven intactos
+    return nombre.encode("utf-8", "surrogateescape")
+
+
+def _decodificar(datos) -> str:
+    return bytes(datos).decode("utf-8", "surrogateescape")
+
+
+class ConjuntoArchivos:
+    """
+    Compact file list for very large trees. Parent folders are interned in a
+    table; names are packed one after another in a single bytearray indexed
+    by an offsets array; with metadatos=True size and mtime live in parallel
+    arrays. An entry costs ~16 bytes plus its name, against several hundred
+    for a pathlib.Path.
+
+    Iterating yields paths built on the fly, so it can be passed as
+    'lista_archivos' wherever the engine accepts a file list. With metadatos
+    they are RutaEscaneada carrying their size and mtime ('st'), so the
+    engine does not stat them again.
+    """
+
+    def __init__(self, metadatos: bool = False):
+        self.metadatos = metadatos
+        self._carpetas: list[str] = []
+        self._id_carpeta: dict[str, int] = {}
+
+        self._nombres = bytearray()
+        self._desplazamientos = array("Q", [0])
+        self._carpeta = array("I")
+        self._tamanos = array("q")
+        self._mtimes = array("q")
+
+    def agregar(self, ruta, tamano: int = -1, mtime_ns: int = -1):
+        carpeta, nombre = os.path.split(os.fspath(ruta))
+        self.agregar_entrada(carpeta, nombre, tamano, mtime_ns)
+
+    def agregar_entrada(self, carpeta: str, nombre: str, tamano: int = -1, mtime_ns: int = -1):
+        id_carpeta = self._id_carpeta.get(carpeta)
+        if id_carpeta is None:
+            id_carpeta = self._id_carpeta[carpeta] = len(self._carpetas)
+            self._carpetas.append(carpeta)
+        self._carpeta.append(id_carpeta)
+        self._nombres += _codificar(nombre)
+        self._desplazamientos.append(len(self._nombres))
+
+        if self.metadatos:
+            self._tamanos.append(tamano)
+            self._mtimes.append(mtime_ns)
+
+    @classmethod
+    def desde_rutas(cls, rutas, metadatos: bool = False) -> "ConjuntoArchivos":
+        """
+        Builds the set from any iterable of paths (e.g. iterar_archivos).
+        With metadatos the size and mtime of each file are kept, from the
+        walk's stat when the path carries one, else with a new stat
+        """
+        conjunto = cls(metadatos)
+        for ruta in rutas:
+            carpeta, nombre = os.path.split(os.fspath(ruta))
+
+            tamano = mtime_ns = -1
+            if metadatos:
+                # El recorrido con con_stat ya trae el stat de cada archivo
+                st = getattr(ruta, "st", None)
+                try:
+                    if st is None:
+                        st = os.stat(ruta)
+                    tamano, mtime_ns = st.st_size, st.st_mtime_ns
+                except OSError:
+                    pass
+            conjunto.agregar_entrada(carpeta, nombre, tamano, mtime_ns)
+        return conjunto
+
+    # --- Acceso ---
+
+    def __len__(self) -> int:
+        return len(self._carpeta)
+
+    def nombre(self, i: int) -> str:
+        return _decodificar(self._nombres[self._desplazamientos[i]:self._desplazamientos[i + 1]])
+
+    def carpeta(self, i: int) -> str:
+        return self._carpetas[self._carpeta[i]]
+
+    def ruta(self, i: int) -> Path:
+        if not self.metadatos:
+            return Path(self._carpetas[self._carpeta[i]], self.nombre(i))
+        ruta = RutaEscaneada(self._carpetas[self._carpeta[i]], self.nombre(i))
+        st = self.stat(i)
+        if st is not None:
+            ruta.st = st
+        return ruta
+
+    def __getitem__(self, i: int) -> Path:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.ruta(i)
+
+    def tamano(self, i: int) -> int:
+        return self._tamanos[i] if self.metadatos else -1
+
+    def mtime_ns(self, i: int) -> int:
+        return self._mtimes[i] if self.metadatos else -1
+
+    def stat(self, i: int):
+        """Size and mtime of an entry as a StatCompacto, or None if they are unknown"""
+        if not self.metadatos or self._tamanos[i] < 0:
+            return None
+        return StatCompacto(self._tamanos[i], self._mtimes[i])
+
+    def __iter__(self):
+        # Un Path por carpeta, creado al recorrerla; cada archivo solo agrega su nombre
+        clase = RutaEscaneada if self.metadatos else Path
+        padres = {}
+        nombres = memoryview(self._nombres)
+        desplazamientos = self._desplazamientos
+        try:
+            for i, id_carpeta in enumerate(self._carpeta):
+                padre = padres.get(id_carpeta)
+                if padre is None:
+                    padre = padres[id_carpeta] = clase(self._carpetas[id_carpeta])
+                ruta = padre / _decodificar(nombres[desplazamientos[i]:desplazamientos[i + 1]])
+                if self.metadatos and self._tamanos[i] >= 0:
+                    ruta.st = StatCompacto(self._tamanos[i], self._mtimes[i])
+                yield ruta
+        finally:
+            # Una vista abierta impide que el bytearray crezca
+            nombres.release()
+
+    def memoria(self) -> int:
+        """Approximate bytes used by the arrays and the folder table"""
+        arrays = (self._desplazamientos, self._carpeta, self._tamanos, self._mtimes)
+        total = len(self._nombres) + sum(a.itemsize * len(a) for a in arrays)
+        total += sum(len(c) + 49 for c in self._carpetas)
+        return total
@@ -0,0 +1,346 @@
+# core/duplicados.py
+
+import os
+import stat
+import hashlib
+import logging
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from core.rules import ReglasCompiladas
+
+
+# Acciones de un movimiento (la primera es un movimiento normal)
+MOVER = "move"
+OMITIR = "skip"
+ENLAZAR = "hardlink"
+PAPELERA = "trash"
+ACCIONES = (MOVER, OMITIR, ENLAZAR, PAPELERA)
+
+# Bloques leidos del inicio y del final para el hash parcial
+BLOQUE_PARCIAL = 64 * 1024
+_LECTURA = 1 << 20
+
+# Movimientos comparados por tanda
+TAMANO_TANDA = 256
+
+
+def _resumen():
+    return hashlib.blake2b(digest_size=20)
+
+
+def _abrir_primera(rutas):
+    """Opens the first existing path (a planned file may already have been moved)"""
+    for ruta in rutas:
+        try:
+            return open(ruta, "rb")
+        except FileNotFoundError:
+            continue
+    raise FileNotFoundError(rutas[-1])
+
+
+def _hash_parcial(rutas) -> bytes:
+    with _abrir_primera(rutas) as f:
+        resumen = _resumen()
+        resumen.update(f.read(BLOQUE_PARCIAL))
+        tamano = os.fstat(f.fileno()).st_size
+        if tamano > 2 * BLOQUE_PARCIAL:
+            f.seek(-BLOQUE_PARCIAL, os.SEEK_END)
+        resumen.update(f.read(BLOQUE_PARCIAL))
+        return resumen.digest()
+
+
+def _hash_completo(rutas) -> bytes:
+    """Runs in the process pool"""
+    with _abrir_primera(rutas) as f:
+        resumen = _resumen()
+        for bloque in iter(lambda: f.read(_LECTURA), b""):
+            resumen.update(bloque)
+        return resumen.digest()
+
+
+def _clave(rutas):
+    """(device, inode, size, mtime) of the first existing path, or None if it is not a regular file"""
+    for ruta in rutas:
+        try:
+            st = os.lstat(ruta)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+    return None
+
+
+class _Candidato:
+    __slots__ = ("rutas", "clave", "planificado")
+
+    def __init__(self, rutas: tuple, planificado: int = -1):
+        self.rutas = rutas
+        self.clave = None
+        self.planificado = planificado    # Posicion en la tanda, -1 si ya existia
+
+
+class Deduplicador:
+    """
+    Checks name collisions for duplicate content before a '_copyN' copy is
+    made. The colliding file is compared with the destination files of the
+    same name family ('name', 'name_copyN') in three steps: size, a hash of
+    the first and last blocks, and finally a full hash computed in a process
+    pool. Confirmed duplicates get 'accion' (skip, hardlink or trash) instead
+    of being moved. A file that already is the kept copy (same inode, e.g.
+    hardlinked by an earlier run) is settled: it is dropped from the plan
+    without hashing.
+
+    The names of each destination folder come from the run's IndiceNombres;
+    of the planned moves only the ones not executed yet are kept (their
+    content is still at the origin), until the execute stage reports them
+    with completado(). Hashes are cached in SQLite by (device, inode, size,
+    mtime).
+    """
+
+    def __init__(self, ruta_cache: Path, reglas: ReglasCompiladas, accion: str, workers: int = None):
+        self.reglas = reglas
+        self.accion = accion
+        self.workers = workers
+        self.duplicados = 0
+        self.asentados = 0
+        self._pendientes: dict[Path, Path] = {}
+        self._parciales: dict[tuple, bytes] = {}
+        self._completos: dict[tuple, bytes] = {}
+        self._lock = threading.Lock()
+
+        Path(ruta_cache).parent.mkdir(parents=True, exist_ok=True)
+        self._conexion = sqlite3.connect(ruta_cache, check_same_thread=False)
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " dispositivo INTEGER NOT NULL, inodo INTEGER NOT NULL, tamano INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL, parcial BLOB NOT NULL, completo BLOB,"
+            " PRIMARY KEY (dispositivo, inodo)) WITHOUT ROWID"
+        )
+
+    # --- Cache ---
+
+    def _cargar(self, clave: tuple):
+        if clave in self._parciales:
+            return
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT parcial, completo FROM hashes WHERE dispositivo = ? AND inodo = ? AND tamano = ? AND mtime_ns = ?",
+                clave,
+            ).fetchone()
+        if fila is not None:
+            self._parciales[clave] = fila[0]
+            if fila[1] is not None:
+                self._completos[clave] = fila[1]
+
+    def _guardar(self, claves):
+        filas = [(*clave, self._parciales[clave], self._completos.get(clave)) for clave in claves]
+        if filas:
+            with self._lock, self._conexion:
+                self._conexion.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)", filas)
+
+    # --- Candidatos ---
+
+    def _familia(self, nombre: str):
+        """Predicate for the names a colliding 'nombre' may have been given"""
+        extension = self.reglas.clasificar(nombre)[1]
+        stem = os.path.normcase(nombre[: len(nombre) - len(extension)]) + "_copy"
+        extension = os.path.normcase(extension)
+        original = os.path.normcase(nombre)
+
+        def pertenece(clave: str) -> bool:
+            if clave == original:
+                return True
+            if not (clave.startswith(stem) and clave.endswith(extension)):
+                return False
+            numero = clave[len(stem): len(clave) - len(extension)]
+            return numero.isdigit()
+
+        return pertenece
+
+    @staticmethod
+    def _clave_pendiente(destino: Path) -> Path:
+        return destino.parent / os.path.normcase(destino.name)
+
+    def _candidatos(self, mov, tanda_carpeta: dict, indice) -> list:
+        carpeta = mov.destino.parent
+        en_tanda = tanda_carpeta.get(carpeta, {})
+        candidatos = []
+        for clave in indice.familia(carpeta, self._familia(mov.origen.name)):
+            planificado = en_tanda.get(clave)
+            if planificado is not None:
+                posicion, destino, origen = planificado
+                candidatos.append(_Candidato((destino, origen), posicion))
+                continue
+            # Planificado en una tanda anterior y sin ejecutar: el contenido sigue en el origen
+            destino = carpeta / clave
+            origen = self._pendientes.get(destino)
+            candidatos.append(_Candidato((destino,) if origen is None else (destino, origen)))
+        return candidatos
+
+    def completado(self, mov):
+        """The execute stage is done with 'mov' (moved or failed): its origin is no longer needed"""
+        self._pendientes.pop(self._clave_pendiente(mov.destino), None)
+
+    # --- Comparacion ---
+
+    def _hashes(self, claves_rutas: dict, pool_hilos, pool_procesos, completos_necesarios):
+        faltan = [clave for clave in claves_rutas if clave not in self._parciales]
+        for clave, parcial in zip(faltan, pool_hilos.map(self._parcial_o_nada, [claves_rutas[c] for c in faltan])):
+            if parcial is not None:
+                self._parciales[clave] = parcial
+
+        faltan_completos = [
+            clave for clave in completos_necesarios
+            if clave in self._parciales and clave not in self._completos
+        ]
+        if faltan_completos:
+            rutas = [claves_rutas[clave] for clave in faltan_completos]
+            for clave, futuro in zip(faltan_completos, [pool_procesos().submit(_hash_completo, r) for r in rutas]):
+                try:
+                    self._completos[clave] = futuro.result()
+                except OSError as e:
+                    logging.warning(f"Could not hash {claves_rutas[clave][0]}: {e}")
+
+        self._guardar([clave for clave in set(faltan) | set(faltan_completos) if clave in self._parciales])
+
+    @staticmethod
+    def _parcial_o_nada(rutas):
+        try:
+            return _hash_parcial(rutas)
+        except OSError as e:
+            logging.warning(f"Could not hash {rutas[0]}: {e}")
+            return None
+
+    def _iguales(self, a: tuple, b: tuple) -> bool:
+        if a == b:
+            return True
+        if a[2] != b[2] or a not in self._parciales or self._parciales.get(a) != self._parciales.get(b):
+            return False
+        # Cabe entero en los bloques del hash parcial
+        if a[2] <= 2 * BLOQUE_PARCIAL:
+            return True
+        return a in self._completos and self._completos.get(a) == self._completos.get(b)
+
+    def _tanda(self, movs: list, indice, pool_hilos, pool_procesos, stats):
+        # Destinos planificados en esta misma tanda, por carpeta
+        tanda_carpeta: dict[Path, dict] = {}
+        for posicion, mov in enumerate(movs):
+            tanda_carpeta.setdefault(mov.destino.parent, {})[os.path.normcase(mov.destino.name)] = (
+                posicion, mov.destino, mov.origen
+            )
+
+        # 1. Tamano: solo las colisiones con candidatos del mismo tamano siguen
+        comparaciones = {}
+        claves_rutas = {}
+        asentados = set()
+        for posicion, mov in enumerate(movs):
+            if not mov.renombrado:
+                continue
+            clave_origen = _clave((mov.origen,))
+            if clave_origen is None:
+                continue
+            iguales = []
+            for candidato in self._candidatos(mov, tanda_carpeta, indice):
+                if 0 <= candidato.planificado and candidato.planificado >= posicion:
+                    continue
+                candidato.clave = _clave(candidato.rutas)
+                if candidato.clave is None or candidato.clave[2] != clave_origen[2]:
+                    continue
+                if candidato.planificado < 0 and candidato.clave[:2] == clave_origen[:2]:
+                    # Ya es la copia que se conserva (enlazada en una corrida anterior)
+                    asentados.add(posicion)
+                    break
+                iguales.append(candidato)
+            if posicion in asentados:
+                continue
+            for candidato in iguales:
+                claves_rutas[candidato.clave] = candidato.rutas
+            if iguales:
+                claves_rutas[clave_origen] = (mov.origen,)
+                comparaciones[posicion] = (clave_origen, iguales)
+
+        # 2. Hash parcial y 3. hash completo de los grupos que siguen empatados
+        for clave in claves_rutas:
+            self._cargar(clave)
+        self._hashes(claves_rutas, pool_hilos, pool_procesos, ())
+        completos = set()
+        for clave_origen, iguales in comparaciones.values():
+            if clave_origen[2] <= 2 * BLOQUE_PARCIAL:
+                continue
+            parcial = self._parciales.get(clave_origen)
+            for candidato in iguales:
+                if parcial is not None and self._parciales.get(candidato.clave) == parcial:
+                    completos.update((clave_origen, candidato.clave))
+        if completos:
+            self._hashes(claves_rutas, pool_hilos, pool_procesos, completos)
+
+        # Decision en orden: un archivo solo puede duplicar a uno anterior que si se mueve
+        descartados = set()
+        for posicion, mov in enumerate(movs):
+            if posicion in asentados:
+                indice.liberar(mov.destino)
+                descartados.add(posicion)
+                self.asentados += 1
+                if stats is not None:
+                    stats.registrar_saltados()
+                continue
+
+            comparacion = comparaciones.get(posicion)
+            if comparacion is not None:
+                clave_origen, iguales = comparacion
+                for candidato in iguales:
+                    if candidato.planificado in descartados:
+                        continue
+                    if self._iguales(clave_origen, candidato.clave):
+                        indice.liberar(mov.destino)
+                        descartados.add(posicion)
+                        self.duplicados += 1
+                        mov = mov._replace(destino=candidato.rutas[0], renombrado=False, accion=self.accion)
+                        break
+
+            if mov.accion == MOVER:
+                self._pendientes[self._clave_pendiente(mov.destino)] = mov.origen
+            yield mov
+
+    def filtrar(self, movimientos, indice, stop_event=None, stats=None):
+        """
+        Streams the planned moves of one run, with confirmed duplicates
+        turned into 'accion' and settled files (counted as skipped) dropped
+        """
+        procesos = None
+
+        def pool_procesos():
+            nonlocal procesos
+            if procesos is None:
+                # spawn: un fork desde un proceso con hilos (escaneo, logs) puede heredar locks tomados
+                procesos = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return procesos
+
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="hash") as pool_hilos:
+            try:
+                tanda = []
+                for mov in movimientos:
+                    tanda.append(mov)
+                    if len(tanda) >= TAMANO_TANDA:
+                        yield from self._tanda(tanda, indice, pool_hilos, pool_procesos, stats)
+                        tanda = []
+                        if stop_event is not None and stop_event.is_set():
+                            return
+                if tanda:
+                    yield from self._tanda(tanda, indice, pool_hilos, pool_procesos, stats)
+            finally:
+                # Sin mas colisiones que resolver en esta corrida no hacen falta los origenes
+                self._pendientes.clear()
+                if procesos is not None:
+                    procesos.shutdown(cancel_futures=True)
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
@@ -1,36 +1,59 @@
 # core/engine.py
 
-import click
-import shutil
+import os
+import time
 import logging
 import errno
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
 from pathlib import Path
-from typing import Iterable
+from typing import NamedTuple
 
-from core.rules import detectar_categoria
+from core.colisiones import IndiceNombres
+from core.eventos import AVISO, CANCELADO, DUPLICADO, ERROR, MOVIDO, RENOMBRADO, RESUMEN, Evento
+from core.duplicados import ENLAZAR, MOVER, OMITIR, Deduplicador
+from core.firmas import DetectorContenido
+from core.historial import HistorialMovimientos
+from core.incremental import CacheDirectorios
+from core.journal import DiarioMovimientos, leer_estado, movimientos_pendientes
+from core.pipeline import en_segundo_plano
+from core.plan import PlanMovimientos
+from core.rules import CATEGORIA_POR_DEFECTO, ReglasCompiladas
 from core.stats import Stats
-from utils.fs_utils import crear_destinos, crear_carpetas_si_no_existe
+from utils.fs_utils import crear_destinos, mover_entre_dispositivos, renombrar_sin_reemplazar
 
 
-def resolver_destino(archivo: Path, reglas: dict, destinos: dict) -> tuple[str, Path, bool]:
-    extension = archivo.suffix.lower()
-    categoria = detectar_categoria(extension, reglas)
+def _stat_archivo(archivo: Path):
+    """Stat of a file for size and age rules: the one taken by the walk, or a new one"""
+    st = getattr(archivo, "st", None)
+    if st is None:
+        try:
+            st = os.stat(archivo)
+        except OSError:
+            pass
+    return st
 
-    carpeta_destino = destinos.get(categoria, destinos["Others"])
 
-    destino_final = carpeta_destino / archivo.name
-    fue_renombrado = False
+def resolver_destino(
+    archivo: Path, reglas: ReglasCompiladas, destinos: dict, indice: IndiceNombres, por_contenido: str = None
+) -> tuple[str, Path, bool]:
+    nombre = archivo.name
+    st = _stat_archivo(archivo) if reglas.necesita_stat else None
+    categoria, extension, condicional = reglas.clasificar(nombre, st)
 
-    if destino_final.exists():
-        fue_renombrado = True
-        contador = 1
-        while True:
-            nuevo_nombre = f"{archivo.stem}_copy{contador}{extension}"
-            destino_final = carpeta_destino / nuevo_nombre
-            if not destino_final.exists():
-                break
-            contador += 1
+    # Categoria detectada por el contenido (--sniff); una regla con condiciones que se cumplio tiene prioridad
+    if por_contenido is not None and not condicional:
+        categoria = por_contenido
+
+    carpeta_destino = destinos.get(categoria, destinos[CATEGORIA_POR_DEFECTO])
+
+    # Ya esta en su carpeta: no se reserva ningun nombre
+    if carpeta_destino == archivo.parent:
+        return categoria, archivo, False
 
+    stem = nombre[: len(nombre) - len(extension)]
+    destino_final, fue_renombrado = indice.reservar(carpeta_destino, nombre, stem, extension)
     return categoria, destino_final, fue_renombrado
 
 
@@ -38,186 +61,1038 @@ def resolver_destino(archivo: Path, reglas: dict, destinos: dict) -> tuple[str,
 NUNCA_TOCAR_DIR = {"venv", "lib", "scripts", "include", ".git", "__pycache__"}
 NUNCA_TOCAR_FILE = {"pyproject.toml", "pyvenv.cfg"}
 
-def iterar_archivos(
-    base: Path, recursive: bool, exclude: set, only: set, ignore_hidden: bool, stats: Stats
-):
-    exclude = {e.lower() for e in exclude}
-    only = {o.lower() if o.startswith(".") else f".{o.lower()}" for o in only}
+# Segundos entre comprobaciones de stop_event mientras se espera un listado
+_ESPERA_CANCELACION = 0.2
 
-    fuente = base.rglob("*") if recursive else base.iterdir()
 
-    for p in fuente:
-        if not p.is_file():
-            continue
-        
+class FiltroArchivos:
+    """
+    Normalized exclusion rules, checked once per directory entry name.
+    With con_stat the accepted files keep the stat of their DirEntry
+    """
+    __slots__ = ("exclude", "only", "ignore_hidden", "con_stat")
+
+    def __init__(self, exclude: set, only: set, ignore_hidden: bool, con_stat: bool = False):
+        self.exclude = {e.lower() for e in exclude}
+        self.only = {o.lower() if o.startswith(".") else f".{o.lower()}" for o in only}
+        self.ignore_hidden = ignore_hidden
+        self.con_stat = con_stat
+
+    def aceptar_carpeta(self, nombre: str, stats: Stats) -> bool:
+        nombre_lower = nombre.lower()
+
         #Evitar carpetas de configuracion críticas
-        try:
-            relative = p.relative_to(base)
-        except ValueError:
-            continue
+        if nombre_lower in NUNCA_TOCAR_DIR:
+            return False
 
-        if any(part.lower() in NUNCA_TOCAR_DIR for part in relative.parts[:-1]):
-            continue
+        if self.ignore_hidden and nombre.startswith("."):
+            return False
+
+        # Carpeta excluida: no se desciende en ella
+        if nombre_lower in self.exclude:
+            stats.registrar_excluidos()
+            return False
+
+        return True
+
+    def aceptar_archivo(self, nombre: str, stats: Stats) -> bool:
+        nombre_lower = nombre.lower()
 
-        
         #Evitar archivos de configuracion críticos
-        if p.name.lower() in NUNCA_TOCAR_FILE:
-            continue
-        
-        # filtro de archivos ocultos (basado en la ruta completa)
-        if ignore_hidden and any(part.startswith(".") for part in p.parts):
-            continue
+        if nombre_lower in NUNCA_TOCAR_FILE:
+            return False
 
-        # calculo de ruta relativa respecto a la base
-        ruta_relativa = p.relative_to(base)
+        if self.ignore_hidden and nombre.startswith("."):
+            return False
 
-        # filtro de exclusion (exclude)
-        if any(part.lower() in exclude for part in ruta_relativa.parts):
+        if nombre_lower in self.exclude:
             stats.registrar_excluidos()
-            continue
+            return False
 
         # filtro de extensiones permitidas (only)
-        if only and p.suffix.lower() not in only:
+        if self.only and os.path.splitext(nombre_lower)[1] not in self.only:
+            return False
+
+        return True
+
+
+class RutaEscaneada(type(Path())):
+    """
+    Path of a walked file that keeps the stat of its DirEntry ('st'), so
+    size and age rules do not stat it again. Paths derived from it have no
+    'st': read it with getattr(ruta, "st", None)
+    """
+    __slots__ = ("st",)
+
+
+class StatCompacto(NamedTuple):
+    """
+    The stat fields kept for a file listed earlier (ConjuntoArchivos, the
+    directory cache): what size and age rules and the move counters read
+    """
+    st_size: int
+    st_mtime_ns: int
+
+    @property
+    def st_mtime(self) -> float:
+        return self.st_mtime_ns / 1e9
+
+
+def _listar_directorio(carpeta: str, recursive: bool, filtro: FiltroArchivos, ordenado: bool = False):
+    """
+    Lists a single directory using the cached DirEntry type info.
+    Returns the accepted files (as Path), the subfolders to descend into (as str)
+    and the number of excluded entries. Safe to run from worker threads.
+    """
+    archivos = []
+    subcarpetas = []
+    locales = Stats()
+
+    try:
+        with os.scandir(carpeta) as it:
+            entradas = list(it)
+    except OSError as e:
+        logging.warning(f"Could not read folder {carpeta}: {e}")
+        return archivos, subcarpetas, 0
+
+    if ordenado:
+        entradas.sort(key=lambda entrada: entrada.name)
+
+    for entrada in entradas:
+        try:
+            if entrada.is_dir(follow_symlinks=False):
+                if recursive and filtro.aceptar_carpeta(entrada.name, locales):
+                    subcarpetas.append(entrada.path)
+                continue
+            if not entrada.is_file():
+                continue
+        except OSError:
             continue
 
-        yield p
+        # Solo se construye el Path de los archivos que pasan los filtros
+        if not filtro.aceptar_archivo(entrada.name, locales):
+            continue
+        if filtro.con_stat:
+            # Windows lo trae del listado; en POSIX es el unico stat del archivo
+            ruta = RutaEscaneada(entrada.path)
+            try:
+                ruta.st = entrada.stat()
+            except OSError:
+                pass
+            archivos.append(ruta)
+        else:
+            archivos.append(Path(entrada.path))
 
+    return archivos, subcarpetas, locales.excluidos
 
-def mover_archivos(
+
+def _listador(cache: CacheDirectorios, asentado=None):
+    """
+    Listing function of the walk: plain, or through the directory cache
+    (incremental mode), which leaves out the files 'asentado' says stay put
+    """
+    if cache is None:
+        return _listar_directorio
+
+    def listar(carpeta: str, recursive: bool, filtro: FiltroArchivos, ordenado: bool = False):
+        firma, guardado = cache.consultar(carpeta)
+        if guardado is None:
+            resultado = _listar_directorio(carpeta, recursive, filtro, ordenado)
+            cache.registrar(carpeta, firma, resultado, asentado)
+            return resultado
+
+        pendientes, subcarpetas, excluidos = guardado
+        archivos = []
+        for nombre, tamano, mtime_ns in pendientes:
+            if filtro.con_stat:
+                ruta = RutaEscaneada(carpeta, nombre)
+                if tamano >= 0:
+                    ruta.st = StatCompacto(tamano, mtime_ns)
+                archivos.append(ruta)
+            else:
+                archivos.append(Path(carpeta, nombre))
+        return archivos, subcarpetas, excluidos
+
+    return listar
+
+
+def _asentados(base: Path, reglas: ReglasCompiladas, detector: DetectorContenido = None):
+    """
+    Check for the directory cache: True for a file that stays in its folder
+    on every run with these rules. None when that depends on more than the
+    name (size and age rules, content sniffing)
+    """
+    if detector is not None or reglas.necesita_stat:
+        return None
+    destinos = crear_destinos(base, reglas)
+    otros = destinos[CATEGORIA_POR_DEFECTO]
+
+    def asentado(archivo: Path) -> bool:
+        return destinos.get(reglas.clasificar(archivo.name).categoria, otros) == archivo.parent
+
+    return asentado
+
+
+def _medido(listar, stats: Stats):
+    """Listing function that records each folder listing in the 'scan' phase"""
+
+    def listar_medido(*args):
+        inicio = time.perf_counter()
+        try:
+            return listar(*args)
+        finally:
+            stats.registrar_tiempo("scan", time.perf_counter() - inicio)
+
+    return listar_medido
+
+
+def _detenido(stop_event) -> bool:
+    return stop_event is not None and stop_event.is_set()
+
+
+def _esperar_listado(futuro, stop_event):
+    """Waits for a listing while still reacting to stop_event. Returns None if stopped"""
+    while True:
+        try:
+            return futuro.result(timeout=_ESPERA_CANCELACION)
+        except FuturesTimeout:
+            if _detenido(stop_event):
+                return None
+
+
+def _explorar_concurrente(raiz: str, filtro: FiltroArchivos, stats: Stats, scan_workers: int, stop_event, listar):
+    """
+    Lists up to 'scan_workers' directories at once and streams the files
+    of each directory as soon as its listing completes (no fixed order)
+    """
+    pendientes = [raiz]
+    en_curso = set()
+    limite = scan_workers * 2
+
+    with ThreadPoolExecutor(max_workers=scan_workers, thread_name_prefix="scan") as pool:
+        try:
+            while pendientes or en_curso:
+                if _detenido(stop_event):
+                    return
+
+                while pendientes and len(en_curso) < limite:
+                    en_curso.add(pool.submit(listar, pendientes.pop(), True, filtro))
+
+                listos, en_curso = wait(en_curso, timeout=_ESPERA_CANCELACION, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    archivos, subcarpetas, excluidos = futuro.result()
+                    stats.registrar_excluidos(excluidos)
+                    pendientes.extend(subcarpetas)
+                    yield from archivos
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+
+def _explorar_concurrente_ordenado(raiz: str, filtro: FiltroArchivos, stats: Stats, scan_workers: int, stop_event, listar):
+    """
+    Same depth-first sorted order as the serial walker, prefetching the
+    listings of the next folders on the stack in the thread pool
+    """
+    pendientes = [raiz]
+    futuros = {}
+    ventana = scan_workers * 2
+
+    with ThreadPoolExecutor(max_workers=scan_workers, thread_name_prefix="scan") as pool:
+        try:
+            while pendientes:
+                if _detenido(stop_event):
+                    return
+
+                # Las proximas carpetas a consumir estan al final de la pila
+                for carpeta in reversed(pendientes[-ventana:]):
+                    if carpeta not in futuros:
+                        futuros[carpeta] = pool.submit(listar, carpeta, True, filtro, True)
+
+                resultado = _esperar_listado(futuros.pop(pendientes.pop()), stop_event)
+                if resultado is None:
+                    return
+
+                archivos, subcarpetas, excluidos = resultado
+                stats.registrar_excluidos(excluidos)
+                pendientes.extend(reversed(subcarpetas))
+                yield from archivos
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+
+def iterar_archivos(
     base: Path,
-    reglas: dict,
     recursive: bool,
     exclude: set,
     only: set,
     ignore_hidden: bool,
     stats: Stats,
-    lista_archivos=None,
-    stop_event=None
+    scan_workers: int = 1,
+    ordenado: bool = False,
+    stop_event=None,
+    cache: CacheDirectorios = None,
+    con_stat: bool = False,
+    asentado=None
 ):
+    filtro = FiltroArchivos(exclude, only, ignore_hidden, con_stat)
+    raiz = os.fspath(base)
+    listar = _medido(_listador(cache, asentado), stats)
+
+    # Modo concurrente (opcional) para sistemas de archivos con alta latencia
+    if recursive and scan_workers > 1:
+        explorador = _explorar_concurrente_ordenado if ordenado else _explorar_concurrente
+        yield from explorador(raiz, filtro, stats, scan_workers, stop_event, listar)
+        return
+
+    pendientes = [raiz]
+    while pendientes:
+        if _detenido(stop_event):
+            return
+
+        archivos, subcarpetas, excluidos = listar(pendientes.pop(), recursive, filtro, ordenado)
+        stats.registrar_excluidos(excluidos)
+        pendientes.extend(reversed(subcarpetas))
+        yield from archivos
+
+
+class Movimiento(NamedTuple):
+    origen: Path
+    destino: Path
+    categoria: str
+    renombrado: bool
+    registro: int = -1       # Id en el diario de movimientos (si hay diario)
+    accion: str = MOVER      # Duplicados: omitir, enlazar o enviar a la papelera
+
+
+# Movimientos planificados que se agrupan antes de ejecutarse
+TAMANO_LOTE = 512
+
+
+class _Dispositivos:
+    """
+    st_dev cache per folder, so the device of a move costs one stat per
+    folder instead of one per file. Missing folders use their nearest
+    existing parent (where they will be created)
+    """
+
+    def __init__(self):
+        self._cache = {}
+
+    def de(self, carpeta: Path):
+        if carpeta in self._cache:
+            return self._cache[carpeta]
+
+        actual = carpeta
+        dispositivo = None
+        while True:
+            try:
+                dispositivo = os.stat(actual).st_dev
+                break
+            except FileNotFoundError:
+                if actual.parent == actual:
+                    break
+                actual = actual.parent
+            except OSError:
+                break
+
+        self._cache[carpeta] = dispositivo
+        return dispositivo
+
+
+def _evento_movido(mov: Movimiento, simulado: bool = False) -> Evento:
+    return Evento(RENOMBRADO if mov.renombrado else MOVIDO, mov.origen, mov.destino, simulado)
+
+
+def _evento_error(mov: Movimiento, e: OSError, stats: Stats) -> Evento:
+    stats.registrar_error()
+    return Evento(ERROR, mov.origen, mov.destino, detalle=e)
+
+
+class _CarpetasDestino:
+    """
+    Destination folders known to exist in this run. Each folder is created
+    (or found) once, with a single mkdir and no exists() stat; moves into a
+    known folder touch no folder metadata. A folder is only forgotten when a
+    move into it fails with FileNotFoundError
+    """
+
+    def __init__(self, stats: Stats):
+        self.stats = stats
+        self._existentes = set()
+        self._lock = threading.Lock()
+
+    def _crear(self, carpeta: Path) -> bool:
+        """mkdir -p; returns whether the folder had to be created"""
+        inicio = time.perf_counter()
+        try:
+            carpeta.mkdir(parents=True)
+            creada = True
+            logging.info(f"Folder {carpeta} created")
+        except FileExistsError:
+            creada = False
+        finally:
+            self.stats.registrar_tiempo("mkdir", time.perf_counter() - inicio)
+        with self._lock:
+            self._existentes.add(carpeta)
+        return creada
+
+    def asegurar(self, carpetas):
+        """Creates the folders not known yet (the destinations of a batch)"""
+        for carpeta in carpetas:
+            if carpeta in self._existentes:
+                continue
+            try:
+                self._crear(carpeta)
+            except OSError as e:
+                # Los movimientos hacia esta carpeta fallaran y se informaran uno por uno
+                logging.warning(f"Could not create folder {carpeta}: {e}")
+
+    def recrear(self, carpeta: Path) -> bool:
+        """A move into 'carpeta' failed with FileNotFoundError: True if the folder was missing and is back"""
+        with self._lock:
+            self._existentes.discard(carpeta)
+        try:
+            return self._crear(carpeta)
+        except OSError:
+            return False
+
+
+def _en_carpeta(ej, carpeta: Path, operacion):
+    """Runs 'operacion'; if the destination folder vanished during the run, recreates it and retries once"""
+    try:
+        return operacion()
+    except FileNotFoundError:
+        if not ej.carpetas.recrear(carpeta):
+            raise
+        return operacion()
+
+
+def _tamano_origen(mov: Movimiento) -> int:
+    """Size of the file to move: from the walk's stat, or a new one (plans, undo, resume)"""
+    st = getattr(mov.origen, "st", None)
+    return st.st_size if st is not None else os.stat(mov.origen).st_size
+
+
+def _sin_pisar(mov: Movimiento, ej, mover) -> Movimiento:
+    """
+    Runs 'mover(origen, destino)', which raises FileExistsError instead of
+    replacing a file. A name taken after its folder was listed (another
+    process, a watch run) gets the next free '_copyN' and the move is
+    retried. Returns the move as it was done
+    """
+    destino = mov.destino
+    while True:
+        try:
+            _en_carpeta(ej, destino.parent, lambda: mover(mov.origen, destino))
+            break
+        except FileExistsError:
+            # El nombre sigue ocupado en el indice: se reserva el siguiente libre
+            stem, extension = os.path.splitext(mov.origen.name)
+            nuevo, _ = ej.indice.reservar(destino.parent, mov.origen.name, stem, extension)
+            logging.warning(f"{destino} appeared after it was planned, moving {mov.origen.name} as {nuevo.name}")
+            destino = nuevo
+        except OSError:
+            if destino != mov.destino:
+                ej.indice.liberar(destino)
+            raise
+    return mov if destino == mov.destino else mov._replace(destino=destino, renombrado=True)
+
+
+def _renombrar(mov: Movimiento, ej):
+    inicio = time.perf_counter()
+    tamano = _tamano_origen(mov)
+    mov = _sin_pisar(mov, ej, renombrar_sin_reemplazar)
+    ej.stats.registrar_tiempo("rename", time.perf_counter() - inicio)
+    return mov, tamano
+
+
+def _copiar(mov: Movimiento, ej):
+    inicio = time.perf_counter()
+    tamano = _tamano_origen(mov)
+    mov = _sin_pisar(mov, ej, mover_entre_dispositivos)
+    ej.stats.registrar_tiempo("copy", time.perf_counter() - inicio)
+    return mov, tamano
+
+
+def _resolver_duplicado(mov: Movimiento, ej):
+    """Applies the dedupe action; returns the bytes no longer stored twice"""
+    with ej.stats.medir("dedupe"):
+        return _accion_duplicado(mov)
+
+
+def _accion_duplicado(mov: Movimiento):
+    st = os.stat(mov.origen)
+
+    if mov.accion == OMITIR:
+        return 0
+
+    if os.path.samefile(mov.origen, mov.destino):
+        return 0
+
+    # Comprobacion barata: el archivo no cambio desde que se comparo
+    if os.stat(mov.destino).st_size != st.st_size:
+        raise OSError(errno.EINVAL, "Duplicate changed since it was compared", str(mov.origen))
+
+    if mov.accion == ENLAZAR:
+        temporal = mov.origen.with_name(f".{mov.origen.name}.orglink")
+        os.link(mov.destino, temporal)
+        os.replace(temporal, mov.origen)
+    else:
+        from send2trash import send2trash
+        send2trash(os.fspath(mov.origen))
+    return st.st_size
+
+
+def _intentar(funcion, mov: Movimiento, ej):
+    try:
+        return mov, funcion(mov, ej), None
+    except OSError as e:
+        return mov, None, e
+
+
+class _Ejecucion:
+    """State of the execute stage of one run"""
+    __slots__ = (
+        "stats", "indice", "dispositivos", "carpetas", "stop_event", "pool", "en_vuelo", "diario", "registro", "deduplicador",
+    )
+
+    def __init__(self, stats: Stats, indice: IndiceNombres, stop_event, pool, en_vuelo: int, diario, registro, deduplicador=None):
+        self.stats = stats
+        self.indice = indice
+        self.dispositivos = _Dispositivos()
+        self.carpetas = _CarpetasDestino(stats)
+        self.stop_event = stop_event
+        self.pool = pool
+        self.en_vuelo = en_vuelo
+        self.diario = diario
+        self.registro = registro
+        self.deduplicador = deduplicador
+
+    def terminado(self, mov: Movimiento):
+        """A planned move was done or failed: the deduplicator no longer needs its origin"""
+        if self.deduplicador is not None:
+            self.deduplicador.completado(mov)
+
+    def completado(self, mov: Movimiento):
+        if self.diario is not None and mov.registro >= 0:
+            self.diario.completado(mov.registro)
+        if self.registro is not None and mov.accion == MOVER:
+            self.registro.registrar(mov.origen, mov.destino)
+
+
+def _ejecutar_fase(movimientos: list, funcion, ej: _Ejecucion):
+    """
+    Runs 'funcion' over the moves, on the pool when there is one, keeping at
+    most 'ej.en_vuelo' moves in flight. Yields (mov, result, error) in
+    completion order. On cancellation nothing new is submitted and the moves
+    already in flight are drained before returning
+    """
+    if ej.pool is None:
+        for mov in movimientos:
+            if _detenido(ej.stop_event):
+                return
+            yield _intentar(funcion, mov, ej)
+        return
+
+    pendientes = iter(movimientos)
+    en_curso = set()
+
+    while True:
+        while len(en_curso) < ej.en_vuelo and not _detenido(ej.stop_event):
+            mov = next(pendientes, None)
+            if mov is None:
+                break
+            en_curso.add(ej.pool.submit(_intentar, funcion, mov, ej))
+
+        if not en_curso:
+            return
+
+        listos, en_curso = wait(en_curso, return_when=FIRST_COMPLETED)
+        for futuro in listos:
+            yield futuro.result()
+
+
+def _ejecutar_lote(lote: list, ej: _Ejecucion):
+    """
+    Executes a batch of planned moves: same-device moves first as atomic
+    renames, then cross-device transfers (copy + delete), and last the
+    duplicates (their originals may be moved by this same batch). No move
+    replaces an existing file
+    """
+    stats = ej.stats
+    renombres = []
+    copias = []
+    duplicados = []
+    for mov in lote:
+        if mov.accion != MOVER:
+            duplicados.append(mov)
+            continue
+        origen = ej.dispositivos.de(mov.origen.parent)
+        if origen is not None and origen == ej.dispositivos.de(mov.destino.parent):
+            renombres.append(mov)
+        else:
+            copias.append(mov)
+
+    # Carpetas de destino del lote: se crean una sola vez por ejecucion
+    ej.carpetas.asegurar({mov.destino.parent for mov in lote if mov.accion == MOVER})
+
+    # 1. Renombrados en el mismo dispositivo (solo metadatos)
+    for mov, hecho, error in _ejecutar_fase(renombres, _renombrar, ej):
+        if error is not None:
+            if error.errno == errno.EXDEV:
+                copias.append(mov)
+                continue
+            ej.indice.liberar(mov.destino)
+            ej.terminado(mov)
+            yield _evento_error(mov, error, stats)
+            continue
+
+        ej.terminado(mov)
+        mov, tamano = hecho
+        stats.registrar_procesados()
+        stats.registrar_rename(tamano)
+        ej.completado(mov)
+        yield _evento_movido(mov)
+
+    # 2. Copias entre dispositivos (copia de datos + borrado)
+    for mov, hecho, error in _ejecutar_fase(copias, _copiar, ej):
+        if error is not None:
+            ej.indice.liberar(mov.destino)
+            ej.terminado(mov)
+            yield _evento_error(mov, error, stats)
+            continue
+
+        ej.terminado(mov)
+        mov, tamano = hecho
+        stats.registrar_procesados()
+        stats.registrar_copia(tamano)
+        ej.completado(mov)
+        yield _evento_movido(mov)
+
+    # 3. Duplicados confirmados
+    for mov, ahorrado, error in _ejecutar_fase(duplicados, _resolver_duplicado, ej):
+        if error is not None:
+            yield _evento_error(mov, error, stats)
+            continue
+
+        stats.registrar_duplicado(ahorrado)
+        ej.completado(mov)
+        yield Evento(DUPLICADO, mov.origen, mov.destino, detalle=mov.accion)
+
+
+# Capacidad (en lotes) de las colas entre etapas
+CAPACIDAD_EXPLORACION = 16
+CAPACIDAD_PLAN = 4
+
+
+def _etapa_exploracion(
+    base, recursive, exclude, only, ignore_hidden, stats, lista_archivos, stop_event, scan_workers, ordenado, cache,
+    con_stat=False, asentado=None
+):
+    """
+    Walk stage: the given file list, or the directory walk, produced on a
+    background thread into a bounded queue
+    """
+    if lista_archivos is None:
+        lista_archivos = iterar_archivos(
+            base, recursive, exclude, only, ignore_hidden, stats,
+            scan_workers=scan_workers, ordenado=ordenado, stop_event=stop_event, cache=cache, con_stat=con_stat,
+            asentado=asentado
+        )
+    return en_segundo_plano(lista_archivos, capacidad=CAPACIDAD_EXPLORACION, nombre="walk")
+
+
+def _planificar(
+    base: Path, reglas: ReglasCompiladas, archivos, stats: Stats, indice: IndiceNombres, stop_event,
+    detector: DetectorContenido = None, deduplicador: Deduplicador = None
+):
+    """
+    Classify/resolve stage: turns files into planned moves, skipping the
+    ones already in their category folder. With a detector, files are
+    also classified by their content; with a deduplicator, colliding
+    duplicates become dedupe actions
+    """
+    movimientos = _resolver_movimientos(base, reglas, archivos, stats, indice, stop_event, detector)
+    if deduplicador is not None:
+        movimientos = deduplicador.filtrar(movimientos, indice, stop_event, stats)
+    return movimientos
+
+
+def _resolver_movimientos(base, reglas, archivos, stats, indice, stop_event, detector):
     destinos = crear_destinos(base, reglas)
-    
-    fuente = lista_archivos if lista_archivos is not None else iterar_archivos(base, recursive, exclude, only, ignore_hidden, stats)
-    
-    for archivo in fuente:
-        if stop_event and stop_event.is_set():
-            yield "[!] Aborting internal operation..."
-            return 
+
+    if detector is not None:
+        etiquetados = detector.etiquetar(archivos, stop_event)
+    else:
+        etiquetados = ((archivo, None) for archivo in archivos)
+
+    for archivo, por_contenido in etiquetados:
+        if _detenido(stop_event):
+            return
+        inicio = time.perf_counter()
         categoria, destino_final, fue_renombrado = resolver_destino(
-            archivo, reglas, destinos
+            archivo, reglas, destinos, indice, por_contenido
         )
+        stats.registrar_tiempo("plan", time.perf_counter() - inicio)
         if destino_final.parent == archivo.parent:
             stats.registrar_saltados()
             continue
 
+        yield Movimiento(archivo, destino_final, categoria, fue_renombrado)
 
-        try:
-            crear_carpetas_si_no_existe(destino_final.parent)
-            shutil.move(str(archivo), str(destino_final))
-            stats.registrar_procesados()
-            if fue_renombrado:
-                logging.warning(
-                    f"File renamed due to collision: {archivo.name} → {destino_final.name}"
-                )
-                click.echo(
-                    click.style(
-                        f"File renamed due to collision: {archivo.name} → {destino_final.name}",
-                        fg="yellow",
-                    )
-                )
-                yield f"File renamed due to collision: {archivo.name} → {destino_final.name}"
-            else:
-                click.echo(f"Moved: {archivo.name} → {destino_final}")
-                yield f"Moved: {archivo.name} → {destino_final}"
 
-        except PermissionError as e:
-            if e.errno == errno.EACCES:
-                logging.error(f"ERROR {archivo.name} access denied")
-                click.echo(f"Error {archivo.name} access denied")
-                stats.registrar_error()
-                yield f"ERROR {archivo.name} access denied"
+def mover_archivos(
+    base: Path,
+    reglas: ReglasCompiladas,
+    recursive: bool,
+    exclude: set,
+    only: set,
+    ignore_hidden: bool,
+    stats: Stats,
+    lista_archivos=None,
+    stop_event=None,
+    scan_workers: int = 1,
+    ordenado: bool = False,
+    workers: int = 1,
+    diario: DiarioMovimientos = None,
+    historial: HistorialMovimientos = None,
+    cache: CacheDirectorios = None,
+    detector: DetectorContenido = None,
+    deduplicador: Deduplicador = None,
+    pool: ThreadPoolExecutor = None
+):
+    indice = IndiceNombres()
+    registro = historial.iniciar(base) if historial is not None else None
 
+    # Etapas: exploracion -> planificacion (hilos propios) -> ejecucion (este generador + pool)
+    archivos = _etapa_exploracion(
+        base, recursive, exclude, only, ignore_hidden, stats, lista_archivos, stop_event, scan_workers, ordenado, cache,
+        True,  # El stat del recorrido da los bytes movidos sin otro stat por archivo
+        _asentados(base, reglas, detector) if cache is not None else None
+    )
+    movimientos = _planificar(base, reglas, archivos, stats, indice, stop_event, detector, deduplicador)
 
-            elif e.errno == errno.EAGAIN:
-                logging.error(
-                    f"ERROR File {archivo.name} is being used by another program"
-                )
-                click.echo(
-                    f"ERROR File {archivo.name} is being used by another program"
-                )
-                stats.registrar_error()
-                yield f"ERROR File {archivo.name} is being used by another program"
+    if diario is not None:
+        yield from _mover_con_diario(movimientos, archivos, reglas, stats, indice, stop_event, workers, diario, registro)
+        return
 
+    lotes = en_segundo_plano(
+        movimientos, capacidad=CAPACIDAD_PLAN, lote=TAMANO_LOTE, por_lotes=True, nombre="plan"
+    )
 
-            else:
-                logging.error(f"Security ERROR: {e}")
-                click.echo(f"Security Error: {e}")
-                stats.registrar_error()
-                yield f"Security Error: {e}"
+    try:
+        yield from _ejecutar_lotes(
+            lotes, stats, indice, stop_event, workers, registro=registro, pool=pool, deduplicador=deduplicador
+        )
+    finally:
+        lotes.close()
 
 
-        except OSError as e:
-            logging.error(f"ERROR Moving {archivo.name}: {e}")
-            click.echo(f"Error moving {archivo.name}: {e}")
-            stats.registrar_error()
-            yield f"ERROR Moving {archivo.name}: {e}"
+def _mover_con_diario(movimientos, archivos, reglas, stats, indice, stop_event, workers, diario, registro):
+    """
+    Journaled run: the whole plan is written to the journal first (on disk,
+    not in memory) and then executed by streaming it back, so an interrupted
+    run can be resumed without walking the source tree again
+    """
+    planificados = 0
+    try:
+        for mov in movimientos:
+            diario.planificado(mov)
+            planificados += 1
+    finally:
+        archivos.close()
+
+    if _detenido(stop_event):
+        diario.sincronizar()
+        if registro is not None:
+            registro.cerrar()
+        yield Evento(CANCELADO)
+        return
+
+    diario.fin_planificacion()
+    logging.info(f"Journal {diario.ruta}: {planificados} moves planned")
+
+    yield from _ejecutar_pendientes(diario, reglas, stats, indice, stop_event, workers, False, registro)
 
-    click.echo(
-        click.style(
-            f"\nTotal files moved: {stats.procesados}",
-            bold=True,
-            fg="green",
-        )
-    )
-    yield f"\nTotal files moved: {stats.procesados}"
+
+def _ejecutar_lotes(
+    lotes, stats: Stats, indice: IndiceNombres, stop_event, workers: int, diario=None, registro=None, pool=None,
+    deduplicador: Deduplicador = None
+):
+    """
+    Execute stage shared by mover_archivos, aplicar_plan, reanudar_diario and
+    deshacer_ejecucion. Completed moves are recorded in 'registro' (history).
+    A 'pool' given by the caller (shared by several runs) is used as is and
+    left open; otherwise one is created when workers > 1
+    """
+    pool_propio = pool is None and workers > 1
+    if pool_propio:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="move")
+    ej = _Ejecucion(stats, indice, stop_event, pool, workers * 2, diario, registro, deduplicador)
+
+    try:
+        for lote in lotes:
+            if _detenido(stop_event):
+                break
+            yield from _ejecutar_lote(lote, ej)
+    finally:
+        if pool_propio:
+            pool.shutdown()
+        if diario is not None:
+            diario.sincronizar()
+        if registro is not None:
+            registro.cerrar()
+
+    if _detenido(stop_event):
+        yield Evento(CANCELADO)
+        return
+
+    yield Evento(RESUMEN, cantidad=stats.procesados)
 
 
 def simulacion(
     base: Path,
-    reglas: dict,
+    reglas: ReglasCompiladas,
     recursive: bool,
     exclude: set,
     only: set,
     ignore_hidden: bool,
     stats: Stats,
     lista_archivos=None,
-    stop_event=None
+    stop_event=None,
+    scan_workers: int = 1,
+    ordenado: bool = False,
+    plan: PlanMovimientos = None,
+    cache: CacheDirectorios = None,
+    detector: DetectorContenido = None,
+    deduplicador: Deduplicador = None
 ):
     total_archivos_simulados = 0
-    destinos = crear_destinos(base, reglas)
+    indice = IndiceNombres()
+
+    archivos = _etapa_exploracion(
+        base, recursive, exclude, only, ignore_hidden, stats, lista_archivos, stop_event, scan_workers, ordenado, cache,
+        reglas.necesita_stat, _asentados(base, reglas, detector) if cache is not None else None
+    )
+    movimientos = _planificar(base, reglas, archivos, stats, indice, stop_event, detector, deduplicador)
+
+    try:
+        for mov in movimientos:
+            if plan is not None:
+                plan.agregar(mov)
+            if mov.accion != MOVER:
+                stats.registrar_duplicado(0)
+                yield Evento(DUPLICADO, mov.origen, mov.destino, True, mov.accion)
+                continue
+            total_archivos_simulados += 1
+            yield _evento_movido(mov, simulado=True)
+    finally:
+        archivos.close()
+
+    if _detenido(stop_event):
+        yield Evento(CANCELADO)
+        return
+
+    yield Evento(RESUMEN, simulado=True, cantidad=total_archivos_simulados)
 
-    fuente = lista_archivos if lista_archivos is not None else iterar_archivos(base, recursive, exclude, only, ignore_hidden, stats)
-    
-    for archivo in fuente:
-        if stop_event and stop_event.is_set():
-            yield "[!] Aborting internal operation..."
+
+def _replanificar(plan: PlanMovimientos, reglas: ReglasCompiladas, stats: Stats, indice: IndiceNombres, stop_event):
+    """
+    Turns a saved plan back into moves. Entries whose source or destination
+    folder changed since the simulation are re-resolved; the rest are used
+    as planned, without rescanning
+    """
+    modificadas = plan.carpetas_modificadas()
+
+    if modificadas:
+        # Los nombres ya planificados quedan ocupados para las entradas re-resueltas
+        for origen, destino, _, _, _ in plan.entradas():
+            if origen.parent not in modificadas and destino.parent not in modificadas:
+                indice.ocupar(destino)
+
+    for origen, destino, categoria, renombrado, accion in plan.entradas():
+        if _detenido(stop_event):
             return
-        categoria, destino_final, fue_renombrado = resolver_destino(
-            archivo, reglas, destinos
-        )
 
-        if destino_final.parent == archivo.parent:
+        if origen.parent in modificadas or destino.parent in modificadas:
+            if not os.path.lexists(origen):
+                stats.registrar_saltados()
+                continue
+            # Un duplicado ya no se puede dar por confirmado: se mueve como cualquier otro
+            accion = MOVER
+            nombre = origen.name
+            extension = reglas.clasificar(nombre)[1]
+            destino, renombrado = indice.reservar(
+                destino.parent, nombre, nombre[: len(nombre) - len(extension)], extension
+            )
+
+        yield Movimiento(origen, destino, categoria, renombrado, accion=accion)
+
+
+def aplicar_plan(
+    plan: PlanMovimientos,
+    reglas: ReglasCompiladas,
+    stats: Stats,
+    stop_event=None,
+    workers: int = 1,
+    historial: HistorialMovimientos = None
+):
+    """
+    Executes a plan produced by simulacion (same events as mover_archivos)
+    """
+    indice = IndiceNombres()
+    registro = historial.iniciar(plan.base) if historial is not None else None
+
+    modificadas = plan.carpetas_modificadas()
+    if modificadas:
+        aviso = f"{len(modificadas)} folders changed since the simulation; their entries will be re-resolved"
+        yield Evento(AVISO, detalle=aviso)
+
+    lotes = en_segundo_plano(
+        _replanificar(plan, reglas, stats, indice, stop_event),
+        capacidad=CAPACIDAD_PLAN, lote=TAMANO_LOTE, por_lotes=True, nombre="plan"
+    )
+
+    try:
+        yield from _ejecutar_lotes(lotes, stats, indice, stop_event, workers, registro=registro)
+    finally:
+        lotes.close()
+
+
+def _pendientes_del_diario(diario: DiarioMovimientos, reglas: ReglasCompiladas, stats: Stats, indice: IndiceNombres, stop_event, verificar: bool):
+    """
+    Planned moves of the journal not marked as completed. When resuming
+    ('verificar') each entry is checked against the disk: moves that did
+    happen but were not journaled yet are marked completed, and a taken
+    destination is re-resolved
+    """
+    estado = leer_estado(diario.ruta)
+
+    if verificar:
+        # Los destinos pendientes quedan ocupados antes de re-resolver ninguno
+        for _, _, destino, _, _, accion in movimientos_pendientes(diario.ruta, estado):
+            if accion == MOVER:
+                indice.ocupar(destino)
+
+    for registro, origen, destino, categoria, renombrado, accion in movimientos_pendientes(diario.ruta, estado):
+        if _detenido(stop_event):
+            return
+
+        if verificar and accion != MOVER:
+            # Duplicado: ya resuelto si el origen desaparecio (papelera)
+            if not os.path.lexists(origen):
+                diario.completado(registro)
+                continue
+        elif verificar:
+            if not os.path.lexists(origen):
+                if os.path.lexists(destino):
+                    diario.completado(registro)
+                stats.registrar_saltados()
+                continue
+
+            if os.path.lexists(destino):
+                nombre = origen.name
+                extension = reglas.clasificar(nombre)[1]
+                destino, renombrado = indice.reservar(
+                    destino.parent, nombre, nombre[: len(nombre) - len(extension)], extension
+                )
+
+        yield Movimiento(origen, destino, categoria, renombrado, registro, accion)
+
+
+def _ejecutar_pendientes(diario, reglas, stats, indice, stop_event, workers, verificar, registro=None):
+    diario.sincronizar()
+    lotes = en_segundo_plano(
+        _pendientes_del_diario(diario, reglas, stats, indice, stop_event, verificar),
+        capacidad=CAPACIDAD_PLAN, lote=TAMANO_LOTE, por_lotes=True, nombre="journal"
+    )
+
+    try:
+        yield from _ejecutar_lotes(lotes, stats, indice, stop_event, workers, diario, registro)
+    finally:
+        lotes.close()
+
+
+def reanudar_diario(
+    diario: DiarioMovimientos,
+    reglas: ReglasCompiladas,
+    stats: Stats,
+    stop_event=None,
+    workers: int = 1,
+    historial: HistorialMovimientos = None
+):
+    """
+    Resumes an interrupted journaled run: only the moves not marked as
+    completed are executed, without rescanning the source tree
+    """
+    registro = historial.iniciar(diario.base) if historial is not None else None
+    yield from _ejecutar_pendientes(diario, reglas, stats, IndiceNombres(), stop_event, workers, True, registro)
+
+
+def _planificar_deshacer(pares, stats: Stats, indice: IndiceNombres, stop_event):
+    """
+    Reverses the recorded moves of a run. Each original folder is recreated
+    once, the first time one of its files comes back, and a name taken in
+    the meantime gets a '_copyN' suffix like any other collision
+    """
+    recreadas = set()
+    fallidas = set()
+
+    for origen, destino in pares:
+        if _detenido(stop_event):
+            return
+
+        if not os.path.lexists(destino):
+            logging.warning(f"Cannot undo {destino.name}: it is no longer in {destino.parent}")
             stats.registrar_saltados()
             continue
 
+        carpeta = origen.parent
+        if carpeta in fallidas:
+            logging.error(f"Cannot undo {destino.name}: folder {carpeta} could not be recreated")
+            stats.registrar_error()
+            continue
+        if carpeta not in recreadas:
+            try:
+                carpeta.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                # Una carpeta que no se puede recrear no detiene el resto del deshacer
+                logging.error(f"Cannot undo {destino.name}: could not recreate folder {carpeta}: {e}")
+                stats.registrar_error()
+                fallidas.add(carpeta)
+                continue
+            recreadas.add(carpeta)
 
-        total_archivos_simulados += 1
-        if fue_renombrado:
-            click.echo(
-                click.style(
-                    f"[SIMULATION] File renamed due to collision: {archivo.name} → {destino_final.name}",
-                    fg="yellow",
-                )
-            )
-            yield f"[SIMULATION] File renamed due to collision: {archivo.name} → {destino_final.name}"
-        else:
-            click.echo(f"[SIMULATION] {archivo.name} → {destino_final}")
-            yield f"[SIMULATION] {archivo.name} → {destino_final}"
-
-    click.echo(
-        click.style(
-            f"\n[SIMULATION] Total files moved: {total_archivos_simulados}",
-            bold=True,
-            fg="blue",
-        )
+        nombre = origen.name
+        stem, extension = os.path.splitext(nombre)
+        vuelta, renombrado = indice.reservar(carpeta, nombre, stem, extension)
+        yield Movimiento(destino, vuelta, "", renombrado)
+
+
+def deshacer_ejecucion(
+    historial: HistorialMovimientos,
+    ejecucion: int,
+    stats: Stats,
+    stop_event=None,
+    workers: int = 1
+):
+    """
+    Moves every file of a recorded run back where it came from, last move
+    first (same events as mover_archivos). The run is marked as undone
+    once every file was restored or skipped without errors
+    """
+    indice = IndiceNombres()
+
+    lotes = en_segundo_plano(
+        _planificar_deshacer(historial.movimientos(ejecucion), stats, indice, stop_event),
+        capacidad=CAPACIDAD_PLAN, lote=TAMANO_LOTE, por_lotes=True, nombre="undo"
     )
-    yield f"[SIMULATION] Total files moved: {total_archivos_simulados}"
\ No newline at end of file
+
+    try:
+        yield from _ejecutar_lotes(lotes, stats, indice, stop_event, workers)
+    finally:
+        lotes.close()
+
+    if not _detenido(stop_event) and stats.errores == 0:
+        historial.marcar_deshecha(ejecucion)
+        logging.info(f"Run {ejecucion} undone: {stats.procesados} files restored")
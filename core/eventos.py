@@ -0,0 +1,223 @@
+# core/eventos.py
+
+import json
+import time
+import errno
+import logging
+
+import click
+
+
+# Tipos de evento
+MOVIDO = "moved"
+RENOMBRADO = "renamed"         # Movido con otro nombre por una colision
+DUPLICADO = "duplicate"
+SALTADO = "skipped"
+ERROR = "error"
+AVISO = "notice"
+CANCELADO = "aborted"
+RESUMEN = "summary"
+
+# Eventos que se entregan a las salidas sin esperar a completar el lote
+_INMEDIATOS = frozenset((AVISO, CANCELADO, RESUMEN))
+
+# Eventos agrupados por entrega y segundos maximos de espera
+TAMANO_LOTE = 512
+INTERVALO = 0.1
+
+
+def texto_error(origen, e: OSError) -> str:
+    if isinstance(e, PermissionError):
+        if e.errno == errno.EACCES:
+            return f"ERROR {origen.name} access denied"
+        if e.errno == errno.EAGAIN:
+            return f"ERROR File {origen.name} is being used by another program"
+        return f"Security Error: {e}"
+    return f"ERROR Moving {origen.name}: {e}"
+
+
+_TEXTO_DUPLICADO = {
+    "hardlink": "Duplicate hard-linked",
+    "trash": "Duplicate sent to trash",
+    "skip": "Duplicate skipped",
+}
+
+
+class Evento:
+    """
+    One thing that happened to one file (or to the run). The engine only
+    builds these; text is produced by the sinks, and only if they need it
+    """
+    __slots__ = ("tipo", "origen", "destino", "simulado", "detalle", "cantidad")
+
+    def __init__(self, tipo: str, origen=None, destino=None, simulado: bool = False, detalle=None, cantidad: int = 0):
+        self.tipo = tipo
+        self.origen = origen
+        self.destino = destino
+        self.simulado = simulado
+        self.detalle = detalle
+        self.cantidad = cantidad
+
+    def mensaje(self) -> str:
+        tipo = self.tipo
+        prefijo = "[SIMULATION] " if self.simulado else ""
+
+        if tipo == MOVIDO:
+            if self.simulado:
+                return f"[SIMULATION] {self.origen.name} → {self.destino}"
+            return f"Moved: {self.origen.name} → {self.destino}"
+        if tipo == RENOMBRADO:
+            return f"{prefijo}File renamed due to collision: {self.origen.name} → {self.destino.name}"
+        if tipo == DUPLICADO:
+            if self.simulado:
+                return f"[SIMULATION] Duplicate ({self.detalle}): {self.origen.name} = {self.destino}"
+            return f"{_TEXTO_DUPLICADO.get(self.detalle, 'Duplicate')}: {self.origen.name} = {self.destino}"
+        if tipo == SALTADO:
+            return f"{prefijo}Skipped: {self.origen.name} ({self.detalle})"
+        if tipo == ERROR:
+            return texto_error(self.origen, self.detalle)
+        if tipo == CANCELADO:
+            return "[!] Aborting internal operation..."
+        if tipo == RESUMEN:
+            if self.simulado:
+                return f"[SIMULATION] Total files moved: {self.cantidad}"
+            return f"\nTotal files moved: {self.cantidad}"
+        return str(self.detalle)
+
+    def como_dict(self) -> dict:
+        return {
+            "event": self.tipo,
+            "source": None if self.origen is None else str(self.origen),
+            "destination": None if self.destino is None else str(self.destino),
+            "simulated": self.simulado,
+            "detail": None if self.detalle is None else str(self.detalle),
+            "count": self.cantidad,
+        }
+
+
+class Salida:
+    """Event sink: receives the events in batches"""
+
+    def emitir(self, eventos: list):
+        raise NotImplementedError
+
+    def cerrar(self):
+        pass
+
+
+class SalidaConsola(Salida):
+    """Terminal output, one write per batch. solo_resumen hides per-file lines"""
+
+    _COLORES = {RENOMBRADO: "yellow", DUPLICADO: "cyan", AVISO: "yellow"}
+
+    def __init__(self, solo_resumen: bool = False):
+        self.solo_resumen = solo_resumen
+
+    def _linea(self, evento: Evento) -> str:
+        if evento.tipo == RESUMEN:
+            texto = evento.mensaje()
+            if evento.simulado:
+                return click.style(f"\n{texto}", bold=True, fg="blue")
+            return click.style(texto, bold=True, fg="green")
+        color = self._COLORES.get(evento.tipo)
+        return click.style(evento.mensaje(), fg=color) if color else evento.mensaje()
+
+    def emitir(self, eventos: list):
+        if self.solo_resumen:
+            eventos = [e for e in eventos if e.tipo in _INMEDIATOS]
+        if eventos:
+            click.echo("\n".join(self._linea(e) for e in eventos))
+
+
+class SalidaLog(Salida):
+    """Log file: collisions, duplicates and errors; every file only at DEBUG level"""
+
+    _NIVELES = {RENOMBRADO: logging.WARNING, ERROR: logging.ERROR, DUPLICADO: logging.INFO, AVISO: logging.INFO}
+
+    def emitir(self, eventos: list):
+        logger = logging.getLogger()
+        detalle = logger.isEnabledFor(logging.DEBUG)
+        for evento in eventos:
+            nivel = logging.DEBUG if evento.simulado else self._NIVELES.get(evento.tipo, logging.DEBUG)
+            if nivel > logging.DEBUG or detalle:
+                logger.log(nivel, evento.mensaje().strip())
+
+
+class SalidaGUI(Salida):
+    """
+    Window log: one call to 'publicar' per batch with the (tipo, text) lines,
+    so the window can filter them. 'publicar' must hand them over to the UI
+    thread itself
+    """
+
+    def __init__(self, publicar):
+        self.publicar = publicar
+
+    def emitir(self, eventos: list):
+        if eventos:
+            self.publicar([(e.tipo, e.mensaje().strip()) for e in eventos])
+
+
+class SalidaTexto(Salida):
+    """Plain text file with one line per event (full history of a run)"""
+
+    def __init__(self, ruta):
+        self._archivo = open(ruta, "w", encoding="utf-8")
+
+    def emitir(self, eventos: list):
+        self._archivo.write("".join(e.mensaje().strip() + "\n" for e in eventos))
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+class SalidaJSONL(Salida):
+    """One JSON object per event, appended to a file"""
+
+    def __init__(self, ruta):
+        self._archivo = open(ruta, "a", encoding="utf-8")
+
+    def emitir(self, eventos: list):
+        self._archivo.write("".join(json.dumps(e.como_dict(), ensure_ascii=False) + "\n" for e in eventos))
+        self._archivo.flush()
+
+    def cerrar(self):
+        self._archivo.close()
+
+
+def difundir(eventos, salidas: list, lote: int = TAMANO_LOTE, intervalo: float = INTERVALO):
+    """
+    Passes the engine events through unchanged while handing them to the
+    sinks in batches: when 'lote' events are waiting, when 'intervalo'
+    seconds went by since the last delivery, or right away for notices,
+    cancellations and summaries
+    """
+    pendientes = []
+    ultima = time.monotonic()
+
+    def entregar():
+        nonlocal pendientes, ultima
+        for salida in salidas:
+            salida.emitir(pendientes)
+        pendientes = []
+        ultima = time.monotonic()
+
+    try:
+        for evento in eventos:
+            pendientes.append(evento)
+            if (
+                len(pendientes) >= lote
+                or evento.tipo in _INMEDIATOS
+                or time.monotonic() - ultima >= intervalo
+            ):
+                entregar()
+            yield evento
+    finally:
+        if pendientes:
+            entregar()
+
+
+def consumir(eventos, salidas: list):
+    """Runs an engine generator to the end, sending its events to the sinks"""
+    for _ in difundir(eventos, salidas):
+        pass
@@ -0,0 +1,268 @@
+# core/firmas.py
+
+import os
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from core.rules import CATEGORIA_POR_DEFECTO, ReglasCompiladas
+
+
+# Bytes leidos del inicio de cada archivo
+TAMANO_CABECERA = 4096
+
+# Archivos agrupados por consulta a la cache y por tanda de lecturas
+TAMANO_TANDA = 256
+
+# Modos de --sniff
+SNIFF_OFF = "off"
+SNIFF_DESCONOCIDOS = "unknown"
+SNIFF_TODOS = "all"
+
+# (desplazamiento, firma, extension, generica). Las genericas (contenedores o
+# firmas cortas) nunca contradicen la extension conocida de un archivo
+FIRMAS = [
+    (0, b"%PDF-", ".pdf", False),
+    (0, b"\x89PNG\r\n\x1a\n", ".png", False),
+    (0, b"\xff\xd8\xff", ".jpg", False),
+    (0, b"GIF87a", ".gif", False),
+    (0, b"GIF89a", ".gif", False),
+    (0, b"II*\x00", ".tiff", False),
+    (0, b"MM\x00*", ".tiff", False),
+    (0, b"\x00\x00\x01\x00", ".ico", False),
+    (0, b"BM", ".bmp", True),
+    (0, b"{\\rtf", ".rtf", False),
+    (0, b"PK\x03\x04", ".zip", True),
+    (0, b"Rar!\x1a\x07", ".rar", False),
+    (0, b"7z\xbc\xaf\x27\x1c", ".7z", False),
+    (0, b"\x1f\x8b", ".gz", True),
+    (0, b"BZh", ".bz2", True),
+    (257, b"ustar", ".tar", False),
+    (0, b"ID3", ".mp3", False),
+    (0, b"\xff\xfb", ".mp3", True),
+    (0, b"\xff\xf3", ".mp3", True),
+    (0, b"fLaC", ".flac", False),
+    (0, b"OggS", ".ogg", False),
+    (0, b"\x1a\x45\xdf\xa3", ".mkv", False),
+    (4, b"ftypqt  ", ".mov", False),
+    (4, b"ftypM4A ", ".m4a", False),
+    (4, b"ftyp", ".mp4", False),
+    (0, b"MZ", ".exe", True),
+    (0, b"#!", ".sh", True),
+    (0, b"SQLite format 3\x00", ".sqlite", False),
+    (0, b"OTTO", ".otf", False),
+    (0, b"\x00\x01\x00\x00\x00", ".ttf", True),
+    (0, b"wOFF", ".woff", False),
+    (0, b"wOF2", ".woff2", False),
+    (0, b"<?xml", ".xml", True),
+]
+
+# RIFF: el tipo real esta en el desplazamiento 8
+_RIFF = {b"WEBP": ".webp", b"WAVE": ".wav", b"AVI ": ".avi"}
+
+# Documentos que son archivos ZIP: ODF declara su tipo en 'mimetype', OOXML se
+# reconoce por las carpetas de sus primeras entradas
+_ODF = {
+    b"application/vnd.oasis.opendocument.text": ".odt",
+    b"application/vnd.oasis.opendocument.spreadsheet": ".ods",
+    b"application/vnd.oasis.opendocument.presentation": ".odp",
+}
+_OOXML = ((b"word/", ".docx"), (b"xl/", ".xlsx"), (b"ppt/", ".pptx"))
+
+# Cambia con la tabla: una cache hecha con otra version se descarta
+VERSION_FIRMAS = "1"
+
+
+class TablaFirmas:
+    """
+    Magic number table compiled for lookup: signatures at offset 0 are
+    grouped by their first byte (longest first), so a header is only
+    compared against the few signatures that can match
+    """
+
+    def __init__(self, firmas=FIRMAS):
+        self._por_byte: dict[int, list] = {}
+        self._con_desplazamiento = []
+        for desplazamiento, firma, extension, generica in firmas:
+            if desplazamiento == 0:
+                self._por_byte.setdefault(firma[0], []).append((firma, extension, generica))
+            else:
+                self._con_desplazamiento.append((desplazamiento, firma, extension, generica))
+
+        for candidatas in self._por_byte.values():
+            candidatas.sort(key=lambda c: len(c[0]), reverse=True)
+        self._con_desplazamiento.sort(key=lambda c: len(c[1]), reverse=True)
+
+    def identificar(self, cabecera: bytes) -> tuple[str, bool]:
+        """Returns (extension, generica); ("", True) if nothing matched"""
+        if not cabecera:
+            return "", True
+
+        if cabecera[:4] == b"RIFF" and cabecera[8:12] in _RIFF:
+            return _RIFF[cabecera[8:12]], False
+
+        for desplazamiento, firma, extension, generica in self._con_desplazamiento:
+            if cabecera[desplazamiento:desplazamiento + len(firma)] == firma:
+                return extension, generica
+
+        for firma, extension, generica in self._por_byte.get(cabecera[0], ()):
+            if cabecera.startswith(firma):
+                if extension == ".zip":
+                    return self._documento_zip(cabecera)
+                return extension, generica
+
+        return "", True
+
+    def _documento_zip(self, cabecera: bytes) -> tuple[str, bool]:
+        if cabecera[30:38] == b"mimetype":
+            for tipo, extension in _ODF.items():
+                if cabecera.startswith(tipo, 38):
+                    return extension, False
+        for carpeta, extension in _OOXML:
+            if carpeta in cabecera:
+                return extension, False
+        return ".zip", True
+
+
+def _leer_cabecera(ruta: Path) -> bytes:
+    fd = os.open(ruta, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        if hasattr(os, "pread"):
+            return os.pread(fd, TAMANO_CABECERA, 0)
+        return os.read(fd, TAMANO_CABECERA)
+    finally:
+        os.close(fd)
+
+
+def _firma_archivo(ruta: Path):
+    try:
+        st = os.stat(ruta)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _cabecera_o_nada(ruta: Path) -> bytes:
+    try:
+        return _leer_cabecera(ruta)
+    except OSError as e:
+        logging.debug(f"Could not read header of {ruta}: {e}")
+        return b""
+
+
+class DetectorContenido:
+    """
+    Classifies files by their first bytes. In 'unknown' mode only files whose
+    name maps to no category are read; in 'all' mode every file is, and a
+    specific signature overrides a mislabeled extension.
+
+    Results (the detected extension, so rule changes still apply) are cached
+    in SQLite by (device, inode, size, mtime): unchanged files are never read
+    again. Stats and header reads run on a small thread pool.
+    """
+
+    def __init__(self, ruta_cache: Path, reglas: ReglasCompiladas, modo: str = SNIFF_DESCONOCIDOS, workers: int = 4):
+        self.reglas = reglas
+        self.modo = modo
+        self.workers = workers
+        self.tabla = TablaFirmas()
+        self.leidos = 0
+        self.en_cache = 0
+        self._lock = threading.Lock()
+
+        Path(ruta_cache).parent.mkdir(parents=True, exist_ok=True)
+        self._conexion = sqlite3.connect(ruta_cache, check_same_thread=False)
+        self._conexion.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS firmas ("
+            " dispositivo INTEGER NOT NULL, inodo INTEGER NOT NULL, tamano INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL, extension TEXT NOT NULL, generica INTEGER NOT NULL,"
+            " PRIMARY KEY (dispositivo, inodo)) WITHOUT ROWID;"
+        )
+        version = self._conexion.execute("SELECT valor FROM meta WHERE clave = 'version'").fetchone()
+        if version != (VERSION_FIRMAS,):
+            with self._conexion:
+                self._conexion.execute("DELETE FROM firmas")
+                self._conexion.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (VERSION_FIRMAS,))
+
+    def _necesita_lectura(self, categoria_nombre: str) -> bool:
+        return self.modo == SNIFF_TODOS or categoria_nombre == CATEGORIA_POR_DEFECTO
+
+    def _categoria(self, categoria_nombre: str, extension: str, generica: bool):
+        """Category from the content, or None to keep the one from the name"""
+        if not extension:
+            return None
+        categoria = self.reglas.categoria(extension)
+        if categoria == CATEGORIA_POR_DEFECTO or categoria == categoria_nombre:
+            return None
+        if generica and categoria_nombre != CATEGORIA_POR_DEFECTO:
+            return None
+        return categoria
+
+    def _consultar(self, claves: list) -> dict:
+        inodos = [clave[1] for clave in claves]
+        marcas = ",".join("?" * len(inodos))
+        with self._lock:
+            filas = self._conexion.execute(
+                f"SELECT dispositivo, inodo, tamano, mtime_ns, extension, generica FROM firmas WHERE inodo IN ({marcas})",
+                inodos,
+            ).fetchall()
+        return {fila[:4]: (fila[4], bool(fila[5])) for fila in filas}
+
+    def _guardar(self, nuevas: list):
+        with self._lock, self._conexion:
+            self._conexion.executemany("INSERT OR REPLACE INTO firmas VALUES (?, ?, ?, ?, ?, ?)", nuevas)
+
+    def _tanda(self, pool, archivos: list):
+        """Yields (archivo, categoria or None) for one batch, in order"""
+        clasificaciones = [self.reglas.clasificar(archivo.name, getattr(archivo, "st", None)) for archivo in archivos]
+        nombres = [clasificacion.categoria for clasificacion in clasificaciones]
+        # Lo que decidio una regla con condiciones no se lee: el contenido no la reemplaza
+        indices = [
+            i for i, clasificacion in enumerate(clasificaciones)
+            if not clasificacion.condicional and self._necesita_lectura(clasificacion.categoria)
+        ]
+        detectadas = [None] * len(archivos)
+
+        if indices:
+            claves = list(pool.map(_firma_archivo, [archivos[i] for i in indices]))
+            guardadas = self._consultar([c for c in claves if c is not None])
+
+            faltantes = [(i, clave) for i, clave in zip(indices, claves) if clave is not None and clave not in guardadas]
+            cabeceras = pool.map(_cabecera_o_nada, [archivos[i] for i, _ in faltantes])
+            nuevas = []
+            for (i, clave), cabecera in zip(faltantes, cabeceras):
+                extension, generica = self.tabla.identificar(cabecera)
+                guardadas[clave] = (extension, generica)
+                nuevas.append((*clave, extension, int(generica)))
+            if nuevas:
+                self._guardar(nuevas)
+
+            self.leidos += len(faltantes)
+            self.en_cache += len(indices) - len(faltantes)
+
+            for i, clave in zip(indices, claves):
+                if clave is not None:
+                    detectadas[i] = self._categoria(nombres[i], *guardadas[clave])
+
+        yield from zip(archivos, detectadas)
+
+    def etiquetar(self, archivos, stop_event=None):
+        """Streams (archivo, categoria or None) for every file, in the same order"""
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sniff") as pool:
+            tanda = []
+            for archivo in archivos:
+                tanda.append(archivo)
+                if len(tanda) >= TAMANO_TANDA:
+                    yield from self._tanda(pool, tanda)
+                    tanda = []
+                    if stop_event is not None and stop_event.is_set():
+                        return
+            if tanda:
+                yield from self._tanda(pool, tanda)
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
@@ -0,0 +1,160 @@
+# core/historial.py
+
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+
+# Movimientos acumulados antes de escribirlos en la base de datos
+TAMANO_ESCRITURA = 1000
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS ejecuciones (
+    id INTEGER PRIMARY KEY,
+    base TEXT NOT NULL,
+    inicio REAL NOT NULL,
+    fin REAL,
+    movidos INTEGER NOT NULL DEFAULT 0,
+    deshecha INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS carpetas (
+    id INTEGER PRIMARY KEY,
+    ruta TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS movimientos (
+    ejecucion INTEGER NOT NULL,
+    origen_carpeta INTEGER NOT NULL,
+    origen_nombre TEXT NOT NULL,
+    destino_carpeta INTEGER NOT NULL,
+    destino_nombre TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_movimientos_ejecucion ON movimientos (ejecucion);
+"""
+
+
+class HistorialMovimientos:
+    """
+    SQLite record of every applied run and its (source, destination) pairs.
+    Folders are interned in their own table, so each move stores two ids
+    and two names. Safe to share between threads.
+    """
+
+    def __init__(self, ruta: Path):
+        Path(ruta).parent.mkdir(parents=True, exist_ok=True)
+        self.ruta = ruta
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript(_ESQUEMA)
+        self._carpetas: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _id_carpeta(self, carpeta: str) -> int:
+        identificador = self._carpetas.get(carpeta)
+        if identificador is None:
+            self._conexion.execute("INSERT OR IGNORE INTO carpetas (ruta) VALUES (?)", (carpeta,))
+            (identificador,) = self._conexion.execute(
+                "SELECT id FROM carpetas WHERE ruta = ?", (carpeta,)
+            ).fetchone()
+            self._carpetas[carpeta] = identificador
+        return identificador
+
+    def iniciar(self, base: Path) -> "EjecucionRegistrada":
+        with self._lock, self._conexion:
+            cursor = self._conexion.execute(
+                "INSERT INTO ejecuciones (base, inicio) VALUES (?, ?)", (os.fspath(base), time.time())
+            )
+        return EjecucionRegistrada(self, cursor.lastrowid)
+
+    def _guardar(self, ejecucion: int, pares: list):
+        with self._lock, self._conexion:
+            filas = [
+                (
+                    ejecucion,
+                    self._id_carpeta(os.fspath(origen.parent)), origen.name,
+                    self._id_carpeta(os.fspath(destino.parent)), destino.name,
+                )
+                for origen, destino in pares
+            ]
+            self._conexion.executemany("INSERT INTO movimientos VALUES (?, ?, ?, ?, ?)", filas)
+            self._conexion.execute(
+                "UPDATE ejecuciones SET movidos = movidos + ? WHERE id = ?", (len(filas), ejecucion)
+            )
+
+    def _finalizar(self, ejecucion: int):
+        with self._lock, self._conexion:
+            self._conexion.execute("UPDATE ejecuciones SET fin = ? WHERE id = ?", (time.time(), ejecucion))
+
+    def ejecuciones(self) -> list[tuple]:
+        """(id, base, inicio, fin, movidos, deshecha) of every run, newest first"""
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT id, base, inicio, fin, movidos, deshecha FROM ejecuciones ORDER BY id DESC"
+            ).fetchall()
+
+    def ejecucion(self, ejecucion: int):
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT id, base, inicio, fin, movidos, deshecha FROM ejecuciones WHERE id = ?", (ejecucion,)
+            ).fetchone()
+
+    def ultima_ejecucion(self):
+        """Newest run that moved something and was not undone"""
+        with self._lock:
+            return self._conexion.execute(
+                "SELECT id, base, inicio, fin, movidos, deshecha FROM ejecuciones "
+                "WHERE deshecha = 0 AND movidos > 0 ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+
+    def movimientos(self, ejecucion: int, lote: int = TAMANO_ESCRITURA):
+        """Streams the (origen, destino) pairs of a run, last move first"""
+        consulta = (
+            "SELECT m.rowid, co.ruta, m.origen_nombre, cd.ruta, m.destino_nombre FROM movimientos m "
+            "JOIN carpetas co ON co.id = m.origen_carpeta "
+            "JOIN carpetas cd ON cd.id = m.destino_carpeta "
+            "WHERE m.ejecucion = ? AND m.rowid < ? ORDER BY m.rowid DESC LIMIT ?"
+        )
+        # Paginado por rowid: la conexion no queda ocupada entre lotes
+        ultimo = 2**63 - 1
+        while True:
+            with self._lock:
+                filas = self._conexion.execute(consulta, (ejecucion, ultimo, lote)).fetchall()
+            if not filas:
+                return
+            for ultimo, carpeta_origen, nombre_origen, carpeta_destino, nombre_destino in filas:
+                yield Path(carpeta_origen, nombre_origen), Path(carpeta_destino, nombre_destino)
+
+    def marcar_deshecha(self, ejecucion: int):
+        with self._lock, self._conexion:
+            self._conexion.execute("UPDATE ejecuciones SET deshecha = 1 WHERE id = ?", (ejecucion,))
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
+
+
+class EjecucionRegistrada:
+    """One applied run being recorded; pairs are written in batches"""
+
+    def __init__(self, historial: HistorialMovimientos, identificador: int):
+        self.historial = historial
+        self.id = identificador
+        self._pendientes = []
+        self._lock = threading.Lock()
+
+    def registrar(self, origen: Path, destino: Path):
+        with self._lock:
+            self._pendientes.append((origen, destino))
+            if len(self._pendientes) < TAMANO_ESCRITURA:
+                return
+            pares, self._pendientes = self._pendientes, []
+        self.historial._guardar(self.id, pares)
+
+    def cerrar(self):
+        with self._lock:
+            pares, self._pendientes = self._pendientes, []
+        if pares:
+            self.historial._guardar(self.id, pares)
+        self.historial._finalizar(self.id)
@@ -0,0 +1,205 @@
+# core/incremental.py
+
+import os
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+
+
+# Version del formato de la cache (otra version se reconstruye)
+VERSION_CACHE = "2"
+
+# Carpetas modificadas hace menos de esto no se guardan como limpias: un cambio
+# en el mismo tick de mtime pasaria desapercibido (FAT usa 2 segundos)
+MARGEN_MTIME_NS = 2_000_000_000
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS carpetas (
+    ruta TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    inodo INTEGER NOT NULL,
+    excluidos INTEGER NOT NULL,
+    subcarpetas BLOB NOT NULL,
+    archivos BLOB NOT NULL,
+    metadatos BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _unir(nombres) -> bytes:
+    # surrogateescape: nombres que no son UTF-8 valido vuelven intactos
+    return "\0".join(nombres).encode("utf-8", "surrogateescape")
+
+
+def _separar(datos: bytes) -> list:
+    return datos.decode("utf-8", "surrogateescape").split("\0") if datos else []
+
+
+def ruta_cache(directorio: Path, raiz: Path) -> Path:
+    """One cache database per organized root"""
+    clave = hashlib.sha1(os.fsencode(os.fspath(raiz))).hexdigest()[:16]
+    return Path(directorio) / f"dirs-{clave}.sqlite"
+
+
+class CacheDirectorios:
+    """
+    Directory state of the previous runs over one root: for each folder, its
+    mtime, inode, excluded entries, accepted subfolders and pending files
+    (name, size and mtime of the accepted files that are not settled). A
+    folder whose mtime and inode did not change still holds the same
+    entries, so the walk reuses them instead of listing it again.
+
+    Settled files are the ones the run's 'asentado' check says stay where
+    they are (e.g. already in their category folder); they are not stored,
+    so a folder that only holds such files costs one stat per run. Files
+    edited in place without changing their folder keep the size and mtime
+    stored when the folder was listed.
+
+    The cache is rebuilt when it cannot be read, when it was made with other
+    walk options ('huella') or when it turns out to be inconsistent (a folder
+    it vouched for is gone).
+    """
+
+    def __init__(self, ruta: Path, raiz: Path, huella: str):
+        self.ruta = Path(ruta)
+        self.raiz = os.fspath(raiz)
+        self.huella = huella
+        self.reutilizadas = 0
+        self.listadas = 0
+        self._inconsistente = False
+        self._limpias: dict[str, tuple] = {}
+        self._visitadas: dict[str, tuple] = {}
+        self._nuevas: dict[str, tuple] = {}
+        self._limite_ns = time.time_ns() - MARGEN_MTIME_NS
+        self._lock = threading.Lock()
+
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            self._conexion = self._abrir()
+        except sqlite3.DatabaseError as e:
+            logging.warning(f"Directory cache {self.ruta} is unreadable, rebuilding it: {e}")
+            self._borrar()
+            self._conexion = self._abrir()
+
+    def _borrar(self):
+        for sufijo in ("", "-wal", "-shm"):
+            try:
+                os.remove(f"{self.ruta}{sufijo}")
+            except FileNotFoundError:
+                pass
+
+    def _abrir(self) -> sqlite3.Connection:
+        conexion = sqlite3.connect(self.ruta)
+        conexion.executescript(_ESQUEMA)
+        meta = dict(conexion.execute("SELECT clave, valor FROM meta"))
+
+        try:
+            inodo_raiz = os.stat(self.raiz).st_ino
+        except OSError:
+            inodo_raiz = -1
+        esperado = {"version": VERSION_CACHE, "raiz": self.raiz, "inodo_raiz": str(inodo_raiz), "huella": self.huella}
+
+        if meta != esperado:
+            if meta:
+                logging.info(f"Directory cache {self.ruta} was made with other options, rebuilding it")
+            with conexion:
+                conexion.execute("DELETE FROM carpetas")
+                conexion.execute("DELETE FROM meta")
+                conexion.executemany("INSERT INTO meta VALUES (?, ?)", esperado.items())
+            return conexion
+
+        for ruta, *entrada in conexion.execute("SELECT * FROM carpetas"):
+            self._limpias[ruta] = tuple(entrada)
+        return conexion
+
+    def consultar(self, carpeta: str):
+        """
+        Returns (firma, resultado). 'resultado' is the cached listing when
+        the folder did not change, None otherwise: (pending files as
+        (name, size, mtime_ns), subfolders, excluded), sorted by name; size
+        and mtime are -1 when unknown. 'firma' is (mtime_ns, inode), taken
+        before listing
+        """
+        try:
+            st = os.stat(carpeta)
+        except FileNotFoundError:
+            # Una carpeta que la cache daba por existente ya no esta
+            self._inconsistente = True
+            return None, None
+        except OSError:
+            return None, None
+
+        firma = (st.st_mtime_ns, st.st_ino)
+        guardada = self._limpias.get(carpeta)
+        if guardada is None or guardada[:2] != firma:
+            return firma, None
+
+        with self._lock:
+            self._visitadas[carpeta] = guardada
+            self.reutilizadas += 1
+
+        _, _, excluidos, subcarpetas, archivos, metadatos = guardada
+        valores = array("q")
+        valores.frombytes(metadatos)
+        pendientes = list(zip(_separar(archivos), valores[0::2], valores[1::2]))
+        return firma, (pendientes, [os.path.join(carpeta, nombre) for nombre in _separar(subcarpetas)], excluidos)
+
+    def registrar(self, carpeta: str, firma, resultado, asentado=None):
+        """
+        Stores a fresh listing. 'asentado(archivo)' tells the files that stay
+        where they are; those are left out of the pending files
+        """
+        archivos, subcarpetas, excluidos = resultado
+        with self._lock:
+            self.listadas += 1
+        if firma is None or firma[0] >= self._limite_ns:
+            return
+
+        if asentado is not None:
+            archivos = [archivo for archivo in archivos if not asentado(archivo)]
+        # Orden por nombre: sirve tanto al recorrido normal como al ordenado
+        archivos = sorted(archivos, key=lambda archivo: archivo.name)
+        metadatos = array("q")
+        for archivo in archivos:
+            st = getattr(archivo, "st", None)
+            metadatos.extend((st.st_size, st.st_mtime_ns) if st is not None else (-1, -1))
+
+        entrada = (
+            firma[0], firma[1], excluidos, _unir(sorted(os.path.basename(s) for s in subcarpetas)),
+            _unir(archivo.name for archivo in archivos), metadatos.tobytes(),
+        )
+        with self._lock:
+            self._visitadas[carpeta] = entrada
+            self._nuevas[carpeta] = entrada
+
+    def guardar(self, completo: bool = True):
+        """
+        Writes back the changes. After a complete walk the folders that were
+        not visited (deleted, or listed too soon after a change) are dropped
+        """
+        with self._lock, self._conexion:
+            if self._inconsistente:
+                logging.warning(f"Directory cache {self.ruta} was inconsistent, it will be rebuilt")
+                self._conexion.execute("DELETE FROM carpetas")
+                return
+
+            if completo:
+                obsoletas = [(ruta,) for ruta in self._limpias if ruta not in self._visitadas]
+                self._conexion.executemany("DELETE FROM carpetas WHERE ruta = ?", obsoletas)
+
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO carpetas VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(ruta, *entrada) for ruta, entrada in self._nuevas.items()],
+            )
+            self._nuevas.clear()
+
+    def cerrar(self):
+        self._conexion.close()
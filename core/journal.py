@@ -0,0 +1,239 @@
+# core/journal.py
+
+import os
+import struct
+import threading
+from pathlib import Path
+
+from core.duplicados import ACCIONES
+
+
+# Cabecera del diario de movimientos
+MAGIA_DIARIO = b"ORGWAL\x00\x01"
+
+# Tipos de registro
+_PLANIFICADO = b"P"
+_COMPLETADO = b"C"
+_FIN_PLAN = b"F"
+
+# P: id, banderas, largo categoria, largo origen, largo destino (+ textos)
+# Banderas: bit 0 renombrado, bits 1+ indice de la accion en ACCIONES
+_CABECERA_P = struct.Struct("<QBIII")
+_ID = struct.Struct("<Q")
+_U32 = struct.Struct("<I")
+
+_TAMANO_LECTURA = 1 << 20
+
+
+def _codificar(valor) -> bytes:
+    return os.fspath(valor).encode("utf-8", "surrogateescape")
+
+
+def _decodificar(datos) -> str:
+    return bytes(datos).decode("utf-8", "surrogateescape")
+
+
+class EstadoDiario:
+    """
+    Summary of a journal built in one streaming pass: which moves completed
+    (a bitmap, so each check is O(1)), how many were planned and whether
+    planning reached the end. The planned entries stay on disk
+    """
+
+    def __init__(self, base: Path):
+        self.base = base
+        self.completados = bytearray()
+        self.planificados = 0
+        self.siguiente_id = 0
+        self.planificacion_completa = False
+        self.bytes_validos = 0
+
+    def marcar(self, registro: int):
+        if registro >= len(self.completados):
+            self.completados.extend(bytes(registro + 1 - len(self.completados)))
+        self.completados[registro] = 1
+
+    def completado(self, registro: int) -> bool:
+        return registro < len(self.completados) and self.completados[registro] == 1
+
+    @property
+    def pendientes(self) -> int:
+        return self.planificados - self.completados.count(1)
+
+    @property
+    def terminado(self) -> bool:
+        return self.planificacion_completa and self.pendientes == 0
+
+
+def _registros(ruta: Path):
+    """
+    Streams (offset_fin, tipo, valores) for every complete record of a
+    journal; the first item is the header (base). Stops at a torn record
+    """
+    with open(ruta, "rb") as f:
+        buffer = b""
+        pos = 0
+        fin_archivo = False
+
+        def asegurar(cantidad: int) -> bool:
+            nonlocal buffer, pos, fin_archivo
+            while len(buffer) - pos < cantidad and not fin_archivo:
+                bloque = f.read(_TAMANO_LECTURA)
+                if not bloque:
+                    fin_archivo = True
+                    break
+                buffer = buffer[pos:] + bloque
+                pos = 0
+            return len(buffer) - pos >= cantidad
+
+        if not asegurar(len(MAGIA_DIARIO) + _U32.size) or buffer[:len(MAGIA_DIARIO)] != MAGIA_DIARIO:
+            raise ValueError(f"{ruta} is not a move journal")
+        (largo,) = _U32.unpack_from(buffer, len(MAGIA_DIARIO))
+        inicio = len(MAGIA_DIARIO) + _U32.size
+        if not asegurar(inicio + largo):
+            raise ValueError(f"Truncated move journal {ruta}")
+        pos = inicio + largo
+        consumidos = pos
+        yield consumidos, None, Path(_decodificar(buffer[inicio:pos]))
+
+        while asegurar(1):
+            tipo = buffer[pos:pos + 1]
+            if tipo == _PLANIFICADO:
+                if not asegurar(1 + _CABECERA_P.size):
+                    return
+                registro, banderas, largo_cat, largo_origen, largo_destino = _CABECERA_P.unpack_from(buffer, pos + 1)
+                total = 1 + _CABECERA_P.size + largo_cat + largo_origen + largo_destino
+                if not asegurar(total):
+                    return
+                texto = pos + 1 + _CABECERA_P.size
+                categoria = _decodificar(buffer[texto:texto + largo_cat])
+                texto += largo_cat
+                origen = _decodificar(buffer[texto:texto + largo_origen])
+                texto += largo_origen
+                destino = _decodificar(buffer[texto:texto + largo_destino])
+                valores = (registro, origen, destino, categoria, bool(banderas & 1), ACCIONES[banderas >> 1])
+            elif tipo == _COMPLETADO:
+                total = 1 + _ID.size
+                if not asegurar(total):
+                    return
+                valores = _ID.unpack_from(buffer, pos + 1)
+            elif tipo == _FIN_PLAN:
+                total = 1
+                valores = ()
+            else:
+                return
+
+            pos += total
+            consumidos += total
+            yield consumidos, tipo, valores
+
+
+def leer_estado(ruta: Path) -> EstadoDiario:
+    registros = _registros(ruta)
+    fin_cabecera, _, base = next(registros)
+    estado = EstadoDiario(base)
+    estado.bytes_validos = fin_cabecera
+
+    for fin, tipo, valores in registros:
+        if tipo == _PLANIFICADO:
+            estado.planificados += 1
+            estado.siguiente_id = max(estado.siguiente_id, valores[0] + 1)
+        elif tipo == _COMPLETADO:
+            estado.marcar(valores[0])
+        else:
+            estado.planificacion_completa = True
+        estado.bytes_validos = fin
+
+    return estado
+
+
+def movimientos_pendientes(ruta: Path, estado: EstadoDiario):
+    """Streams (registro, origen, destino, categoria, renombrado, accion) of the moves not completed yet"""
+    registros = _registros(ruta)
+    next(registros)
+    for _, tipo, valores in registros:
+        if tipo == _PLANIFICADO and not estado.completado(valores[0]):
+            registro, origen, destino, categoria, renombrado, accion = valores
+            yield registro, Path(origen), Path(destino), categoria, renombrado, accion
+
+
+class DiarioMovimientos:
+    """
+    Append-only write-ahead journal: every planned move is written before
+    it runs and every completed move afterwards. Records are fsynced in
+    batches of 'sync_cada', trading durability for throughput.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, ruta: Path, base: Path, archivo, siguiente_id: int, sync_cada: int):
+        self.ruta = ruta
+        self.base = base
+        self._archivo = archivo
+        self._siguiente = siguiente_id
+        self._sync_cada = max(1, sync_cada)
+        self._sin_sync = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def crear(cls, ruta: Path, base: Path, sync_cada: int = 256) -> "DiarioMovimientos":
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        archivo = open(ruta, "wb")
+        datos = _codificar(base)
+        archivo.write(MAGIA_DIARIO + _U32.pack(len(datos)) + datos)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+        return cls(ruta, base, archivo, 0, sync_cada)
+
+    @classmethod
+    def continuar(cls, ruta: Path, estado: EstadoDiario, sync_cada: int = 256) -> "DiarioMovimientos":
+        """Reopens a journal for appending, dropping a torn last record"""
+        archivo = open(ruta, "r+b")
+        archivo.truncate(estado.bytes_validos)
+        archivo.seek(estado.bytes_validos)
+        return cls(ruta, estado.base, archivo, estado.siguiente_id, sync_cada)
+
+    def _escribir(self, datos: bytes):
+        self._archivo.write(datos)
+        self._sin_sync += 1
+        if self._sin_sync >= self._sync_cada:
+            self._sincronizar()
+
+    def _sincronizar(self):
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._sin_sync = 0
+
+    def planificado(self, mov) -> int:
+        categoria = _codificar(mov.categoria)
+        origen = _codificar(mov.origen)
+        destino = _codificar(mov.destino)
+        with self._lock:
+            registro = self._siguiente
+            self._siguiente += 1
+            self._escribir(
+                _PLANIFICADO
+                + _CABECERA_P.pack(
+                    registro, mov.renombrado | ACCIONES.index(mov.accion) << 1, len(categoria), len(origen), len(destino)
+                )
+                + categoria + origen + destino
+            )
+        return registro
+
+    def completado(self, registro: int):
+        with self._lock:
+            self._escribir(_COMPLETADO + _ID.pack(registro))
+
+    def fin_planificacion(self):
+        with self._lock:
+            self._escribir(_FIN_PLAN)
+            self._sincronizar()
+
+    def sincronizar(self):
+        with self._lock:
+            self._sincronizar()
+
+    def cerrar(self):
+        with self._lock:
+            if not self._archivo.closed:
+                self._sincronizar()
+                self._archivo.close()
@@ -1,7 +1,15 @@
 # core/logging_utils.py
 
+import os
 import sys
+import gzip
+import time
+import queue
+import atexit
+import shutil
 import logging
+import threading
+import logging.handlers
 from pathlib import Path
 
 
@@ -44,7 +52,152 @@ def obtener_ruta_base():
         return Path(__file__).parent.resolve()
 
 
-def log_config(log_file, log_level):
+# Rotation defaults: size in bytes, age in seconds (0 = never) and rotated files kept
+TAMANO_MAXIMO = 10 * 1024 * 1024
+ROTAR_CADA = 0
+COPIAS = 5
+
+# Records written before each flush of the log files
+TAMANO_LOTE = 256
+
+# Listener of the active configuration (None until log_config runs)
+_oyente = None
+
+
+def _nombre_gz(nombre: str) -> str:
+    return nombre + ".gz"
+
+
+def _comprimir(origen: str, destino: str):
+    with open(origen, "rb") as entrada, gzip.open(destino, "wb") as salida:
+        shutil.copyfileobj(entrada, salida)
+    os.remove(origen)
+
+
+class ArchivoRotativo(logging.handlers.RotatingFileHandler):
+    """
+    Log file rotated by size and/or age, optionally gzipping the rotated
+    copies. Records are written without flushing: the listener flushes
+    once per batch
+    """
+
+    def __init__(self, ruta: Path, tamano_maximo: int = TAMANO_MAXIMO, rotar_cada: float = ROTAR_CADA,
+                 copias: int = COPIAS, comprimir: bool = False):
+        super().__init__(ruta, mode="a", maxBytes=tamano_maximo, backupCount=copias, encoding="utf-8", delay=True)
+        self.rotar_cada = rotar_cada
+        if comprimir:
+            self.namer = _nombre_gz
+            self.rotator = _comprimir
+
+        # Like TimedRotatingFileHandler, the age counts from the last write of an existing file
+        try:
+            inicio = os.stat(ruta).st_mtime
+        except OSError:
+            inicio = time.time()
+        self._siguiente = inicio + rotar_cada if rotar_cada else None
+
+    def shouldRollover(self, record) -> bool:
+        if self._siguiente is not None and time.time() >= self._siguiente:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        if self.rotar_cada:
+            self._siguiente = time.time() + self.rotar_cada
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class OyenteLotes:
+    """
+    Background thread that writes the queued log records. Whatever is
+    waiting in the queue is written as one batch, followed by a single
+    flush of each file
+    """
+
+    _FIN = object()
+
+    def __init__(self, cola: queue.SimpleQueue, handlers: list, lote: int = TAMANO_LOTE):
+        self.cola = cola
+        self.handlers = handlers
+        self.lote = lote
+        self._hilo = threading.Thread(target=self._escribir, name="log-writer", daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def _escribir(self):
+        while True:
+            registros = [self.cola.get()]
+            while len(registros) < self.lote:
+                try:
+                    registros.append(self.cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            fin = False
+            avisos = []
+            for registro in registros:
+                if registro is self._FIN:
+                    fin = True
+                elif isinstance(registro, threading.Event):
+                    avisos.append(registro)
+                else:
+                    for handler in self.handlers:
+                        if registro.levelno >= handler.level:
+                            handler.handle(registro)
+
+            for handler in self.handlers:
+                handler.flush()
+            for aviso in avisos:
+                aviso.set()
+            if fin:
+                return
+
+    def vaciar(self, espera: float = 5.0) -> bool:
+        """Waits until every record queued so far is written to disk"""
+        if not self._hilo.is_alive():
+            return True
+        escrito = threading.Event()
+        self.cola.put(escrito)
+        return escrito.wait(espera)
+
+    def detener(self):
+        """Writes the pending records and closes the files"""
+        if self._hilo.is_alive():
+            self.cola.put(self._FIN)
+            self._hilo.join()
+        for handler in self.handlers:
+            handler.close()
+
+
+def vaciar_logs():
+    """Flushes the pending log records (e.g. after a cancelled run)"""
+    if _oyente is not None:
+        _oyente.vaciar()
+
+
+def detener_logging():
+    """Writes the pending log records and closes the log files. Runs at exit"""
+    global _oyente
+    if _oyente is not None:
+        _oyente.detener()
+        _oyente = None
+
+
+def log_config(log_file, log_level, tamano_maximo: int = TAMANO_MAXIMO, rotar_cada: float = ROTAR_CADA,
+               copias: int = COPIAS, comprimir: bool = False):
+    global _oyente
+
     # Process paths
     ruta_log = log_file
     ruta_log.mkdir(parents=True, exist_ok=True)
@@ -64,6 +217,7 @@ def log_config(log_file, log_level):
 
     if logger.hasHandlers():
         logger.handlers.clear()
+    detener_logging()
 
     # Define message format
     formato = logging.Formatter(
@@ -72,13 +226,20 @@ def log_config(log_file, log_level):
 
     # General handler
     archivo_general = ruta_log / "organization.log"
-    archivo_handler = logging.FileHandler(archivo_general, mode="a", encoding="utf-8")
+    archivo_handler = ArchivoRotativo(archivo_general, tamano_maximo, rotar_cada, copias, comprimir)
     archivo_handler.setFormatter(formato)
-    logger.addHandler(archivo_handler)
 
     # ERROR handler (ERROR and CRITICAL only)
     archivo_errores = ruta_log / "error.log"
-    error_handler = logging.FileHandler(archivo_errores, mode="a", encoding="utf-8")
+    error_handler = ArchivoRotativo(archivo_errores, tamano_maximo, rotar_cada, copias, comprimir)
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(formato)
-    logger.addHandler(error_handler)
\ No newline at end of file
+
+    # The threads that log only enqueue; one listener thread writes the files
+    cola = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(cola))
+    _oyente = OyenteLotes(cola, [archivo_handler, error_handler])
+    _oyente.iniciar()
+
+
+atexit.register(detener_logging)
@@ -0,0 +1,79 @@
+# core/pipeline.py
+
+import queue
+import threading
+
+
+_FIN = object()
+
+# Segundos entre comprobaciones de cierre mientras la cola esta llena
+_ESPERA_COLA = 0.1
+
+
+class _ErrorEtapa:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def en_segundo_plano(iterable, capacidad: int = 8, lote: int = 256, por_lotes: bool = False, nombre: str = "stage"):
+    """
+    Runs 'iterable' on a background thread and yields its items through a
+    bounded queue of at most 'capacidad' chunks, so the producer works ahead
+    of the consumer without ever holding more than capacidad * lote items.
+
+    Chunks hold up to 'lote' items but are handed over early when the queue
+    is empty, so a slow producer never leaves the consumer waiting for a
+    full chunk. With por_lotes=True the chunks (lists) are yielded as is.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    cola = queue.Queue(maxsize=capacidad)
+    cerrar = threading.Event()
+
+    def poner(item) -> bool:
+        while not cerrar.is_set():
+            try:
+                cola.put(item, timeout=_ESPERA_COLA)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def productor():
+        iterador = iter(iterable)
+        try:
+            pendiente = []
+            for item in iterador:
+                pendiente.append(item)
+                if len(pendiente) >= lote or cola.empty():
+                    if not poner(pendiente):
+                        return
+                    pendiente = []
+            if pendiente:
+                poner(pendiente)
+        except BaseException as e:
+            poner(_ErrorEtapa(e))
+        finally:
+            # El generador se cierra en el mismo hilo que lo consumia
+            cerrar_iterador = getattr(iterador, "close", None)
+            if cerrar_iterador is not None:
+                cerrar_iterador()
+            poner(_FIN)
+
+    hilo = threading.Thread(target=productor, name=nombre, daemon=True)
+    hilo.start()
+
+    try:
+        while True:
+            item = cola.get()
+            if item is _FIN:
+                return
+            if isinstance(item, _ErrorEtapa):
+                raise item.error
+            if por_lotes:
+                yield item
+            else:
+                yield from item
+    finally:
+        cerrar.set()
@@ -0,0 +1,178 @@
+# core/plan.py
+
+import os
+import zlib
+import struct
+from pathlib import Path
+
+from core.duplicados import ACCIONES
+
+
+# Cabecera del archivo de plan (formato binario comprimido con zlib)
+MAGIA_PLAN = b"ORGPLAN\x01"
+
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+# Origen, destino, categoria, banderas (bit 0 renombrado, bits 1+ accion)
+_ENTRADA = struct.Struct("<IIHB")
+
+# Sin carpeta (no existia al simular)
+_SIN_MTIME = -1
+
+
+def _mtime(carpeta: str) -> int:
+    try:
+        return os.stat(carpeta).st_mtime_ns
+    except OSError:
+        return _SIN_MTIME
+
+
+class PlanMovimientos:
+    """
+    Moves planned by a simulation, stored compactly: folders and categories
+    are interned in tables and each move keeps only indexes plus both names.
+    The mtime of every folder involved is recorded when it is first seen,
+    so a later apply can detect which entries went stale.
+    """
+
+    def __init__(self, base: Path):
+        self.base = Path(base)
+        self._carpetas: list[str] = []
+        self._mtimes: list[int] = []
+        self._id_carpeta: dict[str, int] = {}
+        self._categorias: list[str] = []
+        self._id_categoria: dict[str, int] = {}
+        self._entradas: list[tuple[int, str, int, str, int, int]] = []
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _carpeta(self, carpeta: str, mtime=None) -> int:
+        indice = self._id_carpeta.get(carpeta)
+        if indice is None:
+            indice = len(self._carpetas)
+            self._id_carpeta[carpeta] = indice
+            self._carpetas.append(carpeta)
+            self._mtimes.append(_mtime(carpeta) if mtime is None else mtime)
+        return indice
+
+    def _categoria(self, categoria: str) -> int:
+        indice = self._id_categoria.get(categoria)
+        if indice is None:
+            indice = len(self._categorias)
+            self._id_categoria[categoria] = indice
+            self._categorias.append(categoria)
+        return indice
+
+    def agregar(self, mov):
+        origen, destino = mov.origen, mov.destino
+        self._entradas.append((
+            self._carpeta(os.fspath(origen.parent)),
+            origen.name,
+            self._carpeta(os.fspath(destino.parent)),
+            destino.name,
+            self._categoria(mov.categoria),
+            mov.renombrado | ACCIONES.index(mov.accion) << 1,
+        ))
+
+    def entradas(self):
+        """Yields (origen, destino, categoria, renombrado, accion) tuples"""
+        carpetas = [Path(c) for c in self._carpetas]
+        for id_origen, nombre, id_destino, nombre_destino, id_categoria, banderas in self._entradas:
+            yield (
+                carpetas[id_origen] / nombre,
+                carpetas[id_destino] / nombre_destino,
+                self._categorias[id_categoria],
+                bool(banderas & 1),
+                ACCIONES[banderas >> 1],
+            )
+
+    def carpetas_modificadas(self) -> set[Path]:
+        """Folders whose mtime changed since the plan was made (one stat per folder)"""
+        return {
+            Path(carpeta)
+            for carpeta, mtime in zip(self._carpetas, self._mtimes)
+            if _mtime(carpeta) != mtime
+        }
+
+    def guardar(self, ruta: Path):
+        compresor = zlib.compressobj(6)
+        bloque = bytearray()
+
+        def texto(valor: str):
+            datos = valor.encode("utf-8", "surrogateescape")
+            bloque.extend(_U32.pack(len(datos)))
+            bloque.extend(datos)
+
+        with open(ruta, "wb") as f:
+            f.write(MAGIA_PLAN)
+
+            texto(os.fspath(self.base))
+            bloque.extend(_U32.pack(len(self._carpetas)))
+            for carpeta, mtime in zip(self._carpetas, self._mtimes):
+                texto(carpeta)
+                bloque.extend(_I64.pack(mtime))
+
+            bloque.extend(_U32.pack(len(self._categorias)))
+            for categoria in self._categorias:
+                texto(categoria)
+
+            bloque.extend(_U32.pack(len(self._entradas)))
+            for id_origen, nombre, id_destino, nombre_destino, id_categoria, banderas in self._entradas:
+                bloque.extend(_ENTRADA.pack(id_origen, id_destino, id_categoria, banderas))
+                texto(nombre)
+                texto(nombre_destino)
+                if len(bloque) >= 1 << 16:
+                    f.write(compresor.compress(bytes(bloque)))
+                    bloque.clear()
+
+            f.write(compresor.compress(bytes(bloque)))
+            f.write(compresor.flush())
+
+    @classmethod
+    def cargar(cls, ruta: Path) -> "PlanMovimientos":
+        with open(ruta, "rb") as f:
+            if f.read(len(MAGIA_PLAN)) != MAGIA_PLAN:
+                raise ValueError(f"{ruta} is not a move plan file")
+            try:
+                datos = memoryview(zlib.decompress(f.read()))
+            except zlib.error as e:
+                raise ValueError(f"Corrupted move plan {ruta}: {e}") from e
+
+        pos = 0
+
+        def leer(estructura):
+            nonlocal pos
+            valores = estructura.unpack_from(datos, pos)
+            pos += estructura.size
+            return valores
+
+        def texto() -> str:
+            nonlocal pos
+            (largo,) = leer(_U32)
+            valor = bytes(datos[pos:pos + largo]).decode("utf-8", "surrogateescape")
+            pos += largo
+            return valor
+
+        try:
+            plan = cls(Path(texto()))
+
+            (total,) = leer(_U32)
+            for _ in range(total):
+                carpeta = texto()
+                (mtime,) = leer(_I64)
+                plan._carpeta(carpeta, mtime)
+
+            (total,) = leer(_U32)
+            for _ in range(total):
+                plan._categoria(texto())
+
+            (total,) = leer(_U32)
+            entradas = plan._entradas
+            for _ in range(total):
+                id_origen, id_destino, id_categoria, banderas = leer(_ENTRADA)
+                entradas.append((id_origen, texto(), id_destino, texto(), id_categoria, banderas))
+        except struct.error as e:
+            raise ValueError(f"Truncated move plan {ruta}: {e}") from e
+
+        return plan
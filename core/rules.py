@@ -1,17 +1,403 @@
 # core/rules.py
 
-from pathlib import Path
+from bisect import bisect_left
+from pathlib import Path, PurePath
+from types import MappingProxyType
+from typing import NamedTuple
+import fnmatch
+import os
 import logging
 import json
+import time
+import re
 import click
 
+from core.stats import Stats
 
-def detectar_categoria(extension, reglas):
-    for categoria, extensiones in reglas.items():
-        if extension in extensiones:
-            return categoria
-    return "otros"
 
+# Categoria para las extensiones sin regla
+CATEGORIA_POR_DEFECTO = "Others"
+
+
+def normalizar_extension(ext: str) -> str:
+    ext = ext.lower()
+    return ext if ext.startswith(".") else f".{ext}"
+
+
+# Condiciones de una regla escrita como objeto; todas las presentes deben cumplirse
+CONDICIONES = ("extensions", "glob", "regex", "min_size", "max_size", "older_than_days", "newer_than_days")
+
+# Multiplicadores de los tamanos escritos como texto ("500KB", "1.5 GB")
+UNIDADES = {"": 1, "b": 1, "kb": 1024, "mb": 1024 ** 2, "gb": 1024 ** 3, "tb": 1024 ** 4}
+
+_TAMANO = re.compile(r"\s*(\d+(?:\.\d+)?)\s*([a-z]*)\s*")
+_COMODINES = frozenset("*?[")
+_SEGUNDOS_DIA = 86400
+
+# Caracteres que se toman como literales al leer el prefijo de una regex ('^INV-\d+' -> 'inv-')
+_LITERALES_REGEX = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_ ,=@#%&~'")
+
+# Largo maximo de los prefijos indexados: acota las consultas por archivo
+LARGO_PREFIJO = 8
+
+
+def leer_tamano(valor) -> int:
+    """Bytes of a size given as a number or as text with a unit ('1GB')"""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool) and valor >= 0:
+        return int(valor)
+    if isinstance(valor, str):
+        coincidencia = _TAMANO.fullmatch(valor.lower())
+        if coincidencia and coincidencia.group(2) in UNIDADES:
+            return int(float(coincidencia.group(1)) * UNIDADES[coincidencia.group(2)])
+    raise ValueError(f"invalid size {valor!r}")
+
+
+def _extension_de_glob(patron: str):
+    """Longest literal dotted suffix of a glob ('*.tar.gz' -> '.tar.gz', 'INV-*.pdf' -> '.pdf'); None if there is none"""
+    # Lo literal empieza tras el ultimo comodin o clase ('[a.b]')
+    inicio = max(patron.rfind(c) for c in "*?[]") + 1
+    punto = patron.find(".", inicio)
+    # Un punto inicial ('.bashrc') no es una extension
+    if punto <= 0 or len(patron) - punto < 2:
+        return None
+    return patron[punto:].lower()
+
+
+def _combinar_extensiones(extensiones: set, literales: set) -> set:
+    """
+    Extensions that meet both sets: when one ends with the other the name
+    must end with the longer one ('.gz' and '.tar.gz' -> '.tar.gz')
+    """
+    return {
+        max(a, b, key=len) for a in extensiones for b in literales
+        if a.endswith(b) or b.endswith(a)
+    }
+
+
+def _prefijo_de_glob(patron: str) -> str:
+    """Literal start of a glob, lowercased ('INV-*.pdf' -> 'inv-')"""
+    for i, caracter in enumerate(patron):
+        if caracter in _COMODINES:
+            return patron[:i].lower()
+    return patron.lower()
+
+
+def _prefijo_de_regex(patron: str) -> str:
+    """Literal start of an anchored regex, lowercased; '' when it has none"""
+    if not patron.startswith("^") or "|" in patron:
+        return ""
+    prefijo = []
+    for caracter in patron[1:]:
+        if caracter in "*?{":
+            # El cuantificador vuelve opcional al caracter anterior
+            if prefijo:
+                prefijo.pop()
+            break
+        if caracter not in _LITERALES_REGEX:
+            break
+        prefijo.append(caracter)
+    return "".join(prefijo).lower()
+
+
+def _lista_de_textos(valor, clave: str) -> list:
+    if isinstance(valor, str):
+        valor = [valor]
+    if not valor or not isinstance(valor, list) or not all(isinstance(v, str) for v in valor):
+        raise ValueError(f"'{clave}' must be a text or a non-empty list of texts")
+    return valor
+
+
+class ReglaCondicional:
+    """
+    One rule written as an object, e.g. {"glob": "*.log", "older_than_days": 30}.
+    'prefijo' (literal start of every matching name) and 'extensiones' (the
+    extensions it can match) are how ReglasCompiladas indexes it; a rule
+    found through its extension needs no extension or '*.ext' check per file
+    """
+    __slots__ = (
+        "categoria", "extensiones", "prefijo", "glob", "regex", "extensiones_nombre",
+        "min_tamano", "max_tamano", "edad_minima", "edad_maxima", "necesita_stat",
+    )
+
+    def __init__(self, categoria: str, condiciones: dict):
+        desconocidas = set(condiciones) - set(CONDICIONES)
+        if desconocidas:
+            raise ValueError(f"unknown condition {', '.join(sorted(desconocidas))}")
+        if not condiciones:
+            raise ValueError("a rule needs at least one condition")
+
+        extensiones = None
+        if "extensions" in condiciones:
+            extensiones = set(map(normalizar_extension, _lista_de_textos(condiciones["extensions"], "extensions")))
+
+        self.glob = None
+        prefijos = []
+        if "glob" in condiciones:
+            globs = _lista_de_textos(condiciones["glob"], "glob")
+            literales = [_extension_de_glob(g) for g in globs]
+            if None not in literales:
+                extensiones = set(literales) if extensiones is None else _combinar_extensiones(extensiones, set(literales))
+            # Solo globs '*.ext': equivalen a la extension y no hace falta la expresion
+            if not all(ext is not None and g.lower() == f"*{ext}" for g, ext in zip(globs, literales)):
+                self.glob = re.compile("|".join(fnmatch.translate(g) for g in globs), re.IGNORECASE)
+            prefijos.append(os.path.commonprefix([_prefijo_de_glob(g) for g in globs]))
+
+        self.regex = None
+        if "regex" in condiciones:
+            if not isinstance(condiciones["regex"], str):
+                raise ValueError("'regex' must be a text")
+            try:
+                self.regex = re.compile(condiciones["regex"])
+            except re.error as e:
+                raise ValueError(f"invalid regex {condiciones['regex']!r}: {e}") from None
+            prefijos.append(_prefijo_de_regex(condiciones["regex"]))
+
+        self.categoria = categoria
+        self.extensiones = None if extensiones is None else frozenset(extensiones)
+        self.prefijo = max(prefijos, key=len, default="")[:LARGO_PREFIJO] or None
+        # Indexada por prefijo, la extension (de 'extensions' o de un glob '*.ext' sin expresion) se comprueba con el nombre
+        self.extensiones_nombre = None
+        if self.prefijo is not None and self.extensiones is not None:
+            self.extensiones_nombre = tuple(self.extensiones)
+        self.min_tamano = leer_tamano(condiciones["min_size"]) if "min_size" in condiciones else None
+        self.max_tamano = leer_tamano(condiciones["max_size"]) if "max_size" in condiciones else None
+        self.edad_minima = self._dias(condiciones, "older_than_days")
+        self.edad_maxima = self._dias(condiciones, "newer_than_days")
+        self.necesita_stat = any(
+            limite is not None for limite in (self.min_tamano, self.max_tamano, self.edad_minima, self.edad_maxima)
+        )
+
+    @staticmethod
+    def _dias(condiciones: dict, clave: str):
+        if clave not in condiciones:
+            return None
+        dias = condiciones[clave]
+        if isinstance(dias, bool) or not isinstance(dias, (int, float)) or dias < 0:
+            raise ValueError(f"'{clave}' must be a number of days")
+        return dias * _SEGUNDOS_DIA
+
+    def patron_nombre(self):
+        """Regex source of the name conditions, for the combined prefilter ('' matches any name)"""
+        if self.regex is not None:
+            patron = self.regex.pattern
+            return patron if patron.startswith("^") else f"(?s:.*?)(?:{patron})"
+        if self.glob is not None:
+            return f"(?i:{self.glob.pattern})"
+        return ""
+
+    def cumple(self, nombre: str, st, ahora: float) -> bool:
+        if self.extensiones_nombre is not None and not nombre.lower().endswith(self.extensiones_nombre):
+            return False
+        if self.glob is not None and self.glob.match(nombre) is None:
+            return False
+        if self.regex is not None and self.regex.search(nombre) is None:
+            return False
+        if not self.necesita_stat:
+            return True
+
+        # Sin datos del archivo no se puede confirmar una condicion de tamano o edad
+        if st is None:
+            return False
+        if self.min_tamano is not None and st.st_size < self.min_tamano:
+            return False
+        if self.max_tamano is not None and st.st_size > self.max_tamano:
+            return False
+        edad = ahora - st.st_mtime
+        if self.edad_minima is not None and edad < self.edad_minima:
+            return False
+        if self.edad_maxima is not None and edad >= self.edad_maxima:
+            return False
+        return True
+
+
+class Clasificacion(NamedTuple):
+    categoria: str
+    extension: str
+    condicional: bool = False   # Decidida por una regla con condiciones (glob, regex, tamano, edad)
+
+
+class ReglasCompiladas:
+    """
+    Immutable rule set compiled from the category -> extensions mapping.
+    Every extension resolves to its category through a single dict lookup;
+    multi-part suffixes such as '.tar.gz' are supported.
+
+    A category may also list rule objects (glob, regex, size, age). They take
+    precedence over plain extensions, in declaration order. Rules are indexed
+    by the literal start of the names they match ('INV-*', '^IMG_') or else
+    by extension, and found with a few dict lookups per name; the name
+    patterns of the rest are joined in one regex that discards most names
+    in a single match. The cost per file does not grow with the rule count.
+    """
+    __slots__ = (
+        "categorias", "carpetas", "solapamientos", "condicionales", "necesita_stat",
+        "_por_extension", "_max_partes", "_condicionales_por_extension", "_por_prefijo", "_generales", "_prefiltro", "_con_edad",
+    )
+
+    def __init__(self, reglas: dict):
+        por_extension = {}
+        solapamientos = {}
+        condicionales = []
+
+        for categoria, entradas in reglas.items():
+            if isinstance(entradas, dict):
+                entradas = [entradas]
+            if not isinstance(entradas, list):
+                raise ValueError(f"{categoria}: expected a list of extensions or rule objects")
+
+            for entrada in entradas:
+                if isinstance(entrada, dict):
+                    try:
+                        condicionales.append(ReglaCondicional(categoria, entrada))
+                    except ValueError as e:
+                        raise ValueError(f"{categoria}: {e}") from None
+                    continue
+                if not isinstance(entrada, str):
+                    raise ValueError(f"{categoria}: {entrada!r} is not an extension or a rule object")
+
+                ext = normalizar_extension(entrada)
+                previa = por_extension.setdefault(ext, categoria)
+                # La primera categoria declarada gana, como antes
+                if previa != categoria:
+                    solapamientos.setdefault(ext, [previa]).append(categoria)
+
+        # Indice de las reglas condicionales: por prefijo, por extension o generales (cualquier nombre)
+        por_prefijo = {}
+        por_extension_cond = {}
+        generales = []
+        for i, regla in enumerate(condicionales):
+            if regla.prefijo is not None:
+                por_prefijo.setdefault(len(regla.prefijo), {}).setdefault(regla.prefijo, []).append(i)
+            elif regla.extensiones is not None:
+                for ext in regla.extensiones:
+                    por_extension_cond.setdefault(ext, []).append(i)
+            else:
+                generales.append(i)
+
+        asignar = object.__setattr__
+        asignar(self, "categorias", tuple(reglas.keys()))
+        # Carpeta de primer nivel de cada categoria ('Archive/Logs' -> 'Archive')
+        asignar(self, "carpetas", tuple(dict.fromkeys(PurePath(c).parts[0] for c in reglas if PurePath(c).parts)))
+        asignar(self, "solapamientos", MappingProxyType({k: tuple(v) for k, v in solapamientos.items()}))
+        asignar(self, "condicionales", tuple(condicionales))
+        asignar(self, "necesita_stat", any(regla.necesita_stat for regla in condicionales))
+        asignar(self, "_por_extension", MappingProxyType(por_extension))
+        asignar(self, "_condicionales_por_extension", MappingProxyType({k: tuple(v) for k, v in por_extension_cond.items()}))
+        asignar(self, "_por_prefijo", tuple(
+            (largo, MappingProxyType({k: tuple(v) for k, v in tabla.items()})) for largo, tabla in sorted(por_prefijo.items())
+        ))
+        asignar(self, "_generales", tuple(generales))
+        asignar(self, "_prefiltro", self._compilar_prefiltro(condicionales, generales))
+        asignar(self, "_con_edad", any(
+            regla.edad_minima is not None or regla.edad_maxima is not None for regla in condicionales
+        ))
+        asignar(self, "_max_partes", max((ext.count(".") for ext in [*por_extension, *por_extension_cond]), default=1))
+
+    @staticmethod
+    def _compilar_prefiltro(condicionales: list, generales: list):
+        """
+        One alternation of the name patterns of the general rules, in order:
+        the group that matches is the first rule worth checking. None when
+        the patterns cannot be joined
+        """
+        partes = [f"(?P<r{i}>{condicionales[i].patron_nombre()})" for i in generales]
+        if not partes:
+            return None
+        try:
+            return re.compile("|".join(partes))
+        except re.error:
+            # p. ej. flags globales o grupos con el mismo nombre en varias reglas
+            return None
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("ReglasCompiladas is immutable")
+
+    def categoria(self, extension: str) -> str:
+        """Category of a single extension ('.pdf')"""
+        return self._por_extension.get(extension.lower(), CATEGORIA_POR_DEFECTO)
+
+    def clasificar(self, nombre: str, st=None) -> Clasificacion:
+        """
+        Returns (category, extension, condicional) for a file name. The
+        extension is the longest suffix with a rule, or the last suffix when
+        none matches; 'condicional' tells that a rule object decided the
+        category. 'st' (an os.stat_result) is needed by size and age rules;
+        without it those rules do not match
+        """
+        extension = ""
+        encontrada = None
+        conocida = None
+        candidatas = ()
+        condicionales = self._condicionales_por_extension
+        fin = len(nombre)
+
+        for _ in range(self._max_partes):
+            # Desde 1: un punto inicial ('.bashrc') no es una extension
+            punto = nombre.rfind(".", 1, fin)
+            if punto <= 0:
+                break
+            candidato = nombre[punto:].lower()
+            if fin == len(nombre) and len(candidato) > 1:
+                extension = candidato
+
+            # Se queda con la coincidencia mas larga
+            categoria = self._por_extension.get(candidato)
+            if categoria is not None:
+                encontrada = (categoria, candidato)
+            if condicionales:
+                ids = condicionales.get(candidato)
+                if ids is not None:
+                    candidatas += ids
+                    conocida = candidato
+            fin = punto
+
+        if self._por_prefijo:
+            minusculas = nombre.lower()
+            for largo, tabla in self._por_prefijo:
+                ids = tabla.get(minusculas[:largo])
+                if ids is not None:
+                    candidatas += ids
+
+        if candidatas or self._generales:
+            categoria = self._evaluar_condicionales(nombre, st, candidatas)
+            if categoria is not None:
+                if encontrada is not None and (conocida is None or len(encontrada[1]) > len(conocida)):
+                    conocida = encontrada[1]
+                return Clasificacion(categoria, conocida or extension, True)
+
+        if encontrada is not None:
+            return Clasificacion(*encontrada)
+        return Clasificacion(CATEGORIA_POR_DEFECTO, extension)
+
+    def _evaluar_condicionales(self, nombre: str, st, candidatas: tuple):
+        """Category of the first rule object (in declaration order) that the file meets"""
+        generales = self._generales
+        if generales:
+            desde = 0
+            if self._prefiltro is not None:
+                coincidencia = self._prefiltro.match(nombre)
+                if coincidencia is None:
+                    generales = ()
+                else:
+                    desde = bisect_left(generales, int(coincidencia.lastgroup[1:]))
+            candidatas += generales[desde:]
+
+        if not candidatas:
+            return None
+        if len(candidatas) > 1:
+            # Pueden venir de varios indices: se respeta el orden de declaracion
+            candidatas = sorted(candidatas)
+
+        ahora = time.time() if self._con_edad else 0.0
+        reglas = self.condicionales
+        for i in candidatas:
+            if reglas[i].cumple(nombre, st, ahora):
+                return reglas[i].categoria
+        return None
+
+
+def compilar_reglas(reglas: dict) -> ReglasCompiladas:
+    return ReglasCompiladas(reglas)
 
 
 def leer_json(ruta_config: Path, stats: Stats):
@@ -24,14 +410,19 @@ def leer_json(ruta_config: Path, stats: Stats):
     try:
         with ruta_config.open("r", encoding="utf-8") as f:
             data = json.load(f)
-            
+
             if not isinstance(data, dict):
                 raise ValueError("reglas.json inválido: debe ser un objeto JSON ({})")
 
-        return {
-            k: {ext if ext.startswith(".") else f".{ext}" for ext in map(str.lower, vals)}
-            for k, vals in data.items()
-        }
+        reglas = compilar_reglas(data)
+
+        # Extensiones repetidas en varias categorias
+        for ext, categorias in reglas.solapamientos.items():
+            aviso = f"Extension {ext} appears in {', '.join(categorias)}; using {categorias[0]}"
+            logging.warning(aviso)
+            click.echo(click.style(f"WARNING: {aviso}", fg="yellow"))
+
+        return reglas
 
 
     except json.JSONDecodeError as e:
@@ -40,3 +431,8 @@ def leer_json(ruta_config: Path, stats: Stats):
         stats.registrar_error()
         return None  # Devolver None para indicar fallo de lectura/formato
 
+    except ValueError as e:
+        click.echo(f"ERROR: Invalid rules in {ruta_config}: {e}")
+        logging.error(f"Invalid rules in {ruta_config}: {e}")
+        stats.registrar_error()
+        return None
@@ -1,24 +1,160 @@
 # core/stats.py
 
+import time
+import threading
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from collections import Counter
 
-# Contador total de sucesos
+
+# Fases medidas: listado de carpetas, clasificacion + colisiones, creacion de
+# carpetas, os.rename, copia entre dispositivos y acciones sobre duplicados
+FASES = ("scan", "plan", "mkdir", "rename", "copy", "dedupe")
+
+# Cubetas del histograma: potencias de 2 en microsegundos (la ultima acumula el resto)
+CUBETAS = 32
+
+
+class Fase:
+    """Cumulative time, count and log2 latency histogram of one phase"""
+    __slots__ = ("total", "cantidad", "maximo", "histograma")
+
+    def __init__(self):
+        self.total = 0.0
+        self.cantidad = 0
+        self.maximo = 0.0
+        self.histograma = [0] * CUBETAS
+
+    def agregar(self, segundos: float):
+        self.total += segundos
+        self.cantidad += 1
+        if segundos > self.maximo:
+            self.maximo = segundos
+        self.histograma[min(int(segundos * 1_000_000).bit_length(), CUBETAS - 1)] += 1
+
+    def percentil(self, p: float) -> float:
+        """Upper bound (seconds) of the bucket holding the p-th percentile"""
+        if not self.cantidad:
+            return 0.0
+        objetivo = self.cantidad * p / 100
+        acumulado = 0
+        for cubeta, cantidad in enumerate(self.histograma):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return min((1 << cubeta) / 1_000_000, self.maximo)
+        return self.maximo
+
+    def como_dict(self) -> dict:
+        return {
+            "seconds": round(self.total, 6),
+            "count": self.cantidad,
+            "mean_us": round(self.total / self.cantidad * 1_000_000, 1) if self.cantidad else 0,
+            "p50_us": round(self.percentil(50) * 1_000_000, 1),
+            "p99_us": round(self.percentil(99) * 1_000_000, 1),
+            "max_us": round(self.maximo * 1_000_000, 1),
+            # Cubeta i: duraciones menores a 2**i microsegundos
+            "histogram_us": {f"<{1 << i}": c for i, c in enumerate(self.histograma) if c},
+        }
+
+
+# Contador total de sucesos (seguro entre hilos)
 @dataclass
 class Stats:
     procesados: int = 0
     saltados: int = 0
-    excluidos: int = 0
+    excluidos: int = 0        # Carpetas excluidas (podadas, una vez cada una) + archivos excluidos por nombre
     errores: int = 0
+    renombrados: int = 0      # Movidos con os.rename (mismo dispositivo)
+    bytes_renombrados: int = 0
+    copias: int = 0           # Movidos con copia + borrado (otro dispositivo)
+    bytes_copiados: int = 0
+    duplicados: int = 0       # Duplicados omitidos, enlazados o enviados a la papelera
+    bytes_ahorrados: int = 0
+    fases: dict = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
     
     def registrar_procesados(self):
-        self.procesados += 1
+        with self._lock:
+            self.procesados += 1
         
     def registrar_saltados(self):
-        self.saltados += 1
+        with self._lock:
+            self.saltados += 1
         
-    def registrar_excluidos(self):
-        self.excluidos += 1
+    def registrar_excluidos(self, cantidad=1):
+        with self._lock:
+            self.excluidos += cantidad
         
     def registrar_error(self):
-        self.errores += 1
+        with self._lock:
+            self.errores += 1
+
+    def registrar_rename(self, tamano: int = 0):
+        with self._lock:
+            self.renombrados += 1
+            self.bytes_renombrados += tamano
+
+    def registrar_copia(self, tamano: int):
+        with self._lock:
+            self.copias += 1
+            self.bytes_copiados += tamano
+
+    def registrar_duplicado(self, tamano: int):
+        with self._lock:
+            self.duplicados += 1
+            self.bytes_ahorrados += tamano
+
+    def acumular(self, otro: "Stats"):
+        """Adds the counters and phase timings of another run (combined summaries)"""
+        with self._lock:
+            for campo in ("procesados", "saltados", "excluidos", "errores", "renombrados", "bytes_renombrados", "copias",
+                          "bytes_copiados", "duplicados", "bytes_ahorrados"):
+                setattr(self, campo, getattr(self, campo) + getattr(otro, campo))
+            for nombre, fase in otro.fases.items():
+                actual = self.fases.get(nombre)
+                if actual is None:
+                    actual = self.fases[nombre] = Fase()
+                actual.total += fase.total
+                actual.cantidad += fase.cantidad
+                actual.maximo = max(actual.maximo, fase.maximo)
+                actual.histograma = [a + b for a, b in zip(actual.histograma, fase.histograma)]
+
+    def registrar_tiempo(self, fase: str, segundos: float):
+        with self._lock:
+            actual = self.fases.get(fase)
+            if actual is None:
+                actual = self.fases[fase] = Fase()
+            actual.agregar(segundos)
+
+    @contextmanager
+    def medir(self, fase: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_tiempo(fase, time.perf_counter() - inicio)
+
+    def como_dict(self, segundos: float = None) -> dict:
+        """Counters, phase timings and throughput, ready for JSON"""
+        datos = {
+            "processed": self.procesados,
+            "skipped": self.saltados,
+            "excluded": self.excluidos,
+            "errors": self.errores,
+            "renames": self.renombrados,
+            "bytes_renamed": self.bytes_renombrados,
+            "copies": self.copias,
+            "bytes_copied": self.bytes_copiados,
+            "bytes_moved": self.bytes_renombrados + self.bytes_copiados,
+            "duplicates": self.duplicados,
+            "bytes_saved": self.bytes_ahorrados,
+            "phases": {fase: self.fases[fase].como_dict() for fase in sorted(self.fases, key=_orden_fase)},
+        }
+        if segundos is not None:
+            datos["seconds"] = round(segundos, 6)
+            datos["files_per_second"] = round(self.procesados / segundos, 1) if segundos > 0 else 0
+        return datos
+
+
+def _orden_fase(fase: str):
+    return (FASES.index(fase) if fase in FASES else len(FASES), fase)
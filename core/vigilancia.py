@@ -0,0 +1,239 @@
+# core/vigilancia.py
+
+import os
+import sys
+import stat
+import time
+import errno
+import ctypes
+import ctypes.util
+import logging
+import select
+import struct
+from pathlib import Path
+
+from core.conjunto_archivos import ConjuntoArchivos
+from core.engine import FiltroArchivos, _detenido, _listar_directorio
+from core.stats import Stats
+
+
+# Mascaras de inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_MASCARA = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+# wd, mask, cookie, len (+ nombre)
+_EVENTO = struct.Struct("iIII")
+_TAMANO_LECTURA = 1 << 16
+
+# Segundos entre comprobaciones de stop_event mientras no hay eventos
+_ESPERA = 0.5
+
+
+class Inotify:
+    """Minimal ctypes binding of the Linux inotify API"""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("Watch mode needs Linux inotify")
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            numero = ctypes.get_errno()
+            raise OSError(numero, f"inotify_init1: {os.strerror(numero)}")
+
+    def agregar(self, carpeta: str) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(carpeta), _MASCARA)
+        if wd < 0:
+            numero = ctypes.get_errno()
+            raise OSError(numero, os.strerror(numero), carpeta)
+        return wd
+
+    def leer(self, espera: float) -> list[tuple[int, int, str]]:
+        """(wd, mask, name) of the queued events, waiting at most 'espera' seconds"""
+        listos, _, _ = select.select([self.fd], [], [], espera)
+        if not listos:
+            return []
+
+        eventos = []
+        while True:
+            try:
+                datos = os.read(self.fd, _TAMANO_LECTURA)
+            except BlockingIOError:
+                break
+
+            pos = 0
+            while pos + _EVENTO.size <= len(datos):
+                wd, mascara, _, largo = _EVENTO.unpack_from(datos, pos)
+                pos += _EVENTO.size
+                nombre = os.fsdecode(datos[pos:pos + largo].rstrip(b"\0"))
+                pos += largo
+                eventos.append((wd, mascara, nombre))
+        return eventos
+
+    def cerrar(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class Vigilante:
+    """
+    Watches 'base' (and its accepted subfolders when recursive) and collects
+    the files that appear in it. A file is handed over once no event touched
+    it for 'espera' seconds and its size did not change between two checks.
+    When the kernel event queue overflows, only the watched folders whose
+    mtime changed are listed again
+    """
+
+    def __init__(self, base: Path, recursive: bool, filtro: FiltroArchivos, espera: float = 2.0):
+        self.base = os.fspath(base)
+        self.recursive = recursive
+        self.filtro = filtro
+        self.espera = espera
+        self.inotify = Inotify()
+        self._carpetas: dict[int, str] = {}
+        self._vigiladas: dict[str, int] = {}
+        self._mtimes: dict[str, int] = {}
+        self._pendientes: dict[str, list] = {}
+        self._descartes = Stats()
+
+    def _vigilar_arbol(self, carpeta: str, ahora: float):
+        """Adds watches under 'carpeta' and queues the files already in it"""
+        pila = [carpeta]
+        while pila:
+            actual = pila.pop()
+            if actual in self._vigiladas:
+                continue
+            try:
+                wd = self.inotify.agregar(actual)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    logging.error(f"Inotify watch limit reached, {actual} is not watched (raise fs.inotify.max_user_watches)")
+                elif e.errno != errno.ENOENT:
+                    logging.warning(f"Could not watch folder {actual}: {e}")
+                continue
+
+            self._carpetas[wd] = actual
+            self._vigiladas[actual] = wd
+            # La vigilancia se agrega antes de listar: nada se pierde entre ambos pasos
+            pila.extend(self._listar(actual, ahora))
+
+    def _listar(self, carpeta: str, ahora: float) -> list:
+        try:
+            self._mtimes[carpeta] = os.stat(carpeta).st_mtime_ns
+        except OSError:
+            return []
+        archivos, subcarpetas, _ = _listar_directorio(carpeta, self.recursive, self.filtro)
+        for archivo in archivos:
+            self._marcar(os.fspath(archivo), ahora)
+        return subcarpetas
+
+    def _marcar(self, ruta: str, ahora: float):
+        pendiente = self._pendientes.get(ruta)
+        if pendiente is None:
+            self._pendientes[ruta] = [ahora, -1]
+        else:
+            pendiente[0] = ahora
+
+    def _reexplorar(self, ahora: float):
+        """Event queue overflow: lists again the watched folders that changed"""
+        cambiadas = []
+        for carpeta in list(self._vigiladas):
+            try:
+                mtime = os.stat(carpeta).st_mtime_ns
+            except OSError:
+                continue
+            if mtime != self._mtimes.get(carpeta):
+                cambiadas.append(carpeta)
+
+        logging.warning(f"Inotify event queue overflowed, rescanning {len(cambiadas)} changed folders")
+        for carpeta in cambiadas:
+            for subcarpeta in self._listar(carpeta, ahora):
+                self._vigilar_arbol(subcarpeta, ahora)
+
+    def _procesar(self, wd: int, mascara: int, nombre: str, ahora: float):
+        if mascara & IN_Q_OVERFLOW:
+            self._reexplorar(ahora)
+            return
+
+        carpeta = self._carpetas.get(wd)
+        if carpeta is None:
+            return
+
+        if mascara & IN_IGNORED:
+            del self._carpetas[wd]
+            self._vigiladas.pop(carpeta, None)
+            self._mtimes.pop(carpeta, None)
+            return
+
+        if not nombre:
+            return
+
+        if mascara & IN_ISDIR:
+            if self.recursive and mascara & (IN_CREATE | IN_MOVED_TO) and self.filtro.aceptar_carpeta(nombre, self._descartes):
+                self._vigilar_arbol(os.path.join(carpeta, nombre), ahora)
+            return
+
+        if self.filtro.aceptar_archivo(nombre, self._descartes):
+            self._marcar(os.path.join(carpeta, nombre), ahora)
+
+    def _listos(self, ahora: float) -> ConjuntoArchivos:
+        # Compacto: el primer lote trae todos los archivos que ya habia; el stat
+        # de la espera viaja con cada archivo y el motor no lo repite
+        listos = ConjuntoArchivos(metadatos=True)
+        for ruta, pendiente in list(self._pendientes.items()):
+            if ahora - pendiente[0] < self.espera:
+                continue
+            try:
+                st = os.stat(ruta)
+            except OSError:
+                del self._pendientes[ruta]
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                del self._pendientes[ruta]
+                continue
+
+            # Todavia se esta escribiendo: se espera otro intervalo
+            if st.st_size != pendiente[1]:
+                pendiente[0] = ahora
+                pendiente[1] = st.st_size
+                continue
+
+            del self._pendientes[ruta]
+            listos.agregar(ruta, st.st_size, st.st_mtime_ns)
+        return listos
+
+    def lotes(self, stop_event=None):
+        """
+        Yields sets of files (ConjuntoArchivos) ready to be organized until stop_event is set.
+        The files already present when watching starts come in the first lots
+        """
+        try:
+            self._vigilar_arbol(self.base, time.monotonic())
+            while not _detenido(stop_event):
+                espera = min(_ESPERA, self.espera) if self._pendientes else _ESPERA
+                eventos = self.inotify.leer(espera)
+
+                ahora = time.monotonic()
+                for wd, mascara, nombre in eventos:
+                    self._procesar(wd, mascara, nombre, ahora)
+
+                listos = self._listos(ahora)
+                if listos:
+                    yield listos
+        finally:
+            self.inotify.cerrar()
@@ -4,14 +4,141 @@
 import tkinter as tk
 import threading
 import time
+from collections import deque
 from pathlib import Path
 from tkinter import messagebox, filedialog, ttk
 from tkinter import scrolledtext as st
 
-from core.engine import iterar_archivos, mover_archivos, simulacion
+from core.engine import aplicar_plan, iterar_archivos, mover_archivos, simulacion
+from core.eventos import AVISO, ERROR, RENOMBRADO, RESUMEN, SalidaGUI, SalidaLog, SalidaTexto, difundir
+from core.historial import HistorialMovimientos
+from core.logging_utils import obtener_ruta_base, vaciar_logs
+from core.plan import PlanMovimientos
+from core.rules import compilar_reglas
 from core.stats import Stats
 
 
+#Refresco de la ventana de proceso (~30 veces por segundo)
+INTERVALO_REFRESCO_MS = 33
+
+
+class EstadoProceso:
+    """
+    Progreso compartido entre el hilo de trabajo (escribe) y el hilo de la
+    interfaz (lee en cada refresco). Los contadores son enteros simples; el
+    texto y los avisos pendientes se protegen con un lock
+    """
+    
+    def __init__(self):
+        self.total = 0           #0 mientras el recorrido sigue en curso
+        self.descubiertos = 0
+        self.procesados = 0
+        self.terminado = False
+        self._lineas = []
+        self._avisos = []
+        self._lock = threading.Lock()
+    
+    def publicar(self, lineas: list):
+        """Recibe lineas (tipo, texto)"""
+        with self._lock:
+            self._lineas.extend(lineas)
+    
+    def avisar(self, tipo: str, titulo: str, mensaje: str):
+        with self._lock:
+            self._avisos.append((tipo, titulo, mensaje))
+    
+    def tomar_lineas(self) -> list:
+        with self._lock:
+            lineas, self._lineas = self._lineas, []
+        return lineas
+    
+    def tomar_avisos(self) -> list:
+        with self._lock:
+            avisos, self._avisos = self._avisos, []
+        return avisos
+
+
+#Lineas que se conservan en pantalla (el historial completo va a un archivo)
+MAX_LINEAS_LOG = 2000
+
+#Tipos de linea que se muestran con el filtro "solo problemas"
+TIPOS_PROBLEMA = frozenset((ERROR, RENOMBRADO))
+
+
+class VistaLog(ttk.Frame):
+    """
+    Log acotado: solo las ultimas 'maximo' lineas viven en el widget (y en
+    memoria); las anteriores se descartan al insertar. Con el filtro activo
+    se muestran solo errores y renombrados por colision
+    """
+    
+    def __init__(self, padre, maximo: int = MAX_LINEAS_LOG):
+        super().__init__(padre)
+        self.maximo = maximo
+        self._todas = deque(maxlen=maximo)
+        self._problemas = deque(maxlen=maximo)
+        self._en_pantalla = 0
+        
+        self.solo_problemas = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self,
+            text="Show only errors and renames",
+            variable=self.solo_problemas,
+            command=self._redibujar
+        ).pack(side="top", anchor="w")
+        
+        self.texto = st.ScrolledText(
+            self, 
+            font=("Consolas", 10), 
+            bg="#FDFDFD", 
+            fg="#333333", 
+            padx=10, 
+            pady=15,
+            borderwidth=1,
+            highlightthickness=1,
+            highlightbackground="#E9ECEF" # Borde sutil
+        )
+        self.texto.pack(expand=True, fill="both", pady=(5, 0))
+        self.texto.tag_configure(ERROR, foreground="#C62828")
+        self.texto.tag_configure(RENOMBRADO, foreground="#B26A00")
+    
+    def agregar(self, lineas: list):
+        """Agrega lineas (tipo, texto) con un solo insert"""
+        problemas = [linea for linea in lineas if linea[0] in TIPOS_PROBLEMA]
+        self._todas.extend(lineas)
+        self._problemas.extend(problemas)
+        self._insertar(problemas if self.solo_problemas.get() else lineas)
+    
+    def _insertar(self, lineas):
+        #Solo las ultimas 'maximo' llegan al widget
+        lineas = list(lineas)[-self.maximo:]
+        if not lineas:
+            return
+        
+        argumentos = []
+        for tipo, texto in lineas:
+            argumentos.extend((f"{texto}\n", tipo))
+        try:
+            self.texto.insert(tk.END, *argumentos)
+            
+            self._en_pantalla += len(lineas)
+            sobrantes = self._en_pantalla - self.maximo
+            if sobrantes > 0:
+                self.texto.delete("1.0", f"{sobrantes + 1}.0")
+                self._en_pantalla = self.maximo
+            self.texto.see(tk.END)
+        except tk.TclError:
+            pass
+    
+    def _redibujar(self):
+        try:
+            self.texto.delete("1.0", tk.END)
+        except tk.TclError:
+            return
+        self._en_pantalla = 0
+        self._insertar(self._problemas if self.solo_problemas.get() else self._todas)
+
+
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -101,7 +228,10 @@ class App(tk.Tk):
         self.ONLY = []
         self.IGNORE_HIDDEN = True
         self.RECURSIVE = False
-        self.REGLAS = {
+        self.SCAN_WORKERS = 1 #Carpetas listadas en paralelo (util en unidades de red)
+        self.WORKERS = 1 #Archivos movidos en paralelo al organizar
+        self.RUTA_HISTORIAL = obtener_ruta_base() / "logs" / "history.sqlite" #Registro para deshacer (main_undo.py)
+        self.REGLAS = compilar_reglas({
             'Images': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.svg', '.ico'],
             'Videos': ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.webm'],
             'Audio': ['.mp3', '.wav', '.aac', '.flac', '.ogg', '.m4a'],
@@ -114,13 +244,16 @@ class App(tk.Tk):
             'Source_Code': ['.py', '.js', '.java', '.html', '.css', '.json', '.xml', '.yaml'],
             'Databases': ['.db', '.sqlite', '.mdb', '.accdb'],
             'Fonts': ['.ttf', '.otf', '.woff', '.woff2']
-        }
+        })
         
         
         
         #Cancelar evento para agregar un boton cancelar y evitar errores
         self.cancelar_evento = threading.Event()
         
+        #Plan de la ultima simulacion (se reutiliza al organizar la misma ruta)
+        self.plan_simulacion = None
+        
         self._crear_widgets()
     
     
@@ -224,109 +357,189 @@ class App(tk.Tk):
     
     def _progressbar_ejecutar_proceso(self, modo="organizar", ventana_hija=None):
         """
-        Funcion: itera archivos, se encarga de simular/mover archivos en el hilo secundario
-        y actualiza lo que se muestra en la interfaz (hilo primario) con 'self.after()'
+        Funcion: itera archivos, se encarga de simular/mover archivos en el hilo secundario.
+        No toca la interfaz: publica el progreso en 'ventana_hija.estado', que el hilo
+        primario lee a una frecuencia fija
         """
-        
-        #BLOQUEO
-        self._alternar_botones("disabled")
+        estado = ventana_hija.estado
+        historial = None
+        historial_ventana = None
+        gen = None
         
         try:
             ruta_base = Path(self.ruta_var.get())
             local_stats = Stats()
             
-            archivos_lista = list(iterar_archivos(
-                base=ruta_base,
-                recursive=self.RECURSIVE,
-                exclude=self.EXCLUDE,
-                only=self.ONLY,
-                ignore_hidden=self.IGNORE_HIDDEN,
-                stats= local_stats
-            ))
-    
-            total = len(archivos_lista)
+            #Reutilizar el plan de la simulacion previa: no se vuelve a escanear el disco
+            plan = self.plan_simulacion
+            self.plan_simulacion = None
+            usar_plan = modo == "organization" and plan is not None and plan.base == ruta_base
             
-            if total == 0:
-                self.after(0, lambda: messagebox.showinfo("Notice", "No files found to process."))
-                return 
+            if usar_plan:
+                estado.total = len(plan)
+                if estado.total == 0:
+                    estado.avisar("info", "Notice", "No files found to process.")
+                    return
+            else:
+                #Descubrimiento en streaming: se clasifica y mueve mientras se recorre el disco
+                archivos_lista = self._contar_descubiertos(iterar_archivos(
+                    base=ruta_base,
+                    recursive=self.RECURSIVE,
+                    exclude=self.EXCLUDE,
+                    only=self.ONLY,
+                    ignore_hidden=self.IGNORE_HIDDEN,
+                    stats= local_stats,
+                    scan_workers=self.SCAN_WORKERS,
+                    stop_event=self.cancelar_evento
+                ), estado)
             
-            #Asignamos el numero de progreso
-            self.after(0, lambda t=total: self._init_progreso(ventana_hija, t))
+            #Cada organizacion queda registrada para poder deshacerla
+            if modo == "organization":
+                historial = HistorialMovimientos(self.RUTA_HISTORIAL)
             
-    
             # 2. Seleccionar motor (Generador)
-            motor = mover_archivos if modo == "organization" else simulacion
-    
-            # 3. Consumir el generador y actualizar UI
-            gen = motor(
-                base=ruta_base,
-                reglas=self.REGLAS,
-                recursive=self.RECURSIVE,
-                exclude=self.EXCLUDE,
-                only=self.ONLY,
-                ignore_hidden=self.IGNORE_HIDDEN,
-                stats= local_stats,
-                lista_archivos = archivos_lista,
-                stop_event = self.cancelar_evento
-            )
+            if usar_plan:
+                gen = aplicar_plan(
+                    plan, self.REGLAS, local_stats, stop_event=self.cancelar_evento, workers=self.WORKERS, historial=historial
+                )
+            else:
+                motor = mover_archivos if modo == "organization" else simulacion
+        
+                #Movimientos en paralelo al organizar; la simulacion guarda su plan
+                if modo == "organization":
+                    extra = {"workers": self.WORKERS, "historial": historial}
+                else:
+                    plan = PlanMovimientos(ruta_base)
+                    extra = {"plan": plan}
+        
+                # 3. Consumir el generador y actualizar UI
+                gen = motor(
+                    base=ruta_base,
+                    reglas=self.REGLAS,
+                    recursive=self.RECURSIVE,
+                    exclude=self.EXCLUDE,
+                    only=self.ONLY,
+                    ignore_hidden=self.IGNORE_HIDDEN,
+                    stats= local_stats,
+                    lista_archivos = archivos_lista,
+                    stop_event = self.cancelar_evento,
+                    **extra
+                )
             
-            #Definimos intervalo para evitar saturacion
-            intervalo = 10 if total > 1000 else 1
+            #El log de la ventana recibe los eventos por lotes; el historial completo va a un archivo
+            historial_ventana = SalidaTexto(ventana_hija.ruta_historial)
+            salidas = [SalidaLog(), SalidaGUI(estado.publicar), historial_ventana]
             
-            for i, mensaje in enumerate(gen, 1):
+            for evento in difundir(gen, salidas):
                 #Verificacion de cancelacion
                 if self.cancelar_evento.is_set():
-                    self.after(0, lambda: ventana_hija.area_log.insert(tk.END, "[!] PROCESS CANCELLED BY USER.\n"))
+                    estado.publicar([(AVISO, "[!] PROCESS CANCELLED BY USER.")])
                     break
                 
-                if "Total files" in mensaje:
-                    self.after(0, lambda m=mensaje: self._actualizar_solo_log(ventana_hija.area_log, f"\n{m}"))
-                    #No actualizamos la barra aquí para que no cuente como proceso el mensaje "[SIMULATION] Total files moved: {total}"
-                    continue
-                
-                #Actualizacion de la barra
-                self.after(0, lambda v=i, t=total: self._actualizar_solo_barra(ventana_hija, v, t))
+                #El resumen no cuenta como archivo procesado en la barra
+                if evento.tipo != RESUMEN:
+                    estado.procesados += 1
+            
+            #Simulacion completa: su plan queda disponible para "Start Organizing"
+            if modo == "simulation" and not self.cancelar_evento.is_set():
+                self.plan_simulacion = plan
             
-                #Actualizacion log
-                if i % intervalo == 0 or i == total:
-                    #Usamos valores locales fijos para el lambda (i=i, mensaje=mensaje)
-                    self.after(0, lambda m=mensaje: self._actualizar_solo_log(ventana_hija.area_log, m))
+            if estado.total == 0 and not self.cancelar_evento.is_set():
+                estado.avisar("info", "Notice", "No files found to process.")
+                return
               
             
         except Exception as e:
-           self.after(0, lambda ex=e: messagebox.showerror("Critical Error", f"{ex}"))
+            estado.avisar("error", "Critical Error", f"{e}")
         finally:
-            self.after(0, lambda: self._alternar_botones("normal"))
+            if historial is not None:
+                if gen is not None:
+                    gen.close() #Cierra el registro de la ejecucion antes que la base de datos
+                historial.cerrar()
+            if historial_ventana is not None:
+                historial_ventana.cerrar()
+            #Terminada o cancelada, la ejecucion queda escrita en el log
+            vaciar_logs()
             
             if not self.cancelar_evento.is_set():
-                self.after(500, lambda: messagebox.showinfo(
-                    "Success", f"{modo.capitalize()} completed."
-                    ))
+                estado.avisar("info", "Success", f"{modo.capitalize()} completed.")
+            estado.terminado = True
+
+
+    @staticmethod
+    def _contar_descubiertos(archivos, estado):
+        """
+        Pasa los archivos del recorrido al motor contando los descubiertos.
+        Al terminar el recorrido (sin cancelar) el total queda fijado
+        """
+        for archivo in archivos:
+            estado.descubiertos += 1
+            yield archivo
+        estado.total = estado.descubiertos
 
 
+    def _actualizar_ventana(self, ventana):
+        """
+        Temporizador del hilo primario (~30 Hz): aplica de una vez el progreso y
+        las lineas de log acumuladas desde el refresco anterior
+        """
+        try:
+            if not ventana.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        
+        estado = ventana.estado
+        terminado = estado.terminado #Se lee antes de vaciar: nada publicado antes queda pendiente
+        
+        lineas = estado.tomar_lineas()
+        if lineas:
+            ventana.vista_log.agregar(lineas)
+        
+        if estado.total:
+            self._actualizar_solo_barra(ventana, estado.procesados, estado.total)
+        elif estado.descubiertos:
+            self._actualizar_descubrimiento(ventana, estado.descubiertos, estado.procesados)
+        
+        for tipo, titulo, mensaje in estado.tomar_avisos():
+            mostrar = messagebox.showerror if tipo == "error" else messagebox.showinfo
+            mostrar(titulo, mensaje, parent=ventana)
+        
+        if terminado:
+            self._alternar_botones("normal")
+            return
+        
+        ventana.after(INTERVALO_REFRESCO_MS, lambda: self._actualizar_ventana(ventana))
+
+    
+    def _actualizar_descubrimiento(self, ventana, descubiertos, val):
+        """Recorrido en curso: barra indeterminada y contador de descubiertos"""
+        try:
+            if str(ventana.progreso["mode"]) != "indeterminate":
+                ventana.progreso.config(mode="indeterminate")
+                ventana.progreso.start(15)
+            
+            ventana.label_estado.config(text=f"Discovered so far: {descubiertos} (processed: {val})")
+        except tk.TclError:
+            pass
+    
+    
     def _actualizar_solo_barra(self, ventana, val, tot):
         """Actualiza la barra y contador"""
-        if not ventana.winfo_exists(): return
         try:
+            #Fin del recorrido: la barra pasa a ser determinada
+            if str(ventana.progreso["mode"]) != "determinate":
+                ventana.progreso.stop()
+                ventana.progreso.config(mode="determinate")
+            
             ventana.progreso["maximum"] = tot
             ventana.progreso["value"] = val
             
             ventana.label_estado.config(text=f"Procesing: {val}/{tot}")
-            
-            #Forzamos a la interfaz a dibujar antes de seguir
-            ventana.update_idletasks()
         except tk.TclError:
             pass
         
     
-    def _actualizar_solo_log(self, log, msj):
-        """Inserta texto en el log (frecuencia controlada)"""
-        try:
-            log.insert(tk.END, f"{msj}\n")
-            log.see(tk.END)
-        except (tk.TclError, AttributeError):
-            pass
-    
     def _cancelar_proceso(self):
         """Activa la señal de parada"""
         self.cancelar_evento.set()
@@ -342,6 +555,12 @@ class App(tk.Tk):
         #Restringimos la x al metodo de cancelar
         ventana_hija.protocol("WM_DELETE_WINDOW", ventana_hija._al_cerrar)
         
+        #BLOQUEO
+        self._alternar_botones("disabled")
+        
+        #Un solo temporizador refresca la ventana mientras el hilo trabaja
+        ventana_hija.after(INTERVALO_REFRESCO_MS, lambda: self._actualizar_ventana(ventana_hija))
+        
         t = threading.Thread(
             target=self._progressbar_ejecutar_proceso,
             args=(modo, ventana_hija)
@@ -378,31 +597,19 @@ class Ventana_proceso(tk.Toplevel):
         self.btn_cancelar = ttk.Button(self, text="Cancel Process", command=padre._cancelar_proceso)
         self.btn_cancelar.pack(side="bottom", pady=20)
         
-        self.area_log = st.ScrolledText(
-            self, 
-            font=("Consolas", 10), 
-            bg="#FDFDFD", 
-            fg="#333333", 
-            padx=10, 
-            pady=15,
-            borderwidth=1,
-            highlightthickness=1,
-            highlightbackground="#E9ECEF" # Borde sutil
-        )
-        self.area_log.pack(expand=True, fill="both", padx=20, pady=10)
-        
-        #Limpieza: Borra contenido previo por si hay reejecucion
-        self.area_log.configure(state='normal')
-        self.area_log.delete("1.0", tk.END)
-        self.after(
-            0,
-            lambda: self.area_log.insert(
-                tk.END, f"--- Starting {modo} ---\n"
-            )
-        )
+        #Log acotado en pantalla; el historial completo de la ejecucion queda en un archivo
+        self.ruta_historial = obtener_ruta_base() / "logs" / f"gui_{modo}.log"
+        self.ruta_historial.parent.mkdir(parents=True, exist_ok=True)
+        
+        self.vista_log = VistaLog(self)
+        self.vista_log.pack(expand=True, fill="both", padx=20, pady=10)
+        self.vista_log.agregar([(AVISO, f"--- Starting {modo} (full log: {self.ruta_historial}) ---")])
         
         self.protocol("WM_DELETE_WINDOW", self._al_cerrar)
         
+        #Progreso publicado por el hilo de trabajo
+        self.estado = EstadoProceso()
+        
         try:
             if modo == "simulation":
                 padre._iniciar_hilo(modo="simulation", ventana_hija=self)
@@ -1,6 +1,6 @@
 import ctypes
 from gui.gui_simple import App
-from core.logging_utils import obtener_ruta_base, log_config
+from core.logging_utils import obtener_ruta_base, log_config, detener_logging
 
 if __name__ == "__main__":
     #Instrucción clave para corregir el DPI
@@ -17,4 +17,8 @@ if __name__ == "__main__":
     
     #Iniciar la aplicación
     app = App()
-    app.mainloop()
\ No newline at end of file
+    try:
+        app.mainloop()
+    finally:
+        #Escribe los registros pendientes al cerrar la ventana
+        detener_logging()
\ No newline at end of file
@@ -0,0 +1,61 @@
+# tests/test_duplicados.py
+
+import os
+
+import core.duplicados
+from core.duplicados import ENLAZAR, OMITIR, Deduplicador
+from core.engine import mover_archivos
+from core.eventos import DUPLICADO
+from core.rules import compilar_reglas
+from core.stats import Stats
+
+
+def _organizar(base, reglas, deduplicador) -> tuple:
+    stats = Stats()
+    eventos = list(mover_archivos(base, reglas, True, {"docs"}, set(), False, stats, deduplicador=deduplicador))
+    return [e.tipo for e in eventos], stats
+
+
+def test_duplicado_grande_usa_el_hash_completo(tmp_path):
+    # Mas grande que los bloques del hash parcial: se compara en el pool de procesos
+    contenido = os.urandom(3 * core.duplicados.BLOQUE_PARCIAL)
+    base = tmp_path / "entrada"
+    (base / "docs").mkdir(parents=True)
+    (base / "docs" / "a.pdf").write_bytes(contenido)
+    (base / "nuevo").mkdir()
+    (base / "nuevo" / "a.pdf").write_bytes(contenido)
+
+    reglas = compilar_reglas({"docs": [".pdf"]})
+    deduplicador = Deduplicador(tmp_path / "hashes.sqlite", reglas, OMITIR)
+    try:
+        tipos, stats = _organizar(base, reglas, deduplicador)
+    finally:
+        deduplicador.cerrar()
+
+    assert DUPLICADO in tipos
+    assert stats.duplicados == 1
+    assert not (base / "docs" / "a_copy1.pdf").exists()
+
+
+def test_origen_enlazado_queda_asentado_sin_hash(tmp_path, monkeypatch):
+    base = tmp_path / "entrada"
+    (base / "docs").mkdir(parents=True)
+    (base / "docs" / "a.pdf").write_bytes(os.urandom(1024))
+    os.link(base / "docs" / "a.pdf", base / "a.pdf")
+
+    def sin_hash(rutas):
+        raise AssertionError(f"{rutas} should not be hashed")
+
+    monkeypatch.setattr(core.duplicados, "_hash_parcial", sin_hash)
+    reglas = compilar_reglas({"docs": [".pdf"]})
+    deduplicador = Deduplicador(tmp_path / "hashes.sqlite", reglas, ENLAZAR)
+    try:
+        tipos, stats = _organizar(base, reglas, deduplicador)
+    finally:
+        deduplicador.cerrar()
+
+    # Ya enlazado por una corrida anterior: no se mueve, no se compara y cuenta como saltado
+    assert DUPLICADO not in tipos
+    assert (stats.saltados, stats.duplicados, deduplicador.asentados) == (1, 0, 1)
+    assert os.path.samefile(base / "a.pdf", base / "docs" / "a.pdf")
+    assert not (base / "docs" / "a_copy1.pdf").exists()
@@ -0,0 +1,66 @@
+# tests/test_incremental.py
+
+import os
+
+from core.engine import simulacion
+from core.eventos import MOVIDO
+from core.incremental import CacheDirectorios
+from core.rules import compilar_reglas
+from core.stats import Stats
+
+# Antes del margen de mtime de la cache: las carpetas cuentan como estables
+_PASADO = 1_000_000_000
+
+
+def _simular(base, reglas, cache) -> tuple:
+    stats = Stats()
+    eventos = simulacion(base, reglas, True, set(), set(), False, stats, cache=cache)
+    destinos = {e.origen.name: e.destino.parent.name for e in eventos if e.tipo == MOVIDO}
+    cache.guardar()
+    return destinos, stats
+
+
+def _arbol(base, archivos: dict):
+    for ruta, contenido in archivos.items():
+        (base / ruta).parent.mkdir(parents=True, exist_ok=True)
+        (base / ruta).write_bytes(contenido)
+    for carpeta in [base, *(p for p in base.rglob("*") if p.is_dir())]:
+        os.utime(carpeta, (_PASADO, _PASADO))
+
+
+def test_carpetas_sin_cambios_no_se_vuelven_a_listar(tmp_path):
+    base = tmp_path / "entrada"
+    _arbol(base, {
+        "Others/viejo.zzz": b"",
+        "Others/otro.zzz": b"",
+        "pdf/listo.pdf": b"",
+        "pendientes/factura.pdf": b"",
+    })
+    reglas = compilar_reglas({"pdf": [".pdf"]})
+
+    for corrida in range(3):
+        cache = CacheDirectorios(tmp_path / "dirs.sqlite", base, "huella")
+        destinos, stats = _simular(base, reglas, cache)
+        cache.cerrar()
+
+        # La simulacion no mueve nada: el pendiente se informa en cada corrida
+        assert destinos == {"factura.pdf": "pdf"}
+        if corrida == 0:
+            assert (cache.listadas, stats.saltados) == (4, 3)
+        else:
+            # Los archivos que ya estan en su carpeta quedan asentados y no se recorren
+            assert (cache.listadas, cache.reutilizadas, stats.saltados) == (0, 4, 0)
+
+
+def test_pendientes_guardan_el_stat_para_reglas_de_tamano(tmp_path):
+    base = tmp_path / "entrada"
+    _arbol(base, {"grande.bin": bytes(2048), "chico.bin": b"x"})
+    reglas = compilar_reglas({"Big": [{"min_size": 1024}]})
+
+    for corrida in range(2):
+        cache = CacheDirectorios(tmp_path / "dirs.sqlite", base, "huella")
+        destinos, _ = _simular(base, reglas, cache)
+        cache.cerrar()
+
+        assert destinos == {"grande.bin": "Big", "chico.bin": "Others"}
+        assert cache.listadas == (1 if corrida == 0 else 0)
@@ -0,0 +1,37 @@
+# tests/test_movimientos.py
+
+import pytest
+
+import utils.fs_utils
+from core.colisiones import IndiceNombres
+from core.engine import Movimiento, _ejecutar_lotes
+from core.eventos import RENOMBRADO
+from core.stats import Stats
+
+
+@pytest.mark.parametrize("renameat2", [True, False], ids=["renameat2", "link"])
+def test_archivo_que_aparece_en_el_destino_no_se_pisa(tmp_path, monkeypatch, renameat2):
+    if not renameat2:
+        monkeypatch.setattr(utils.fs_utils, "_renameat2", None)
+
+    origen = tmp_path / "entrada" / "informe.pdf"
+    origen.parent.mkdir()
+    origen.write_bytes(b"nuevo")
+    carpeta = tmp_path / "pdf"
+    carpeta.mkdir()
+
+    indice = IndiceNombres()
+    destino, renombrado = indice.reservar(carpeta, "informe.pdf", "informe", ".pdf")
+    assert not renombrado
+    # Otro proceso lo crea despues de listar la carpeta de destino
+    (carpeta / "informe.pdf").write_bytes(b"de otro proceso")
+
+    stats = Stats()
+    mov = Movimiento(origen, destino, "pdf", False)
+    eventos = list(_ejecutar_lotes([[mov]], stats, indice, None, 1))
+
+    assert (carpeta / "informe.pdf").read_bytes() == b"de otro proceso"
+    assert (carpeta / "informe_copy1.pdf").read_bytes() == b"nuevo"
+    assert not origen.exists()
+    assert [(e.tipo, e.destino) for e in eventos[:1]] == [(RENOMBRADO, carpeta / "informe_copy1.pdf")]
+    assert (stats.procesados, stats.errores) == (1, 0)
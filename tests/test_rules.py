@@ -0,0 +1,101 @@
+# tests/test_rules.py
+
+import random
+import re
+from fnmatch import fnmatchcase
+
+from core.engine import simulacion
+from core.eventos import MOVIDO
+from core.firmas import SNIFF_TODOS, DetectorContenido
+from core.rules import compilar_reglas
+from core.stats import Stats
+
+
+def _destinos(base, reglas, detector=None) -> dict:
+    """Simulates organizing 'base' and returns {file name: destination folder name}"""
+    eventos = simulacion(base, reglas, False, set(), set(), False, Stats(), detector=detector)
+    return {e.origen.name: e.destino.parent.name for e in eventos if e.tipo == MOVIDO}
+
+
+def test_regla_condicional_gana_al_sniff_todos(tmp_path):
+    reglas = compilar_reglas({
+        "Invoices": [{"regex": r"^INV-\d+"}],
+        "pdf": [".pdf"],
+        "images": [".png"],
+    })
+    base = tmp_path / "entrada"
+    base.mkdir()
+    (base / "INV-001.pdf").write_bytes(b"%PDF-1.4\n")
+    # Sin regla con condiciones: el contenido sigue corrigiendo la extension
+    (base / "foto.pdf").write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(32))
+
+    detector = DetectorContenido(tmp_path / "signatures.sqlite", reglas, SNIFF_TODOS)
+    try:
+        destinos = _destinos(base, reglas, detector)
+    finally:
+        detector.cerrar()
+
+    assert destinos == {"INV-001.pdf": "Invoices", "foto.pdf": "images"}
+    assert reglas.clasificar("INV-001.pdf").condicional
+    assert not reglas.clasificar("foto.pdf").condicional
+
+
+def test_glob_y_extensions_de_varias_partes():
+    reglas = compilar_reglas({
+        "Tarballs": [{"glob": "*.tar.gz", "extensions": [".tar.gz"]}],
+        "Backups": [{"glob": "backup-*.gz", "extensions": [".tar.gz"]}],
+        "Comprimidos": [{"glob": "*.gz", "extensions": [".tar.gz"]}],
+        "gz": [".gz"],
+    })
+
+    assert reglas.clasificar("x.tar.gz") == ("Tarballs", ".tar.gz", True)
+    assert reglas.clasificar("BACKUP-1.TAR.GZ") == ("Tarballs", ".tar.gz", True)
+    assert reglas.clasificar("x.gz") == ("gz", ".gz", False)
+
+    reglas = compilar_reglas({
+        "Backups": [{"glob": "backup-*.gz", "extensions": [".tar.gz"]}],
+        "Comprimidos": [{"glob": "*.gz", "extensions": [".tar.gz"]}],
+    })
+    assert reglas.clasificar("backup-1.tar.gz").categoria == "Backups"
+    assert reglas.clasificar("otro.tar.gz").categoria == "Comprimidos"
+    assert reglas.clasificar("backup-1.gz").categoria == "Others"
+
+
+def test_indices_equivalen_a_evaluar_cada_regla():
+    """The prefix/extension indexes must pick the same rule as checking every rule in order"""
+    azar = random.Random(25)
+    globs = ["*.tar.gz", "*.gz", "*.pdf", "INV-*.pdf", "*backup*.tar.gz", "*.[tg]z", "data_??.csv", "*.t?r.gz"]
+    regexes = [r"^INV-\d+", r"report", r"^[a-z]+\.log$", r"\.tar\.gz$"]
+    extensiones = [".gz", ".tar.gz", ".pdf", ".csv", ".log"]
+    nombres = [
+        "x.tar.gz", "X.TAR.GZ", "x.gz", "x.tgz", "INV-001.pdf", "inv-7.PDF", "INV.txt", "backup-1.tar.gz",
+        "my_backup.tar.gz", "data_01.csv", "data_1.csv", "report.pdf", "annual-report.log", "app.log",
+        "x.tor.gz", "x.pdf.gz", "sin_extension", "a.b.c.tar.gz",
+    ]
+
+    for _ in range(300):
+        declaradas = []
+        for _ in range(azar.randint(1, 4)):
+            condiciones = {}
+            if azar.random() < 0.7:
+                condiciones["glob"] = azar.sample(globs, azar.randint(1, 2))
+            if azar.random() < 0.4:
+                condiciones["regex"] = azar.choice(regexes)
+            if not condiciones or azar.random() < 0.5:
+                condiciones["extensions"] = azar.sample(extensiones, azar.randint(1, 2))
+            declaradas.append((f"C{len(declaradas)}", condiciones))
+        reglas = compilar_reglas({categoria: [condiciones] for categoria, condiciones in declaradas})
+
+        for nombre in nombres:
+            esperada = "Others"
+            for categoria, condiciones in declaradas:
+                minusculas = nombre.lower()
+                if "glob" in condiciones and not any(fnmatchcase(minusculas, g.lower()) for g in condiciones["glob"]):
+                    continue
+                if "regex" in condiciones and not re.search(condiciones["regex"], nombre):
+                    continue
+                if "extensions" in condiciones and not minusculas.endswith(tuple(condiciones["extensions"])):
+                    continue
+                esperada = categoria
+                break
+            assert reglas.clasificar(nombre).categoria == esperada, (nombre, declaradas)
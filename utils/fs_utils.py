@@ -1,16 +1,96 @@
 # utils/fs_utils.py
 
-import click
+import os
+import sys
+import errno
+import ctypes
+import shutil
 from pathlib import Path
 
+from core.rules import CATEGORIA_POR_DEFECTO, ReglasCompiladas
 
-def crear_destinos(base: Path, reglas: dict) -> dict:
-    destinos = {categoria: base / categoria for categoria in reglas.keys()}
-    destinos.setdefault("Others", base / "Others")
+
+def crear_destinos(base: Path, reglas: ReglasCompiladas) -> dict:
+    destinos = {categoria: base / categoria for categoria in reglas.categorias}
+    destinos.setdefault(CATEGORIA_POR_DEFECTO, base / CATEGORIA_POR_DEFECTO)
     return destinos
 
 
-def crear_carpetas_si_no_existe(destino_final: Path):
-    if not destino_final.exists():
-        destino_final.mkdir(parents=True, exist_ok=True)
-        click.echo(f"Folder {destino_final.name} created successfully.")
\ No newline at end of file
+# renameat2(2) de Linux: RENAME_NOREPLACE falla con EEXIST en vez de pisar el destino
+_AT_FDCWD = -100
+_RENAME_NOREPLACE = 1
+
+
+def _cargar_renameat2():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        funcion = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return None
+    funcion.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    funcion.restype = ctypes.c_int
+    return funcion
+
+
+_renameat2 = _cargar_renameat2()
+
+# Errores de un sistema de archivos (o kernel) que no admite el metodo: se prueba el siguiente
+_NO_ADMITIDO = {errno.EINVAL, errno.ENOSYS, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+
+def renombrar_sin_reemplazar(origen, destino):
+    """
+    os.rename that never replaces an existing destination: raises
+    FileExistsError instead (and EXDEV across devices). Uses
+    renameat2(RENAME_NOREPLACE) on Linux, else a hard link plus unlink;
+    Windows' rename already refuses an existing destination
+    """
+    if os.name == "nt":
+        os.rename(origen, destino)
+        return
+
+    if _renameat2 is not None:
+        if _renameat2(_AT_FDCWD, os.fsencode(origen), _AT_FDCWD, os.fsencode(destino), _RENAME_NOREPLACE) == 0:
+            return
+        codigo = ctypes.get_errno()
+        if codigo not in _NO_ADMITIDO:
+            raise OSError(codigo, os.strerror(codigo), os.fspath(origen), None, os.fspath(destino))
+
+    try:
+        os.link(origen, destino, follow_symlinks=False)
+    except OSError as e:
+        if e.errno not in _NO_ADMITIDO:
+            raise
+        # Sin enlaces duros (FAT, algunos recursos de red): queda la comprobacion previa
+        if os.path.lexists(destino):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), os.fspath(destino)) from None
+        os.rename(origen, destino)
+        return
+    os.unlink(origen)
+
+
+def mover_entre_dispositivos(origen, destino):
+    """
+    shutil.move for a destination on another device, without replacing an
+    existing file: the data is copied to a temporary name next to the
+    destination and renamed into place, then the source is removed
+    """
+    if os.path.islink(origen):
+        # symlink falla con FileExistsError si el nombre ya existe
+        os.symlink(os.readlink(origen), destino)
+        os.unlink(origen)
+        return
+
+    destino = Path(destino)
+    temporal = destino.with_name(f".{destino.name}.orgtmp")
+    try:
+        shutil.copy2(origen, temporal)
+        renombrar_sin_reemplazar(temporal, destino)
+    except OSError:
+        try:
+            os.unlink(temporal)
+        except OSError:
+            pass
+        raise
+    os.unlink(origen)